@@ -0,0 +1,115 @@
+# --- START OF FILE bench_adversarial.py ---
+"""
+Benchmark avversario del convertitore: input malformati che in passato facevano crescere
+il tempo di alcune regex col quadrato della dimensione (recinti ``` mai chiusi, migliaia
+di virgolette isolate, comandi LaTeX senza }, titoli e note lunghissimi, elenchi molto annidati)
+e i caratteri ad uso privato che il convertitore usa come marcatori interni.
+
+Ogni caso genera un capitolo Markdown di --kb KB e di 4 volte tanto e lo converte per intero
+(raccolta della bibliografia, prima e seconda parte della conversione). Un caso fallisce se:
+- alla dimensione maggiore supera il budget fisso di tempo per KB (--budget, in microsecondi);
+- l'esponente di crescita k (tempo ∝ dimensione^k) tra le due dimensioni supera --soglia.
+Il benchmark termina con codice 1 se almeno un caso fallisce.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_adversarial.py [--kb 100] [--budget 3000] [--soglia 1.25] [--casi recinto_non_chiuso,...]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import md_to_latex_converter as conv  # noqa: E402
+
+KB = 100
+FATTORE = 4
+BUDGET_US_PER_KB = 3000.0
+SOGLIA_ESPONENTE = 1.25
+RIPETIZIONI = 2
+FRASE = "Il suono elettronico viene elaborato in tempo reale dallo studio di fonologia."
+
+# Ogni caso è un'unità di testo ripetuta fino alla dimensione voluta, con un prefisso e un suffisso
+CASI = {
+    "testo_normale": ("", FRASE + "\n\n", ""),
+    "recinto_non_chiuso": ("```python\n", FRASE + "\n", ""),
+    "recinti_senza_a_capo": ("", "testo ```python " + FRASE + "\n", ""),
+    "virgolette_doppie_isolate": ("", 'parola " ' * 20 + "\n", ""),
+    "virgolette_doppie_riga_unica": ("", 'parola " ', "\n"),
+    "virgolette_singole_isolate": ("", "parola '' ", "'\n"),
+    "grassetto_non_chiuso": ("", "** parola ", "\n"),
+    "dollari_isolati": ("", "$ parola ", "\n"),
+    "backtick_isolati": ("", "testo `` a ` b ", "\n"),
+    "comandi_latex_non_chiusi": ("", "\\textbf{ parola ... 2^10 ", "\n"),
+    "titolo_con_graffe": ("# Titolo", " {b", "\n"),
+    "titolo_con_spazi": ("# Titolo", " ", "x\n"),
+    "richiami_malformati": ("", "[^1, p. 3 [^", "\n"),
+    "nota_lunghissima": ("Testo[^1].\n\n[^1]: Rossi, M., ", "in Proceedings of the Journal “a, b and c, ", "\n"),
+    "caratteri_riservati": ("", "Simbolo \uE000 privato \uE001 e \uE003\uE010 in `a\uE002` e $\uE000$. ", "\n"),
+    "elenchi_annidati": ("", "".join(" " * (2 * livello) + f"{livello + 1}. elemento\n" for livello in range(40)), ""),
+}
+
+def capitolo(caso: str, kb: float) -> str:
+    prefisso, unita, suffisso = CASI[caso]
+    ripetizioni = max(1, int(kb * 1024 / len(unita.encode("utf-8"))))
+    return prefisso + unita * ripetizioni + suffisso
+
+def converti(testo: str) -> float:
+    """Secondi della conversione completa del capitolo (la migliore di RIPETIZIONI esecuzioni)."""
+    migliore = math.inf
+    for _ in range(RIPETIZIONI):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inizio = time.perf_counter()
+            conv.collect_and_parse_bibliography({"capitolo.md": testo}, use_cache=False)
+            corpo = conv.convert_section_body(testo, "capitolo.md", 1)
+            conv.finalize_section_content(corpo, "capitolo.md", 1, set())
+            migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del convertitore su input avversari, con budget di tempo fissi.")
+    parser.add_argument("--kb", type=float, default=KB, help=f"dimensione minore dei capitoli in KB (default: {KB})")
+    parser.add_argument("--budget", type=float, default=BUDGET_US_PER_KB, metavar="US",
+                        help=f"tempo massimo per KB alla dimensione maggiore, in microsecondi (default: {BUDGET_US_PER_KB:.0f})")
+    parser.add_argument("--soglia", type=float, default=SOGLIA_ESPONENTE, metavar="K",
+                        help=f"esponente di crescita oltre il quale un caso è superlineare (default: {SOGLIA_ESPONENTE})")
+    parser.add_argument("--casi", default=",".join(CASI), metavar="C1,C2,...", help="casi da eseguire (default: tutti)")
+    args = parser.parse_args(argv)
+    args.casi = [caso.strip() for caso in args.casi.split(",") if caso.strip()]
+    sconosciuti = [caso for caso in args.casi if caso not in CASI]
+    if sconosciuti:
+        parser.error(f"casi sconosciuti: {', '.join(sconosciuti)} (disponibili: {', '.join(CASI)})")
+    return args
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.disable(logging.CRITICAL)
+    grande = args.kb * FATTORE
+    print(f"{'caso':<30} {f'{args.kb:.0f} KB ms':>11} {f'{grande:.0f} KB ms':>11} {'us/KB':>8} {'k':>6}")
+    falliti = []
+    for caso in args.casi:
+        tempo_piccolo = converti(capitolo(caso, args.kb))
+        tempo_grande = converti(capitolo(caso, grande))
+        us_per_kb = tempo_grande * 1e6 / grande
+        k = math.log(tempo_grande / tempo_piccolo) / math.log(FATTORE)
+        problemi = []
+        if us_per_kb > args.budget:
+            problemi.append(f"oltre il budget di {args.budget:.0f} us/KB")
+        if k > args.soglia:
+            problemi.append("SUPERLINEARE")
+        if problemi:
+            falliti.append(caso)
+        print(f"{caso:<30} {tempo_piccolo * 1000:>11.1f} {tempo_grande * 1000:>11.1f} {us_per_kb:>8.0f} {k:>6.2f}"
+              + ("  <-- " + ", ".join(problemi) if problemi else ""))
+    if falliti:
+        print(f"\nCasi falliti: {', '.join(falliti)}")
+        sys.exit(1)
+    print(f"\nTutti i casi entro il budget ({args.budget:.0f} us/KB) e con crescita lineare (k <= {args.soglia}).")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_adversarial.py ---
@@ -0,0 +1,106 @@
+# --- START OF FILE bench_blocks.py ---
+"""
+Benchmark della riconversione per blocchi di un file modificato (cache dei blocchi).
+
+Genera una tesina sintetica (corpus_sintetico.py), ne riunisce i file in un unico capitolo
+e lo converte una prima volta. Poi applica --modifiche modifiche a un paragrafo scelto a caso
+(una frase nuova, una persona citata, una nota, un titolo) e dopo ognuna misura:
+- la conversione incrementale, che riconverte solo i blocchi cambiati;
+- la conversione completa con --force --no-block-cache.
+Stampa i tempi mediani e verifica che i .tex delle due conversioni siano identici;
+se non lo sono il benchmark termina con codice 1.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_blocks.py [--pagine 600] [--modifiche 10]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import md_to_latex_converter as conv  # noqa: E402
+from corpus_sintetico import scrivi_tesi  # noqa: E402
+
+PAGINE = 600
+MODIFICHE = 10
+CAPITOLO = "capitolo.md"
+
+def converti(*argomenti) -> tuple:
+    """(secondi, {nome del .tex: contenuto}) di main() del convertitore nella directory corrente."""
+    conv.PERSONA_APPLIED_SET.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        inizio = time.perf_counter()
+        conv.main(list(argomenti))
+        durata = time.perf_counter() - inizio
+    return durata, {percorso.name: percorso.read_text(encoding="utf-8") for percorso in sorted(conv.OUTPUT_DIR_TEX.glob("*.tex"))}
+
+def modifica(testo: str, generatore: random.Random, persone: dict) -> str:
+    """Il testo con una modifica all'inizio di una riga scelta a caso."""
+    inizio = testo.rfind("\n", 0, generatore.randrange(len(testo))) + 1
+    variante = generatore.choice([variante for dati in persone.values() for variante in dati["variants"]])
+    nuovo = generatore.choice([
+        "Una frase aggiunta durante la revisione. ",
+        f"Come osserva {variante}, ",
+        f"Una nota nuova[^{generatore.randint(1, 50)}]. ",
+        "\n\n## Paragrafo aggiunto\n\n",
+    ])
+    return testo[:inizio] + nuovo + testo[inizio:]
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Riconversione incrementale per blocchi rispetto a una conversione completa.")
+    parser.add_argument("--pagine", type=int, default=PAGINE, help=f"pagine del capitolo sintetico (default: {PAGINE})")
+    parser.add_argument("--modifiche", type=int, default=MODIFICHE, help=f"modifiche da misurare (default: {MODIFICHE})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.disable(logging.WARNING)
+    generatore = random.Random(0)
+    cartella_iniziale = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_blocks_") as temporanea:
+        directory = Path(temporanea)
+        ordine, persone = scrivi_tesi(directory, args.pagine)
+        cartella_md = directory / "MarkDownSections"
+        testo = "\n\n".join((cartella_md / nome).read_text(encoding="utf-8") for nome in ordine)
+        for nome in ordine:
+            (cartella_md / nome).unlink()
+        conv.MD_FILES_ORDER = [CAPITOLO]
+        conv.KNOWN_PEOPLE.clear()
+        conv.KNOWN_PEOPLE.update(persone)
+        os.chdir(directory)
+        try:
+            (cartella_md / CAPITOLO).write_text(testo, encoding="utf-8")
+            print(f"Capitolo unico di {args.pagine} pagine ({len(testo.encode('utf-8')) / 1024:.0f} KB)")
+            prima, _ = converti("--force")
+            tempi = {"incrementale": [], "completa": []}
+            for _ in range(args.modifiche):
+                testo = modifica(testo, generatore, persone)
+                (cartella_md / CAPITOLO).write_text(testo, encoding="utf-8")
+                secondi, tex_incrementale = converti()
+                tempi["incrementale"].append(secondi)
+                secondi, tex_completa = converti("--force", "--no-block-cache")
+                tempi["completa"].append(secondi)
+                if tex_incrementale != tex_completa:
+                    print("\nOutput incrementale diverso da quello della conversione completa.")
+                    sys.exit(1)
+                converti()  # Rimette in cache i blocchi prima della modifica successiva
+        finally:
+            os.chdir(cartella_iniziale)
+
+    print(f"{'prima conversione:':<26} {prima * 1000:8.0f} ms")
+    for caso, valori in tempi.items():
+        print(f"{'conversione ' + caso + ':':<26} {statistics.median(valori) * 1000:8.0f} ms mediana, {max(valori) * 1000:.0f} ms massimo")
+    print("\nOutput incrementale identico a quello della conversione completa.")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_blocks.py ---
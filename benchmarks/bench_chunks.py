@@ -0,0 +1,83 @@
+# --- START OF FILE bench_chunks.py ---
+"""
+Benchmark della conversione parallela di un singolo file lungo (--jobs con un solo capitolo).
+
+Genera una tesina sintetica (corpus_sintetico.py) e ne riunisce tutti i file in un unico
+capitolo, poi lo converte con --force una volta con --jobs 1 e una volta con --jobs N:
+il file viene diviso in parti ai titoli # e ## e le parti sono convertite in parallelo.
+Stampa i due tempi e verifica che i .tex generati siano identici; se non lo sono
+il benchmark termina con codice 1.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_chunks.py [--pagine 600] [--jobs 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus_sintetico import scrivi_tesi  # noqa: E402
+
+CONVERTITORE = Path(__file__).resolve().parent.parent / "md_to_latex_converter.py"
+PAGINE = 600
+JOBS = os.cpu_count() or 1
+CAPITOLO = "capitolo.md"
+
+# Esegue il convertitore con il solo capitolo e le persone della tesina sintetica
+AVVIO = """
+import json, sys
+sys.path.insert(0, {cartella!r})
+import md_to_latex_converter as conv
+conv.MD_FILES_ORDER = [{capitolo!r}]
+conv.KNOWN_PEOPLE.update(json.load(open("persone.json", encoding="utf-8")))
+conv.main(sys.argv[1:])
+"""
+
+def converti(directory: Path, jobs: int) -> tuple:
+    """(secondi, {nome del .tex: contenuto}) di una conversione con --force e --jobs `jobs`."""
+    comando = [sys.executable, "-c", AVVIO.format(cartella=str(CONVERTITORE.parent), capitolo=CAPITOLO),
+               "--force", "--jobs", str(jobs)]
+    inizio = time.perf_counter()
+    subprocess.run(comando, cwd=directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    durata = time.perf_counter() - inizio
+    return durata, {percorso.name: percorso.read_bytes() for percorso in sorted((directory / "sections").glob("*.tex"))}
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Conversione di un unico capitolo lungo con uno e con più processi.")
+    parser.add_argument("--pagine", type=int, default=PAGINE, help=f"pagine del capitolo sintetico (default: {PAGINE})")
+    parser.add_argument("--jobs", type=int, default=JOBS, help=f"processi della conversione parallela (default: {JOBS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    with tempfile.TemporaryDirectory(prefix="bench_chunks_") as temporanea:
+        directory = Path(temporanea)
+        ordine, persone = scrivi_tesi(directory, args.pagine)
+        cartella_md = directory / "MarkDownSections"
+        testo = "\n\n".join((cartella_md / nome).read_text(encoding="utf-8") for nome in ordine)
+        for nome in ordine:
+            (cartella_md / nome).unlink()
+        (cartella_md / CAPITOLO).write_text(testo, encoding="utf-8")
+        (directory / "persone.json").write_text(json.dumps(persone), encoding="utf-8")
+        print(f"Capitolo unico di {args.pagine} pagine ({len(testo.encode('utf-8')) / 1024:.0f} KB)")
+
+        serie, tex_serie = converti(directory, 1)
+        parallela, tex_parallela = converti(directory, args.jobs)
+
+    print(f"{'--jobs 1:':<12} {serie * 1000:8.0f} ms")
+    print(f"{f'--jobs {args.jobs}:':<12} {parallela * 1000:8.0f} ms ({serie / parallela:.2f}x)")
+    if tex_serie != tex_parallela:
+        diversi = sorted(nome for nome in tex_serie.keys() | tex_parallela.keys()
+                         if tex_serie.get(nome) != tex_parallela.get(nome))
+        print(f"\nOutput diverso dalla conversione in serie: {', '.join(diversi)}")
+        sys.exit(1)
+    print("\nOutput identico alla conversione in serie.")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_chunks.py ---
@@ -0,0 +1,140 @@
+# --- START OF FILE bench_conversion.py ---
+"""
+Benchmark della conversione completa su tesine sintetiche di dimensione crescente.
+
+Per ogni scala (in pagine) genera una tesina con corpus_sintetico.py in una directory
+temporanea ed esegue main() del convertitore con --force: una volta per il tempo totale,
+una volta con --profile per il tempo di ogni fase della conversione delle sezioni (di ogni
+misura si tiene la migliore su --ripetizioni esecuzioni). Per il totale e per ogni fase stima
+l'esponente di crescita k (tempo ∝ dimensione^k) con una retta sui logaritmi delle tre scale
+più grandi: k ≈ 1 è lineare; oltre la soglia la fase viene segnalata come superlineare e il
+benchmark termina con codice 1, così può bloccare una regressione.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_conversion.py [--scale 10,50,100,500,1000] [--soglia 1.25] [--output risultati.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import md_to_latex_converter as conv  # noqa: E402
+from corpus_sintetico import scrivi_tesi  # noqa: E402
+
+SCALE = (10, 50, 100, 500, 1000)
+SOGLIA_ESPONENTE = 1.25
+# Sotto questo tempo (alla scala più grande) una fase è troppo rumorosa per stimarne la crescita
+TEMPO_MINIMO_MS = 20.0
+SCALE_PER_ESPONENTE = 3
+RIPETIZIONI = 2
+TOTALE = "main()"
+
+def converti(directory: Path, ordine: list, persone: dict, profilo: Path = None) -> float:
+    """Esegue main() del convertitore nella directory della tesina; restituisce i secondi."""
+    conv.MD_FILES_ORDER = ordine
+    conv.KNOWN_PEOPLE.clear()
+    conv.KNOWN_PEOPLE.update(persone)
+    argomenti = ["--force"] + (["--profile", str(profilo)] if profilo else [])
+    cartella_iniziale = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            inizio = time.perf_counter()
+            conv.main(argomenti)
+            durata = time.perf_counter() - inizio
+    finally:
+        os.chdir(cartella_iniziale)
+        conv.disable_profiling()
+    return durata
+
+def misura_scala(pagine: int, ripetizioni: int) -> dict:
+    """{ "pagine", "kb", "secondi": { fase: secondi } } per una tesina di `pagine` pagine."""
+    with tempfile.TemporaryDirectory(prefix="bench_conversion_") as temporanea:
+        directory = Path(temporanea)
+        ordine, persone = scrivi_tesi(directory, pagine)
+        kb = sum((directory / "MarkDownSections" / nome).stat().st_size for nome in ordine) / 1024
+        secondi = {TOTALE: min(converti(directory, ordine, persone) for _ in range(ripetizioni))}
+        report = directory / "profile.json"
+        for _ in range(ripetizioni):
+            converti(directory, ordine, persone, profilo=report)
+            for fase in json.loads(report.read_text(encoding="utf-8"))["stages"]:
+                secondi[fase["stage"]] = min(secondi.get(fase["stage"], math.inf), fase["seconds"])
+    return {"pagine": pagine, "kb": kb, "secondi": secondi}
+
+def esponente(risultati: list, fase: str):
+    """
+    k tale che tempo ∝ dimensione^k (minimi quadrati su log-log) sulle ultime scale;
+    None se la fase è troppo veloce alla scala più grande per stimarlo.
+    """
+    punti = [(math.log(risultato["kb"]), math.log(risultato["secondi"][fase]))
+             for risultato in risultati[-SCALE_PER_ESPONENTE:] if risultato["secondi"].get(fase)]
+    if len(punti) < 2 or risultati[-1]["secondi"].get(fase, 0) * 1000 < TEMPO_MINIMO_MS:
+        return None
+    media_x = sum(x for x, _ in punti) / len(punti)
+    media_y = sum(y for _, y in punti) / len(punti)
+    return (sum((x - media_x) * (y - media_y) for x, y in punti)
+            / sum((x - media_x) ** 2 for x, _ in punti))
+
+def stampa_risultati(risultati: list, soglia: float) -> list:
+    """Stampa le tabelle per scala e per fase; restituisce le fasi superlineari."""
+    print(f"{'pagine':>8} {'KB':>9} {'main() s':>10} {'us/KB':>8}")
+    for risultato in risultati:
+        totale = risultato["secondi"][TOTALE]
+        print(f"{risultato['pagine']:>8} {risultato['kb']:>9.0f} {totale:>10.2f} {totale * 1e6 / risultato['kb']:>8.1f}")
+
+    fasi = [TOTALE] + sorted((fase for fase in risultati[-1]["secondi"] if fase != TOTALE),
+                             key=lambda fase: risultati[-1]["secondi"][fase], reverse=True)
+    intestazione = "".join(f"{str(risultato['pagine']) + ' p.':>11}" for risultato in risultati)
+    print(f"\n{'fase (ms)':<36}{intestazione} {'k':>6}")
+    superlineari = []
+    for fase in fasi:
+        tempi = "".join(f"{risultato['secondi'].get(fase, 0) * 1000:>11.1f}" for risultato in risultati)
+        k = esponente(risultati, fase)
+        segnale = ""
+        if k is not None and k > soglia:
+            superlineari.append((fase, k))
+            segnale = "  <-- SUPERLINEARE"
+        print(f"{fase:<36}{tempi} {f'{k:.2f}' if k is not None else '-':>6}{segnale}")
+    return superlineari
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark della conversione su tesine sintetiche di dimensione crescente.")
+    parser.add_argument("--scale", default=",".join(map(str, SCALE)), metavar="P1,P2,...",
+                        help=f"numero di pagine delle tesine (default: {','.join(map(str, SCALE))})")
+    parser.add_argument("--soglia", type=float, default=SOGLIA_ESPONENTE, metavar="K",
+                        help=f"esponente di crescita oltre il quale una fase è superlineare (default: {SOGLIA_ESPONENTE})")
+    parser.add_argument("--ripetizioni", type=int, default=RIPETIZIONI, metavar="N",
+                        help=f"conversioni per scala (per il totale e per le fasi), di cui si tiene la più veloce (default: {RIPETIZIONI})")
+    parser.add_argument("--output", metavar="RISULTATI.json", help="salva i tempi misurati in JSON")
+    args = parser.parse_args(argv)
+    args.scale = sorted(int(pagine) for pagine in args.scale.split(","))
+    return args
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.disable(logging.WARNING)
+    risultati = []
+    for pagine in args.scale:
+        print(f"Conversione di una tesina di {pagine} pagine...", file=sys.stderr)
+        risultati.append(misura_scala(pagine, args.ripetizioni))
+    superlineari = stampa_risultati(risultati, args.soglia)
+    if args.output:
+        Path(args.output).write_text(json.dumps(risultati, indent=1, ensure_ascii=False), encoding="utf-8")
+    if superlineari:
+        print(f"\nCrescita superlineare (k > {args.soglia}) fino a {risultati[-1]['pagine']} pagine: "
+              + ", ".join(f"{fase} (k = {k:.2f})" for fase, k in superlineari))
+        sys.exit(1)
+    print(f"\nNessuna fase superlineare (k <= {args.soglia}).")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_conversion.py ---
@@ -0,0 +1,77 @@
+# --- START OF FILE bench_latex_format.py ---
+"""
+Benchmark del formato precompilato di latex_build.py (--format).
+
+Compila un documento con lo stesso preambolo di main.tex e una sola riga di testo,
+così il tempo misurato è quasi tutto avvio: caricamento di classe, pacchetti e font.
+Confronta il tempo per passaggio di XeLaTeX senza formato e partendo dal formato
+precompilato, e riporta il tempo (una tantum) di creazione del formato.
+
+Richiede una distribuzione TeX con xelatex. Uso (dalla radice del progetto, dove si trova main.tex):
+    python benchmarks/bench_latex_format.py [RIPETIZIONI]
+"""
+import logging
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import latex_build as lb  # noqa: E402
+
+RIPETIZIONI = 5
+MAIN = "main"
+DOCUMENTO_PROVA = lb.FORMAT_DIR / "bench_startup.tex"
+
+def documento_prova():
+    """Preambolo di main.tex seguito da un corpo minimo."""
+    testo = Path(MAIN + ".tex").read_text(encoding='utf-8')
+    fine = lb.PREAMBLE_END_PATTERN.search(testo)
+    preambolo = testo[:fine.start()] if fine else testo
+    return preambolo + "\\begin{document}\nAvvio.\n\\end{document}\n"
+
+def passaggio(format_name=None):
+    """Un passaggio di XeLaTeX sul documento di prova; restituisce i secondi."""
+    comando = [lb.LATEX]
+    if format_name:
+        comando.append(f"-fmt={format_name}")
+    comando += [*lb.LATEX_OPTIONS, f"-output-directory={lb.FORMAT_DIR}", str(DOCUMENTO_PROVA)]
+    inizio = time.perf_counter()
+    risultato = subprocess.run(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=lb.format_environment() if format_name else None)
+    durata = time.perf_counter() - inizio
+    if risultato.returncode != 0:
+        sys.exit(f"Compilazione fallita: {' '.join(comando)} (vedi {DOCUMENTO_PROVA.with_suffix('.log')})")
+    return durata
+
+def riepilogo(etichetta, tempi):
+    print(f"{etichetta:<22} mediana {statistics.median(tempi):6.2f} s   minimo {min(tempi):6.2f} s")
+
+def main():
+    logging.disable(logging.INFO)
+    if shutil.which(lb.LATEX) is None:
+        sys.exit(f"{lb.LATEX} non trovato: il benchmark richiede una distribuzione TeX.")
+    ripetizioni = int(sys.argv[1]) if len(sys.argv) > 1 else RIPETIZIONI
+    lb.FORMAT_DIR.mkdir(parents=True, exist_ok=True)
+    DOCUMENTO_PROVA.write_text(documento_prova(), encoding='utf-8')
+
+    inizio = time.perf_counter()
+    format_name = lb.prepare_format(MAIN, force=True)
+    creazione = time.perf_counter() - inizio
+    if format_name is None:
+        sys.exit("Impossibile creare il formato precompilato: vedi il log in " + str(lb.FORMAT_DIR))
+
+    senza = [passaggio() for _ in range(ripetizioni)]
+    con = [passaggio(format_name) for _ in range(ripetizioni)]
+    print(f"Avvio di {lb.LATEX} con il preambolo di {MAIN}.tex, {ripetizioni} ripetizioni")
+    riepilogo("senza formato:", senza)
+    riepilogo("con formato:", con)
+    print(f"Creazione del formato: {creazione:.2f} s (solo quando cambiano classe o pacchetti)")
+    risparmio = statistics.median(senza) - statistics.median(con)
+    print(f"Risparmio per passaggio: {risparmio:.2f} s ({risparmio / statistics.median(senza):.0%})")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_latex_format.py ---
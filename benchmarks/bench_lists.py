@@ -0,0 +1,86 @@
+# --- START OF FILE bench_lists.py ---
+"""
+Benchmark del parser degli elenchi (regola `lists` di md_to_latex_converter.py).
+
+Converte elenchi sempre più lunghi, fino a 50.000 elementi, che mescolano tutti i casi
+del parser: elementi numerati e puntati, sottoelenchi annidati, righe di continuazione
+e righe vuote tra un elemento e l'altro. Per ogni dimensione stampa il tempo per
+elemento e stima l'esponente di crescita k (tempo ∝ elementi^k) tra le due dimensioni
+più grandi: con un parser a passata unica k resta vicino a 1. Se k supera la soglia
+il benchmark termina con codice 1.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_lists.py [--elementi 1000,5000,10000,50000] [--soglia 1.25]
+"""
+import argparse
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import md_to_latex_converter as conv  # noqa: E402
+
+ELEMENTI = (1000, 5000, 10000, 50000)
+SOGLIA_ESPONENTE = 1.25
+RIPETIZIONI = 3
+
+def elenco(elementi: int) -> list:
+    """Righe Markdown di un elenco numerato di `elementi` elementi con tutti i casi del parser."""
+    righe = []
+    for n in range(1, elementi + 1):
+        caso = n % 10
+        if caso in (3, 4, 5):
+            righe.append(f"   - sottoelemento {n} con **grassetto**")
+        elif caso == 6:
+            righe.append(f"     {n}. terzo livello")
+        else:
+            righe.append(f"{n}. elemento {n} dell'elenco")
+        if caso == 1:
+            righe.append("   continuazione dell'elemento precedente")
+        elif caso == 8:
+            righe.append("")
+    return righe
+
+def misura(righe: list) -> float:
+    """Secondi della conversione più veloce su RIPETIZIONI esecuzioni."""
+    migliore = math.inf
+    for _ in range(RIPETIZIONI):
+        inizio = time.perf_counter()
+        conv.lists_in_lines(righe)
+        migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del parser degli elenchi su elenchi di lunghezza crescente.")
+    parser.add_argument("--elementi", default=",".join(map(str, ELEMENTI)), metavar="N1,N2,...",
+                        help=f"numero di elementi degli elenchi (default: {','.join(map(str, ELEMENTI))})")
+    parser.add_argument("--soglia", type=float, default=SOGLIA_ESPONENTE, metavar="K",
+                        help=f"esponente di crescita oltre il quale il parser è superlineare (default: {SOGLIA_ESPONENTE})")
+    args = parser.parse_args(argv)
+    args.elementi = sorted(int(n) for n in args.elementi.split(","))
+    return args
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.disable(logging.INFO)
+    risultati = []
+    print(f"{'elementi':>10} {'righe':>8} {'ms':>10} {'us/elemento':>12}")
+    for elementi in args.elementi:
+        righe = elenco(elementi)
+        secondi = misura(righe)
+        risultati.append((elementi, secondi))
+        print(f"{elementi:>10} {len(righe):>8} {secondi * 1000:>10.1f} {secondi * 1e6 / elementi:>12.2f}")
+    if len(risultati) < 2:
+        return
+    (n1, t1), (n2, t2) = risultati[-2:]
+    k = math.log(t2 / t1) / math.log(n2 / n1)
+    if k > args.soglia:
+        print(f"\nCrescita superlineare: k = {k:.2f} > {args.soglia} tra {n1} e {n2} elementi")
+        sys.exit(1)
+    print(f"\nCrescita lineare: k = {k:.2f} tra {n1} e {n2} elementi")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_lists.py ---
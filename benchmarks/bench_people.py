@@ -0,0 +1,132 @@
+# --- START OF FILE bench_people.py ---
+"""
+Benchmark del registro esterno delle persone (--people) rispetto alla tabella KNOWN_PEOPLE.
+
+Genera una tesina sintetica (corpus_sintetico.py) e registri CSV di dimensione crescente:
+le persone della tesina sono mescolate a persone inventate, alcune con varianti fatte di
+parole che compaiono nel testo. Per ogni dimensione converte la tesina:
+- con tutte le persone del registro in KNOWN_PEOPLE;
+- con --people, la prima volta (l'indice del registro viene costruito);
+- con --people e l'indice già in cache, come in una nuova esecuzione.
+Ogni conversione riparte da zero (senza cache di build e dei blocchi) in un processo "nuovo":
+il tempo comprende quindi la compilazione del matcher delle persone. Stampa i tempi e verifica
+che i .tex siano identici nei tre casi; se non lo sono il benchmark termina con codice 1.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_people.py [--pagine 100] [--persone 1000,10000,50000]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import md_to_latex_converter as conv  # noqa: E402
+from corpus_sintetico import scrivi_tesi, PAROLE  # noqa: E402
+
+PAGINE = 100
+PERSONE = "1000,10000,50000"
+REGISTRO = "persone.csv"
+SILLABE = "ba be bi bo ca ce ci co da de di do la le li lo ma me mi mo na ne ni no ra re ri ro ta te ti to".split()
+
+def registro_sintetico(persone_tesi: dict, totale: int, seme: int = 0) -> dict:
+    """{nome: dettagli} con le persone della tesina sparse tra totale persone inventate."""
+    generatore = random.Random(seme)
+    parola = lambda: "".join(generatore.choice(SILLABE) for _ in range(generatore.randint(2, 4))).capitalize()
+    registro = {}
+    posizioni = {generatore.randrange(totale): nome for nome in persone_tesi}
+    for n in range(totale):
+        if n in posizioni:
+            registro[posizioni[n]] = persone_tesi[posizioni[n]]
+            continue
+        if generatore.random() < 0.001:
+            varianti = [" ".join(generatore.sample(PAROLE, 2)).title()]
+        else:
+            nome, cognome = parola(), parola()
+            varianti = [f"{nome} {cognome}", f"{nome[0]}. {cognome}"]
+        registro[f"Persona {n}"] = {"variants": varianti, "birth": str(1700 + n % 300), "death": str(1760 + n % 300)}
+    return registro
+
+def scrivi_registro(percorso: Path, registro: dict):
+    with open(percorso, "w", encoding="utf-8", newline="") as f:
+        scrittore = csv.writer(f)
+        scrittore.writerow(["name", "variants", "birth", "death"])
+        for nome, dati in registro.items():
+            scrittore.writerow([nome, "|".join(dati["variants"]), dati.get("birth", ""), dati.get("death", "")])
+
+def converti(*argomenti) -> tuple:
+    """
+    (secondi, {nome del .tex: contenuto}) di main() del convertitore nella directory corrente,
+    senza cache di build e dei blocchi e senza nulla in memoria da un'esecuzione precedente.
+    """
+    conv.BUILD_STATE_FILE.unlink(missing_ok=True)
+    conv.BLOCK_CACHE_FILE.unlink(missing_ok=True)
+    conv.PERSONA_APPLIED_SET.clear()
+    conv._PEOPLE_REGISTRY_MEMO.clear()
+    conv._CORPUS_WORDS_CACHE.clear()
+    conv._PERSONA_MATCHER_CACHE.clear()
+    conv._PERSONA_MATCHER_LAST = None
+    re.purge()
+    with contextlib.redirect_stdout(io.StringIO()):
+        inizio = time.perf_counter()
+        conv.main(list(argomenti))
+        durata = time.perf_counter() - inizio
+    return durata, {percorso.name: percorso.read_text(encoding="utf-8") for percorso in sorted(conv.OUTPUT_DIR_TEX.glob("*.tex"))}
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Registro delle persone (--people) rispetto a KNOWN_PEOPLE.")
+    parser.add_argument("--pagine", type=int, default=PAGINE, help=f"pagine della tesina sintetica (default: {PAGINE})")
+    parser.add_argument("--persone", default=PERSONE, metavar="N1,N2,...",
+                        help=f"dimensioni dei registri (default: {PERSONE})")
+    args = parser.parse_args(argv)
+    args.persone = [int(numero) for numero in args.persone.split(",") if numero.strip()]
+    return args
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.disable(logging.WARNING)
+    cartella_iniziale = os.getcwd()
+    diversi = []
+    with tempfile.TemporaryDirectory(prefix="bench_people_") as temporanea:
+        directory = Path(temporanea)
+        ordine, persone_tesi = scrivi_tesi(directory, args.pagine)
+        conv.MD_FILES_ORDER = ordine
+        os.chdir(directory)
+        try:
+            print(f"Tesina di {args.pagine} pagine, {len(persone_tesi)} persone citate")
+            print(f"{'persone':>8} {'KNOWN_PEOPLE ms':>16} {'--people ms':>12} {'indice in cache ms':>19} {'selezionate':>12}")
+            for totale in args.persone:
+                registro = registro_sintetico(persone_tesi, totale)
+                scrivi_registro(directory / REGISTRO, registro)
+                conv.PEOPLE_INDEX_FILE.unlink(missing_ok=True)
+
+                conv.KNOWN_PEOPLE.clear()
+                conv.KNOWN_PEOPLE.update(registro)
+                tabella, tex_tabella = converti("--no-block-cache")
+                conv.KNOWN_PEOPLE.clear()
+                primo, tex_primo = converti("--no-block-cache", "--people", REGISTRO)
+                in_cache, tex_in_cache = converti("--no-block-cache", "--people", REGISTRO)
+                print(f"{totale:>8} {tabella * 1000:>16.0f} {primo * 1000:>12.0f} {in_cache * 1000:>19.0f} "
+                      f"{len(conv.registry_people):>12}")
+                if not tex_tabella == tex_primo == tex_in_cache:
+                    diversi.append(totale)
+        finally:
+            os.chdir(cartella_iniziale)
+
+    if diversi:
+        print(f"\nOutput diverso da quello con tutte le persone in KNOWN_PEOPLE: registri da {', '.join(map(str, diversi))} persone")
+        sys.exit(1)
+    print("\nOutput identico a quello con tutte le persone in KNOWN_PEOPLE.")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_people.py ---
@@ -0,0 +1,81 @@
+# --- START OF FILE bench_persona.py ---
+"""
+Benchmark di apply_persona_command con una tabella KNOWN_PEOPLE di grandi dimensioni.
+
+Genera NUM_PERSONE persone sintetiche (nome completo, iniziale + cognome, cognome)
+e un corpus di circa NUM_PAGINE pagine in cui ne compare una parte; misura la
+compilazione del matcher e la scansione del corpus in un'unica passata.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_persona.py [NUM_PERSONE] [NUM_PAGINE]
+"""
+import contextlib
+import io
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import md_to_latex_converter as conv  # noqa: E402
+
+NUM_PERSONE = 5000
+NUM_PAGINE = 300
+CARATTERI_PER_PAGINA = 3000
+SILLABE = ["ber", "io", "stock", "hau", "sen", "xe", "na", "kis", "sca", "rla", "tti", "no", "no", "lu", "ca", "ma", "der", "na"]
+
+def nome_casuale(rng, sillabe):
+    return "".join(rng.choice(SILLABE) for _ in range(sillabe)).capitalize()
+
+def genera_persone(n, rng):
+    persone = {}
+    while len(persone) < n:
+        nome, cognome = nome_casuale(rng, 2), nome_casuale(rng, 3)
+        canonico = f"{nome} {cognome}"
+        persone[canonico] = {
+            "variants": [canonico, f"{nome[0]}. {cognome}", cognome],
+            "birth": str(rng.randint(1850, 1950)),
+            "death": str(rng.randint(1950, 2020)),
+        }
+    return persone
+
+def genera_corpus(persone, pagine, rng):
+    nomi = [details["variants"][rng.randint(0, 2)] for details in persone.values()]
+    parole = "il suono elettronico viene elaborato in tempo reale dallo studio di fonologia".split()
+    testo, lunghezza = [], 0
+    while lunghezza < pagine * CARATTERI_PER_PAGINA:
+        frase = " ".join(rng.choice(parole) for _ in range(12))
+        if rng.random() < 0.3:
+            frase += f" con {rng.choice(nomi)}"
+        testo.append(frase + ".")
+        lunghezza += len(frase) + 2
+    return "\n".join(testo)
+
+def main():
+    logging.disable(logging.INFO)
+    num_persone = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_PERSONE
+    num_pagine = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_PAGINE
+    rng = random.Random(42)
+    persone = genera_persone(num_persone, rng)
+    corpus = genera_corpus(persone, num_pagine, rng)
+
+    conv.KNOWN_PEOPLE.clear()
+    conv.KNOWN_PEOPLE.update(persone)
+    inizio = time.perf_counter()
+    conv.get_persona_matcher()
+    compilazione = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    applicate = set()
+    with contextlib.redirect_stdout(io.StringIO()):  # silenzia i messaggi per ogni \persona applicato
+        conv.apply_persona_command(corpus, applicate)
+    scansione = time.perf_counter() - inizio
+
+    print(f"Persone: {num_persone} ({num_persone * 3} varianti), corpus: {len(corpus) / 1024:.0f} KB (~{num_pagine} pagine)")
+    print(f"Compilazione matcher: {compilazione * 1000:.1f} ms")
+    print(f"Scansione in un'unica passata: {scansione * 1000:.1f} ms, \\persona applicati: {len(applicate)}")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_persona.py ---
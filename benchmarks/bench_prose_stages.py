@@ -0,0 +1,54 @@
+# --- START OF FILE bench_prose_stages.py ---
+"""
+Benchmark delle conversioni del testo normale (regole di CONVERSION_RULES con ambito SCOPE_PROSE).
+
+Misura apply_prose_stages su capitoli sintetici di dimensione crescente e
+stampa il tempo per KB: con la segmentazione unica il tempo per KB deve
+restare circa costante al crescere del capitolo (scalatura lineare).
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_prose_stages.py
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import md_to_latex_converter as conv  # noqa: E402
+
+PARAGRAFO = (
+    'Il "tempo reale" è centrale, come in \'\'Musica elettronica\'\'... circa il 50% '
+    'dei brani usa 2^20 campioni, π × 2 ≈ 6.28 … e ~ 3 secondi. Il comando `oscil_1` '
+    'genera un \\textbf{segnale} periodico.\n\n'
+    '```csound\ninstr 1\n  a1 oscil 10000, 440, 1 ; "quoted" 50% ~ ...\n  out a1\nendin\n```\n\n'
+)
+SCALE = (50, 100, 200, 400, 800, 1600)
+RIPETIZIONI = 3
+
+def misura(funzione, testo):
+    """Restituisce il tempo minimo (in secondi) su RIPETIZIONI esecuzioni."""
+    migliore = float("inf")
+    for _ in range(RIPETIZIONI):
+        inizio = time.perf_counter()
+        funzione(testo)
+        migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'paragrafi':>10} {'KB':>8} {'tempo (ms)':>12} {'us/KB':>8}")
+    riferimento = None
+    conversioni = [regola.func for regola in conv.CONVERSION_RULES if regola.scope == conv.SCOPE_PROSE]
+    for n in SCALE:
+        testo = PARAGRAFO * n
+        kb = len(testo.encode("utf-8")) / 1024
+        tempo = misura(lambda t: conv.apply_prose_stages(t, conversioni), testo)
+        per_kb = tempo * 1e6 / kb
+        riferimento = riferimento or per_kb
+        print(f"{n:>10} {kb:>8.0f} {tempo * 1000:>12.2f} {per_kb:>8.1f}")
+    print(f"Rapporto us/KB tra la scala più grande e la più piccola: {per_kb / riferimento:.2f} (≈1 = lineare)")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_prose_stages.py ---
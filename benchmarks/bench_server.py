@@ -0,0 +1,96 @@
+# --- START OF FILE bench_server.py ---
+"""
+Benchmark della modalità --server di md_to_latex_converter.py.
+
+Genera una tesina sintetica (corpus_sintetico.py), avvia il convertitore con --server
+e invia una serie di richieste "convert" per un capitolo: metà con il testo invariato,
+metà con una nota nuova, che costringe il server ad aggiornare la bibliografia.
+Stampa la latenza mediana e massima delle richieste e, per confronto, il tempo di
+un'esecuzione completa del convertitore da linea di comando con --force.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench_server.py [--pagine 200] [--richieste 50]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus_sintetico import scrivi_tesi  # noqa: E402
+
+CONVERTITORE = Path(__file__).resolve().parent.parent / "md_to_latex_converter.py"
+PAGINE = 200
+RICHIESTE = 50
+
+# Esegue il convertitore con l'ordine dei file e le persone della tesina sintetica
+AVVIO = """
+import json, sys
+sys.path.insert(0, {cartella!r})
+import md_to_latex_converter as conv
+impostazioni = json.load(open("impostazioni.json", encoding="utf-8"))
+conv.MD_FILES_ORDER = impostazioni["ordine"]
+conv.KNOWN_PEOPLE.update(impostazioni["persone"])
+conv.main(sys.argv[1:])
+"""
+
+def comando(*argomenti) -> list:
+    return [sys.executable, "-c", AVVIO.format(cartella=str(CONVERTITORE.parent)), *argomenti]
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Latenza delle richieste di --server rispetto a una conversione da linea di comando.")
+    parser.add_argument("--pagine", type=int, default=PAGINE, help=f"pagine della tesina sintetica (default: {PAGINE})")
+    parser.add_argument("--richieste", type=int, default=RICHIESTE, help=f"richieste da inviare (default: {RICHIESTE})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    with tempfile.TemporaryDirectory(prefix="bench_server_") as temporanea:
+        directory = Path(temporanea)
+        ordine, persone = scrivi_tesi(directory, args.pagine)
+        (directory / "impostazioni.json").write_text(json.dumps({"ordine": ordine, "persone": persone}), encoding="utf-8")
+        capitolo = ordine[1]
+        testo = (directory / "MarkDownSections" / capitolo).read_text(encoding="utf-8")
+        print(f"Tesina di {args.pagine} pagine, richieste sul file {capitolo} ({len(testo) / 1024:.0f} KB)")
+
+        inizio = time.perf_counter()
+        subprocess.run(comando("--force"), cwd=directory, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        linea_di_comando = time.perf_counter() - inizio
+
+        server = subprocess.Popen(comando("--server"), cwd=directory, text=True, encoding="utf-8",
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        inizio = time.perf_counter()
+        server.stdin.write(json.dumps({"id": 0, "command": "ping"}) + "\n")
+        server.stdin.flush()
+        server.stdout.readline()
+        avvio = time.perf_counter() - inizio
+
+        tempi = {"testo invariato": [], "nota nuova": []}
+        for n in range(args.richieste):
+            nuova_nota = n % 2 == 1
+            buffer = testo + (f"\nRichiamo di prova[^{9000 + n}].\n\n[^{9000 + n}]: Rossi, M., \"Libro {n}\", Einaudi, Torino, 2001.\n"
+                              if nuova_nota else "")
+            inizio = time.perf_counter()
+            server.stdin.write(json.dumps({"id": n + 1, "file": capitolo, "text": buffer}, ensure_ascii=False) + "\n")
+            server.stdin.flush()
+            risposta = json.loads(server.stdout.readline())
+            tempi["nota nuova" if nuova_nota else "testo invariato"].append(time.perf_counter() - inizio)
+            if not risposta["ok"]:
+                sys.exit(f"Richiesta fallita: {risposta['error']}")
+        server.stdin.write(json.dumps({"command": "shutdown"}) + "\n")
+        server.stdin.close()
+        server.wait()
+
+    print(f"{'linea di comando --force:':<28} {linea_di_comando * 1000:8.0f} ms")
+    print(f"{'avvio del server:':<28} {avvio * 1000:8.0f} ms (una tantum)")
+    for caso, valori in tempi.items():
+        print(f"{'richiesta, ' + caso + ':':<28} {statistics.median(valori) * 1000:8.1f} ms mediana, {max(valori) * 1000:.1f} ms massimo")
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE bench_server.py ---
@@ -0,0 +1,145 @@
+# --- START OF FILE corpus_sintetico.py ---
+"""
+Generatore di tesine Markdown sintetiche per i benchmark del convertitore.
+
+Produce una tesina di circa N pagine (introduzione, capitoli, conclusione) che usa tutte
+le costruzioni gestite da md_to_latex_converter.py: titoli, grassetto, virgolette, elenchi
+puntati e numerati, blocchi di codice, codice inline, simboli matematici, persone note
+(per \\persona) e note a piè di pagina bibliografiche, "Ibid.", "cit." e di trascrizione.
+Il contenuto dipende solo dal numero di pagine e dal seme, quindi è riproducibile.
+
+Uso (dalla radice del repository):
+    python benchmarks/corpus_sintetico.py PAGINE DIRECTORY
+scrive DIRECTORY/MarkDownSections/*.md e stampa l'elenco dei file nell'ordine di MD_FILES_ORDER.
+"""
+import random
+import sys
+from pathlib import Path
+
+CARATTERI_PER_PAGINA = 3000
+PAGINE_PER_CAPITOLO = 40
+NUM_PERSONE = 60
+SEME = 42
+
+PAROLE = ("il suono elettronico viene elaborato in tempo reale dallo studio di fonologia con "
+          "oscillatori filtri nastri magnetici e sintesi granulare per la composizione della musica").split()
+COGNOMI = ["Berio", "Maderna", "Stockhausen", "Nono", "Xenakis", "Schaeffer", "Henry", "Risset",
+           "Chowning", "Roads", "Truax", "Smalley", "Wishart", "Vinao", "Sciarrino", "Grisey"]
+NOMI = ["Luciano", "Bruno", "Karlheinz", "Luigi", "Iannis", "Pierre", "Jean", "Claude", "John", "Curtis",
+        "Barry", "Denis", "Trevor", "Alejandro", "Salvatore", "Gérard"]
+EDITORI = [("MIT Press", "Cambridge"), ("Ricordi", "Milano"), ("Einaudi", "Torino"), ("Routledge", "London")]
+CODICE_CSOUND = "instr {n}\n  a1 oscili 0.5, {f}, 1 ; nota \"{n}\" al 50%\n  out a1\nendin"
+CODICE_JSON = '{{"strumento": {n}, "frequenza": {f}, "forme": ["seno", "quadra"]}}'
+CODICE_INLINE = ["a1 oscili", "x^2 + y_1", "sr = 48000", "f ≈ 440", "kfreq * π", "$HOME/csound"]
+
+def genera_persone(rng, n=NUM_PERSONE) -> dict:
+    """Tabella nel formato di KNOWN_PEOPLE: nome completo, iniziale + cognome, cognome."""
+    persone = {}
+    while len(persone) < n:
+        nome, cognome = rng.choice(NOMI), rng.choice(COGNOMI) + rng.choice(["", "i", "o", "ski", "ani"])
+        canonico = f"{nome} {cognome}"
+        persone[canonico] = {
+            "variants": [canonico, f"{nome[0]}. {cognome}", cognome],
+            "birth": str(rng.randint(1900, 1950)),
+            "death": str(rng.randint(1960, 2020)),
+        }
+    return persone
+
+def frase(rng, varianti) -> str:
+    parole = [rng.choice(PAROLE) for _ in range(rng.randint(8, 18))]
+    scelta = rng.random()
+    if scelta < 0.25:
+        parole.insert(rng.randrange(len(parole)), rng.choice(varianti))
+    elif scelta < 0.35:
+        parole.insert(rng.randrange(len(parole)), f"**{rng.choice(PAROLE)}**")
+    elif scelta < 0.45:
+        parole.insert(rng.randrange(len(parole)), f"\"{rng.choice(PAROLE)} {rng.choice(PAROLE)}\"")
+    elif scelta < 0.52:
+        parole.insert(rng.randrange(len(parole)), f"`{rng.choice(CODICE_INLINE)}`")
+    elif scelta < 0.57:
+        parole.append(f"con 2^{rng.randint(8, 24)} campioni ≈ {rng.randint(1, 99)}% ~ in più...")
+    testo = " ".join(parole)
+    return testo[0].upper() + testo[1:] + "."
+
+def nota(rng, n, ultima_bibliografica):
+    """Definizione di nota: bibliografica, Ibid., cit. (rimanda alla precedente) o trascrizione."""
+    scelta = rng.random()
+    if ultima_bibliografica and scelta < 0.2:
+        return "Ibid., p. {}.".format(rng.randint(1, 300)), ultima_bibliografica
+    if ultima_bibliografica and scelta < 0.35:
+        return f"{ultima_bibliografica}, cit., p. {rng.randint(1, 300)}.", ultima_bibliografica
+    if scelta < 0.42:
+        return f"Trascrizione dell'intervista n. {n}.", ultima_bibliografica
+    cognome = rng.choice(COGNOMI)
+    editore, citta = rng.choice(EDITORI)
+    titolo = " ".join(rng.choice(PAROLE) for _ in range(rng.randint(2, 5))).capitalize()
+    return f"{cognome}, {rng.choice(NOMI)[0]}., \"{titolo}\", {editore}, {citta}, {rng.randint(1950, 2023)}.", cognome
+
+def genera_file(rng, titolo, caratteri, varianti) -> str:
+    """Un file Markdown di circa `caratteri` caratteri (note escluse)."""
+    blocchi = [f"# {titolo}\n"]
+    note = []
+    ultima_bibliografica = None
+    lunghezza = 0
+    while lunghezza < caratteri:
+        scelta = rng.random()
+        if scelta < 0.06:
+            blocco = f"## {' '.join(rng.choice(PAROLE) for _ in range(3)).capitalize()}\n"
+        elif scelta < 0.09:
+            blocco = f"### {rng.choice(PAROLE).capitalize()} {{.unnumbered}}\n"
+        elif scelta < 0.14:
+            blocco = "\n".join(f"- {frase(rng, varianti)}" for _ in range(rng.randint(2, 5))) + "\n"
+        elif scelta < 0.19:
+            blocco = "\n".join(f"{i}. {frase(rng, varianti)}" for i in range(1, rng.randint(3, 6))) + "\n"
+        elif scelta < 0.23:
+            linguaggio, modello = rng.choice([("csound", CODICE_CSOUND), ("json", CODICE_JSON)])
+            blocco = f"```{linguaggio}\n{modello.format(n=rng.randint(1, 99), f=rng.randint(100, 900))}\n```\n"
+        else:
+            paragrafo = []
+            for _ in range(rng.randint(3, 7)):
+                testo = frase(rng, varianti)
+                if rng.random() < 0.3:
+                    chiave = len(note) + 1
+                    definizione, ultima_bibliografica = nota(rng, chiave, ultima_bibliografica)
+                    note.append(f"[^{chiave}]: {definizione}")
+                    pagine = f", p. {rng.randint(1, 300)}" if rng.random() < 0.2 else ""
+                    testo = testo[:-1] + f"[^{chiave}{pagine}]."
+                paragrafo.append(testo)
+            blocco = " ".join(paragrafo) + "\n"
+        blocchi.append(blocco)
+        lunghezza += len(blocco)
+    return "\n".join(blocchi) + "\n" + "\n".join(note) + "\n"
+
+def genera_tesi(pagine: int, seme: int = SEME):
+    """Restituisce ({ nome file .md: contenuto } nell'ordine di MD_FILES_ORDER, tabella delle persone)."""
+    rng = random.Random(seme)
+    persone = genera_persone(rng)
+    varianti = [variante for dettagli in persone.values() for variante in dettagli["variants"]]
+    caratteri = pagine * CARATTERI_PER_PAGINA
+    num_capitoli = max(1, round(pagine / PAGINE_PER_CAPITOLO))
+    # Introduzione e conclusione valgono ciascuna circa mezzo capitolo
+    per_capitolo = caratteri // (num_capitoli + 1)
+    files = {"introduzione.md": genera_file(rng, "Introduzione", per_capitolo // 2, varianti)}
+    for n in range(1, num_capitoli + 1):
+        files[f"capitolo{n}.md"] = genera_file(rng, f"Capitolo {n}", per_capitolo, varianti)
+    files["conclusione.md"] = genera_file(rng, "Conclusione", per_capitolo // 2, varianti)
+    return files, persone
+
+def scrivi_tesi(directory: Path, pagine: int, seme: int = SEME):
+    """Scrive la tesina in directory/MarkDownSections; restituisce (MD_FILES_ORDER, persone)."""
+    files, persone = genera_tesi(pagine, seme)
+    cartella = Path(directory) / "MarkDownSections"
+    cartella.mkdir(parents=True, exist_ok=True)
+    for nome, contenuto in files.items():
+        (cartella / nome).write_text(contenuto, encoding="utf-8")
+    return list(files), persone
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Uso: python benchmarks/corpus_sintetico.py PAGINE DIRECTORY")
+    ordine, _ = scrivi_tesi(Path(sys.argv[2]), int(sys.argv[1]))
+    print("\n".join(ordine))
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE corpus_sintetico.py ---
@@ -0,0 +1,603 @@
+# --- START OF FILE latex_bbl.py ---
+"""
+Bibliografia formattata in Python: scrive il .bbl che BibTeX produrrebbe con gli stili
+standard plain, unsrt, abbrv e alpha, senza eseguire bibtex.
+
+Con BibTeX la compilazione richiede xelatex (per scrivere le \\citation nel .aux), bibtex,
+xelatex (per leggere il .bbl) e un ultimo xelatex (per le etichette scritte da \\bibitem).
+Qui le citazioni si leggono direttamente dai sorgenti (main.tex e i file inclusi con
+\\input/\\include, nell'ordine del documento), quindi il .bbl è pronto prima del primo
+passaggio: si risparmiano l'esecuzione di bibtex e un passaggio di XeLaTeX.
+
+Le regole riproducono quelle dei file .bst (ordinamento, formato dei nomi con format.name$,
+punteggiatura dei blocchi, change.case$ dei titoli) per i tipi di voce usati dal convertitore
+(article, book, inproceedings, incollection, misc); gli altri tipi vengono formattati come misc.
+Il .bbl non viene spezzato a 79 colonne come fa bibtex, ma il risultato composto è lo stesso.
+"""
+import re
+from pathlib import Path
+
+# --- Configurazione ---
+BBL_STYLES = ("plain", "unsrt", "abbrv", "alpha")
+# Formato dei nomi degli autori nel testo della voce (format.name$)
+NAME_FORMATS = {"plain": "full", "unsrt": "full", "alpha": "full", "abbrv": "initials"}
+MONTHS = {"jan": "January", "feb": "February", "mar": "March", "apr": "April", "may": "May", "jun": "June",
+          "jul": "July", "aug": "August", "sep": "September", "oct": "October", "nov": "November", "dec": "December"}
+ABBREVIATED_MONTHS = {"jan": "Jan.", "feb": "Feb.", "mar": "Mar.", "apr": "Apr.", "may": "May", "jun": "June",
+                      "jul": "July", "aug": "Aug.", "sep": "Sept.", "oct": "Oct.", "nov": "Nov.", "dec": "Dec."}
+
+TEX_COMMENT_PATTERN = re.compile(r"(?<!\\)%.*")
+BIBLIOGRAPHYSTYLE_PATTERN = re.compile(r"\\bibliographystyle\s*\{([^}]*)\}")
+BIBLIOGRAPHY_PATTERN = re.compile(r"\\bibliography\s*\{([^}]*)\}")
+TEX_INPUT_PATTERN = re.compile(r"\\(?:input|include)\s*\{([^}]+)\}")
+CITE_PATTERN = re.compile(r"\\(?:no)?cite[a-zA-Z]*\*?\s*(?:\[[^\]]*\]\s*){0,2}\{([^}]*)\}")
+# I listati non vengono composti come testo: un \\cite al loro interno non è una citazione
+VERBATIM_PATTERN = re.compile(r"\\begin\{(lstlisting|verbatim)\}.*?\\end\{\1\}", re.DOTALL)
+BIB_ENTRY_START_PATTERN = re.compile(r"@\s*([A-Za-z]+)\s*[{(]")
+BIB_FIELD_NAME_PATTERN = re.compile(r"\s*([^\s=,{}\"#]+)\s*")
+NAME_SEPARATOR_PATTERN = re.compile(r"\s+and\s+", re.IGNORECASE)
+PAGE_RANGE_PATTERN = re.compile(r"(?<!-)-(?!-)")
+
+
+# --- Lettura di main.tex e dei sorgenti ---
+def read_tex(path: Path) -> str:
+    """Testo del file senza commenti ("" se manca)."""
+    try:
+        return TEX_COMMENT_PATTERN.sub("", path.read_text(encoding='utf-8', errors='replace'))
+    except OSError:
+        return ""
+
+def bibliography_settings(main_tex: Path):
+    """(stile, [file .bib]) da \\bibliographystyle e \\bibliography di main.tex; None se il documento non ha bibliografia."""
+    text = read_tex(main_tex)
+    style = BIBLIOGRAPHYSTYLE_PATTERN.search(text)
+    databases = BIBLIOGRAPHY_PATTERN.search(text)
+    if style is None or databases is None:
+        return None
+    bib_files = [Path(name.strip() if name.strip().endswith(".bib") else name.strip() + ".bib")
+                 for name in databases.group(1).split(",") if name.strip()]
+    return style.group(1).strip(), bib_files
+
+def cited_keys(main_tex: Path) -> list:
+    """
+    Chiavi citate con \\cite/\\nocite in main.tex e nei file che include, nell'ordine della
+    prima citazione (l'ordine di unsrt); "*" se c'è \\nocite{*}.
+    """
+    keys = {}
+    visited = set()
+    def scan(path: Path):
+        if path in visited:
+            return
+        visited.add(path)
+        text = VERBATIM_PATTERN.sub("", read_tex(path))
+        inputs = [(match.start(), "input", match.group(1)) for match in TEX_INPUT_PATTERN.finditer(text)]
+        cites = [(match.start(), "cite", match.group(1)) for match in CITE_PATTERN.finditer(text)]
+        for _, kind, argument in sorted(inputs + cites):
+            if kind == "input":
+                name = argument.strip()
+                scan(Path(name if name.endswith(".tex") else name + ".tex"))
+                continue
+            for key in argument.split(","):
+                if key.strip():
+                    keys.setdefault(key.strip(), None)
+    scan(main_tex)
+    return list(keys)
+
+
+# --- Lettura dei file .bib ---
+def _braced_value(text: str, start: int):
+    """(contenuto, posizione dopo la graffa di chiusura) del gruppo che si apre in text[start]."""
+    depth = 0
+    for position in range(start, len(text)):
+        if text[position] == "{":
+            depth += 1
+        elif text[position] == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:position], position + 1
+    return text[start + 1:], len(text)
+
+def _quoted_value(text: str, start: int):
+    """(contenuto, posizione dopo le virgolette di chiusura) della stringa che si apre in text[start]."""
+    depth = 0
+    for position in range(start + 1, len(text)):
+        char = text[position]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == '"' and depth == 0:
+            return text[start + 1:position], position + 1
+    return text[start + 1:], len(text)
+
+def _field_value(text: str, position: int, macros: dict):
+    """Valore di un campo (parti tra graffe, tra virgolette, numeri o macro unite da #) e posizione successiva."""
+    parts = []
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position >= len(text):
+            break
+        if text[position] == "{":
+            value, position = _braced_value(text, position)
+        elif text[position] == '"':
+            value, position = _quoted_value(text, position)
+        else:
+            match = BIB_FIELD_NAME_PATTERN.match(text, position)
+            if not match:
+                break
+            name = match.group(1)
+            value = name if name.isdigit() else macros.get(name.lower(), name)
+            position = match.end()
+        parts.append(value)
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position < len(text) and text[position] == "#":
+            position += 1
+            continue
+        break
+    return "".join(parts), position
+
+def parse_bib(text: str) -> dict:
+    """
+    Voci di un file .bib: { chiave: {"type": tipo in minuscolo, "fields": { campo in minuscolo: valore }} }.
+    Gestisce @string (con le abbreviazioni dei mesi predefinite), la concatenazione con # e ignora
+    @comment e @preamble. Come bibtex, di una chiave ripetuta vale la prima voce.
+    """
+    entries = {}
+    macros = dict(MONTHS)
+    position = 0
+    while True:
+        match = BIB_ENTRY_START_PATTERN.search(text, position)
+        if match is None:
+            break
+        entry_type = match.group(1).lower()
+        body_start = match.end()
+        if entry_type in ("comment", "preamble"):
+            _, position = _braced_value(text, body_start - 1) if text[body_start - 1] == "{" else (None, body_start)
+            continue
+        if entry_type == "string":
+            name_match = BIB_FIELD_NAME_PATTERN.match(text, body_start)
+            if name_match and text.startswith("=", name_match.end()):
+                value, position = _field_value(text, name_match.end() + 1, macros)
+                macros[name_match.group(1).lower()] = value
+            else:
+                position = body_start
+            continue
+        comma = text.find(",", body_start)
+        if comma < 0:
+            break
+        key = text[body_start:comma].strip()
+        fields = {}
+        position = comma + 1
+        while position < len(text):
+            name_match = BIB_FIELD_NAME_PATTERN.match(text, position)
+            if not name_match or not text.startswith("=", name_match.end()):
+                break
+            value, position = _field_value(text, name_match.end() + 1, macros)
+            fields[name_match.group(1).lower()] = " ".join(value.split())
+            while position < len(text) and (text[position].isspace() or text[position] == ","):
+                position += 1
+        if key and key not in entries:
+            entries[key] = {"type": entry_type, "fields": fields}
+    return entries
+
+def read_bib_files(bib_files: list) -> dict:
+    entries = {}
+    for path in bib_files:
+        try:
+            parsed = parse_bib(Path(path).read_text(encoding='utf-8', errors='replace'))
+        except OSError:
+            continue
+        for key, entry in parsed.items():
+            entries.setdefault(key, entry)
+    return entries
+
+
+# --- Nomi (format.name$) ---
+def _split_top_level(text: str, separators: str) -> list:
+    """Divide il testo nei caratteri separatori che non sono dentro graffe."""
+    parts, current, depth = [], [], 0
+    for char in text:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        if depth == 0 and char in separators:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts]
+
+def _is_von_token(token: str) -> bool:
+    """Un token "von" (de, van, della...) inizia con una lettera minuscola fuori dalle graffe."""
+    for char in token:
+        if char == "{":
+            return False
+        if char.isalpha():
+            return char.islower()
+    return False
+
+def parse_name(name: str) -> dict:
+    """Parti del nome secondo BibTeX: "First von Last", "von Last, First" o "von Last, Jr, First"."""
+    commas = _split_top_level(name, ",")
+    if len(commas) == 1:
+        tokens = [token for token in _split_top_level(name, " ~\t\n") if token]
+        if not tokens:
+            return {"first": [], "von": [], "last": [], "jr": []}
+        von_positions = [n for n, token in enumerate(tokens[:-1]) if _is_von_token(token)]
+        if von_positions:
+            return {"first": tokens[:von_positions[0]], "von": tokens[von_positions[0]:von_positions[-1] + 1],
+                    "last": tokens[von_positions[-1] + 1:], "jr": []}
+        return {"first": tokens[:-1], "von": [], "last": tokens[-1:], "jr": []}
+    von_last = [token for token in _split_top_level(commas[0], " ~\t\n") if token]
+    jr = [token for token in _split_top_level(commas[1], " ~\t\n") if token] if len(commas) > 2 else []
+    first = [token for token in _split_top_level(commas[-1], " ~\t\n") if token]
+    von_end = 0
+    for n, token in enumerate(von_last[:-1]):
+        if _is_von_token(token):
+            von_end = n + 1
+    return {"first": first, "von": von_last[:von_end], "last": von_last[von_end:], "jr": jr}
+
+def split_names(names: str) -> list:
+    """Nomi di un campo author/editor, separati da " and " fuori dalle graffe."""
+    result, start = [], 0
+    for match in NAME_SEPARATOR_PATTERN.finditer(names):
+        depth = names.count("{", 0, match.start()) - names.count("}", 0, match.start())
+        if depth == 0:
+            result.append(names[start:match.start()])
+            start = match.end()
+    result.append(names[start:])
+    return [name.strip() for name in result if name.strip()]
+
+def _initial(token: str) -> str:
+    """Iniziale di un token, con i trattini conservati (Jean-Pierre -> J.-P.)."""
+    pieces = []
+    for piece in token.split("-"):
+        if not piece:
+            continue
+        if piece.startswith("{"):
+            group, _ = _braced_value(piece, 0)
+            pieces.append("{" + group + "}")
+        else:
+            pieces.append(piece[0])
+    return ".-".join(pieces) + "."
+
+def _join_tokens(tokens: list) -> str:
+    """Token di una parte del nome: ~ prima dell'ultimo token e dopo un primo token corto, altrimenti spazio."""
+    text = ""
+    for n, token in enumerate(tokens):
+        if n > 0:
+            text += "~" if n == len(tokens) - 1 or len(text) < 3 else " "
+        text += token
+    return text
+
+def _tie(part: str) -> str:
+    """Il ~ discrezionale alla fine di una parte resta ~ solo dopo un testo corto (come format.name$)."""
+    return "~" if len(part) < 3 else " "
+
+def format_name(name: str, style: str = "full") -> str:
+    """Nome per il testo della voce: "{ff~}{vv~}{ll}{, jj}" (plain) o "{f.~}{vv~}{ll}{, jj}" (abbrv)."""
+    parts = parse_name(name)
+    first = [_initial(token) for token in parts["first"]] if style == "initials" else parts["first"]
+    text = ""
+    for tokens in (first, parts["von"]):
+        if tokens:
+            part = _join_tokens(tokens)
+            text += part + _tie(part)
+    text += _join_tokens(parts["last"])
+    if parts["jr"]:
+        text += ", " + _join_tokens(parts["jr"])
+    return text
+
+def format_names(names: str, style: str = "full") -> str:
+    """Elenco dei nomi come format.names: "A", "A and B", "A, B, and C"; "others" finale diventa et~al."""
+    formatted = [format_name(name, style) for name in split_names(names)]
+    if len(formatted) <= 1:
+        return "".join(formatted)
+    last = " et~al." if formatted[-1] == "others" else " and " + formatted[-1]
+    return ", ".join(formatted[:-1]) + ("," if len(formatted) > 2 else "") + last
+
+
+# --- Funzioni di stringa dei .bst ---
+def change_case_title(title: str) -> str:
+    """
+    change.case$ "t": minuscole tranne il primo carattere e quello dopo ": ", senza toccare il testo
+    tra graffe. Come bibtex cambia solo le lettere ASCII.
+    """
+    output = []
+    depth = 0
+    keep_next = True
+    for position, char in enumerate(title):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        if depth == 0 and char.isascii() and char.isalpha() and not keep_next:
+            char = char.lower()
+        if not char.isspace() and char not in "{}":
+            keep_next = False
+        if char == ":" and depth == 0 and title[position + 1:position + 2].isspace():
+            keep_next = True
+        output.append(char)
+    return "".join(output)
+
+def purify(text: str) -> str:
+    """purify$: lettere, cifre e spazi (trattini e ~ diventano spazi), senza comandi e graffe."""
+    text = re.sub(r"\\[A-Za-z]+", "", text).replace("-", " ").replace("~", " ")
+    return "".join(char for char in text if char.isalnum() or char.isspace())
+
+def sortify(text: str) -> str:
+    return purify(text).lower()
+
+def add_period(text: str) -> str:
+    """add.period$: aggiunge il punto se il testo (graffe finali escluse) non finisce con . ? o !."""
+    stripped = text.rstrip("}")
+    if not stripped or stripped[-1] in ".?!":
+        return text
+    return text + "."
+
+def emphasize(text: str) -> str:
+    return "{\\em " + text + "}" if text else ""
+
+def n_dashify(pages: str) -> str:
+    """n.dashify: un trattino singolo tra numeri di pagina diventa --."""
+    return PAGE_RANGE_PATTERN.sub("--", pages)
+
+def multi_page(pages: str) -> bool:
+    return any(char in pages for char in "-,+")
+
+
+# --- Scrittura delle voci (output.nonnull, new.block, new.sentence dei .bst) ---
+class BblEntryWriter:
+    """Lo stato di output dei .bst: before.all, mid.sentence, after.sentence, after.block."""
+    def __init__(self):
+        self.text = ""
+        self.pending = None
+        self.state = "before.all"
+
+    def output(self, value: str):
+        if not value:
+            return
+        if self.pending is not None:
+            if self.state == "mid.sentence":
+                self.text += self.pending + ", "
+            elif self.state == "after.block":
+                self.text += add_period(self.pending) + "\n\\newblock "
+            elif self.state == "after.sentence":
+                self.text += add_period(self.pending) + " "
+            else:
+                self.text += self.pending
+        self.pending = value
+        self.state = "mid.sentence"
+
+    def new_block(self):
+        if self.state != "before.all":
+            self.state = "after.block"
+
+    def new_sentence(self):
+        if self.state not in ("after.block", "before.all"):
+            self.state = "after.sentence"
+
+    def finish(self) -> str:
+        if self.pending is not None:
+            self.text += add_period(self.pending)
+        return self.text
+
+
+def _format_date(fields: dict, style: str) -> str:
+    year = fields.get("year", "")
+    month = fields.get("month", "")
+    if month:
+        months = ABBREVIATED_MONTHS if style == "abbrv" else MONTHS
+        month = months.get(month.lower()[:3], month)
+        return f"{month} {year}".strip()
+    return year
+
+def _format_pages(fields: dict) -> str:
+    pages = fields.get("pages", "")
+    if not pages:
+        return ""
+    return ("pages " if multi_page(pages) else "page ") + n_dashify(pages)
+
+def _format_editors(fields: dict, style: str) -> str:
+    editor = fields.get("editor", "")
+    if not editor:
+        return ""
+    return format_names(editor, style) + (", editors" if len(split_names(editor)) > 1 else ", editor")
+
+def _format_in_booktitle(fields: dict, style: str) -> str:
+    booktitle = fields.get("booktitle", "")
+    if not booktitle:
+        return ""
+    editors = _format_editors(fields, style)
+    return "In " + (editors + ", " if editors else "") + emphasize(booktitle)
+
+def _format_vol_num_pages(fields: dict) -> str:
+    text = fields.get("volume", "")
+    if fields.get("number"):
+        text += "(" + fields["number"] + ")"
+    if fields.get("pages"):
+        text = text + ":" + n_dashify(fields["pages"]) if text else _format_pages(fields)
+    return text
+
+def format_entry(entry: dict, style: str) -> str:
+    """Testo della voce dopo \\bibitem, con la struttura delle funzioni di tipo di plain.bst."""
+    fields = entry["fields"]
+    entry_type = entry["type"]
+    names = NAME_FORMATS[style]
+    authors = format_names(fields["author"], names) if fields.get("author") else ""
+    title = change_case_title(fields.get("title", ""))
+    writer = BblEntryWriter()
+    if entry_type == "article":
+        writer.output(authors)
+        writer.new_block()
+        writer.output(title)
+        writer.new_block()
+        writer.output(emphasize(fields.get("journal", "")))
+        writer.output(_format_vol_num_pages(fields))
+        writer.output(_format_date(fields, style))
+    elif entry_type == "book":
+        writer.output(authors or _format_editors(fields, names))
+        writer.new_block()
+        writer.output(emphasize(fields.get("title", "")))
+        if fields.get("volume"):
+            writer.output("volume " + fields["volume"])
+        writer.new_block()
+        writer.new_sentence()
+        writer.output(fields.get("publisher", ""))
+        writer.output(fields.get("address", ""))
+        writer.output(fields.get("edition", "") and fields["edition"] + " edition")
+        writer.output(_format_date(fields, style))
+    elif entry_type in ("inproceedings", "conference"):
+        writer.output(authors)
+        writer.new_block()
+        writer.output(title)
+        writer.new_block()
+        writer.output(_format_in_booktitle(fields, names))
+        writer.output(fields.get("volume", "") and "volume " + fields["volume"])
+        writer.output(_format_pages(fields))
+        if not fields.get("address"):
+            if fields.get("organization") or fields.get("publisher"):
+                writer.new_sentence()
+            writer.output(fields.get("organization", ""))
+            writer.output(fields.get("publisher", ""))
+            writer.output(_format_date(fields, style))
+        else:
+            writer.output(fields["address"])
+            writer.output(_format_date(fields, style))
+            writer.new_sentence()
+            writer.output(fields.get("organization", ""))
+            writer.output(fields.get("publisher", ""))
+    elif entry_type == "incollection":
+        writer.output(authors)
+        writer.new_block()
+        writer.output(title)
+        writer.new_block()
+        writer.output(_format_in_booktitle(fields, names))
+        writer.output(fields.get("volume", "") and "volume " + fields["volume"])
+        chapter = fields.get("chapter", "")
+        pages = _format_pages(fields)
+        writer.output(("chapter " + chapter + (", " + pages if pages else "")) if chapter else pages)
+        writer.new_sentence()
+        writer.output(fields.get("publisher", ""))
+        writer.output(fields.get("address", ""))
+        writer.output(fields.get("edition", "") and fields["edition"] + " edition")
+        writer.output(_format_date(fields, style))
+    else:
+        # misc (e i tipi non previsti, con le informazioni di pubblicazione che hanno)
+        writer.output(authors)
+        if title or fields.get("howpublished"):
+            writer.new_block()
+        writer.output(title)
+        if fields.get("howpublished"):
+            writer.new_block()
+        writer.output(fields.get("howpublished", ""))
+        for field in ("journal", "booktitle", "school", "institution", "organization", "publisher", "address"):
+            writer.output(emphasize(fields[field]) if field in ("journal", "booktitle") and fields.get(field) else fields.get(field, ""))
+        writer.output(_format_date(fields, style))
+    writer.new_block()
+    writer.output(fields.get("note", ""))
+    return writer.finish()
+
+
+# --- Ordinamento ed etichette ---
+def _sort_names(names: str) -> str:
+    """sort.format.names: "{vv{ } }{ll{ }}{  ff{ }}{  jj{ }}" per ogni nome, con sortify."""
+    formatted = []
+    for name in split_names(names):
+        if name == "others":
+            formatted.append("et al")
+            continue
+        parts = parse_name(name)
+        text = " ".join(parts["von"] + parts["last"])
+        if parts["first"]:
+            text += "  " + " ".join(parts["first"])
+        if parts["jr"]:
+            text += "  " + " ".join(parts["jr"])
+        formatted.append(sortify(text))
+    return "   ".join(formatted)
+
+def _sort_title(title: str) -> str:
+    """sort.format.title: senza l'articolo iniziale inglese (A, An, The)."""
+    for article in ("A ", "An ", "The "):
+        if title.startswith(article):
+            title = title[len(article):]
+            break
+    return sortify(title)
+
+def presort_key(key: str, entry: dict) -> str:
+    """sort.key$ di plain.bst: autori (o curatori, o chiave), anno, titolo."""
+    fields = entry["fields"]
+    names = fields.get("author") or (fields.get("editor") if entry["type"] == "book" else "")
+    sort_names = _sort_names(names) if names else sortify(fields.get("key", key))
+    return sort_names + "    " + sortify(fields.get("year", "")) + "    " + _sort_title(fields.get("title", ""))
+
+def alpha_label(key: str, entry: dict) -> str:
+    """Etichetta di alpha.bst: tre lettere dell'unico autore o le iniziali di più autori, più l'anno a due cifre."""
+    fields = entry["fields"]
+    names_field = fields.get("author") or fields.get("editor") or ""
+    names = split_names(names_field)
+    if not names:
+        label = purify(fields.get("key", key))[:3]
+    elif len(names) == 1:
+        parts = parse_name(names[0])
+        von_initials = "".join(purify(token)[:1] for token in parts["von"])
+        label = von_initials + purify(" ".join(parts["last"]))[:1] if von_initials else purify(" ".join(parts["last"]))[:3]
+    else:
+        initials = []
+        for name in names[:4 if len(names) <= 4 else 3]:
+            if name == "others":
+                initials.append("{\\etalchar{+}}")
+                continue
+            parts = parse_name(name)
+            initials.append("".join(purify(token)[:1] for token in parts["von"] + parts["last"][:1]))
+        if len(names) > 4:
+            initials.append("{\\etalchar{+}}")
+        label = "".join(initials)
+    year = purify(fields.get("year", ""))
+    return label + year[-2:]
+
+def format_bbl(style: str, citations: list, entries: dict):
+    """
+    Contenuto del .bbl per le chiavi citate (nell'ordine del documento) e le voci disponibili.
+    Restituisce (testo, chiavi citate senza voce).
+    """
+    if "*" in citations:
+        citations = [key for key in citations if key != "*"] + sorted(key for key in entries if key not in citations)
+    missing = [key for key in citations if key not in entries]
+    keys = [key for key in citations if key in entries]
+    labels = {}
+    if style == "alpha":
+        base_labels = {key: alpha_label(key, entries[key]) for key in keys}
+        keys.sort(key=lambda key: (sortify(base_labels[key]), presort_key(key, entries[key])))
+        counts = {}
+        for label in base_labels.values():
+            counts[label] = counts.get(label, 0) + 1
+        suffixes = {}
+        for key in keys:
+            label = base_labels[key]
+            if counts[label] > 1:
+                suffixes[label] = suffixes.get(label, 0) + 1
+                label += chr(ord("a") + suffixes[label] - 1)
+            labels[key] = label
+        widest = max(labels.values(), key=len, default="")
+    else:
+        if style != "unsrt":
+            keys.sort(key=lambda key: presort_key(key, entries[key]))
+        widest = str(len(keys))
+
+    lines = []
+    if any("\\etalchar" in label for label in labels.values()):
+        lines.append("\\newcommand{\\etalchar}[1]{$^{#1}$}")
+    lines.append(f"\\begin{{thebibliography}}{{{widest}}}")
+    for key in keys:
+        lines.append("")
+        lines.append(f"\\bibitem[{labels[key]}]{{{key}}}" if labels else f"\\bibitem{{{key}}}")
+        lines.append(format_entry(entries[key], style))
+    lines.append("")
+    lines.append("\\end{thebibliography}")
+    return "\n".join(lines) + "\n", missing
+# --- END OF FILE latex_bbl.py ---
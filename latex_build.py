@@ -0,0 +1,420 @@
+# --- START OF FILE latex_build.py ---
+"""
+Compila main.tex eseguendo solo i passaggi LaTeX necessari.
+
+Al posto della sequenza fissa xelatex, bibtex, xelatex, xelatex del Makefile:
+- XeLaTeX viene rieseguito solo finché i file ausiliari (.aux, .toc, .out, .bbl, ...)
+  cambiano da un passaggio all'altro, cioè fino al punto fisso;
+- BibTeX viene eseguito solo se cambia l'insieme delle citazioni (\\citation, \\bibdata,
+  \\bibstyle nei file .aux) o uno dei file .bib usati, oppure se manca il .bbl;
+- se nessun sorgente è cambiato dall'ultima compilazione riuscita non viene eseguito nulla.
+
+Con --preview (e sections/all.tex generato con md_to_latex_converter.py --include) vengono
+ricompilate con \\includeonly solo le sezioni riscritte dal convertitore, riusando gli .aux
+delle altre sezioni per numeri di pagina e riferimenti.
+
+Con --bbl la bibliografia viene formattata in Python (latex_bbl.py) prima del primo passaggio,
+nello stile di \\bibliographystyle di main.tex: bibtex non viene mai eseguito e le etichette
+delle citazioni sono pronte un passaggio prima. Con uno stile non supportato si usa bibtex.
+
+Con --format il preambolo (classe e pacchetti di main.tex e di ME_AQ_temp.sty) viene
+precompilato in un formato XeLaTeX, rigenerato solo quando cambia: ogni passaggio parte
+dal formato invece di ricaricare tutti i pacchetti.
+
+Uso: python latex_build.py [--main main] [--force] [--preview] [--format] [--bbl]
+"""
+import re
+import sys
+import json
+import time
+import os
+import shutil
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+import logging
+
+from md_to_latex_converter import (BUILD_CACHE_DIR, ALL_TEX_FILE_GENERATED, LISTINGS_DIR, write_file_if_changed,
+                                   load_changed_sections, save_changed_sections, write_bbl_file)
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# --- Configurazione ---
+LATEX = "xelatex"
+BIBTEX = "bibtex"
+# Nome del passo nel report quando il .bbl è generato in Python (--bbl)
+PYTHON_BBL = "latex_bbl"
+# Come nel Makefile, più nonstopmode per non restare in attesa di input in caso di errore
+LATEX_OPTIONS = ["--halt-on-error", "-interaction=nonstopmode"]
+MAX_LATEX_PASSES = 5
+
+# Stato dell'ultima compilazione (firma delle citazioni, hash dei sorgenti)
+LATEX_BUILD_STATE_FILE = BUILD_CACHE_DIR / "latex_build.json"
+
+# File ausiliari letti dal passaggio successivo, oltre ai .aux
+AUXILIARY_EXTENSIONS = (".toc", ".lof", ".lot", ".out", ".bbl")
+# Messaggi con cui LaTeX (o un pacchetto) chiede esplicitamente un altro passaggio
+RERUN_PATTERN = re.compile(r"Rerun to get|Label\(s\) may have changed|Please rerun LaTeX")
+AUX_INPUT_PATTERN = re.compile(r"\\@input\{([^}]+)\}")
+AUX_BIBTEX_LINE_PATTERN = re.compile(r"\\(?:citation|bibdata|bibstyle)\{[^}]*\}")
+AUX_BIBDATA_PATTERN = re.compile(r"\\bibdata\{([^}]*)\}")
+# Formato precompilato del preambolo (--format)
+FORMAT_DIR = BUILD_CACHE_DIR / "format"
+# Da incrementare quando cambia il modo in cui viene generato il sorgente del formato
+FORMAT_VERSION = "1"
+PREAMBLE_END_PATTERN = re.compile(r"\\begin\s*\{document\}")
+DOCUMENTCLASS_PATTERN = re.compile(r"\\documentclass\s*(?:\[[^\]]*\])?\s*\{[^}]*\}")
+PACKAGE_PATTERN = re.compile(r"\\(?:usepackage|RequirePackage)\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}(?:\s*\[[^\]]*\])?")
+TEX_COMMENT_PATTERN = re.compile(r"(?<!\\)%.*")
+INCLUDE_PATTERN = re.compile(r"^\\include\{([^}]+)\}", re.MULTILINE)
+
+
+# --- Funzioni di Utility ---
+def file_hash(path: Path):
+    """Hash SHA-256 del file, None se non esiste."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+def load_latex_build_state() -> dict:
+    try:
+        with open(LATEX_BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_latex_build_state(state: dict):
+    try:
+        BUILD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_file_if_changed(LATEX_BUILD_STATE_FILE, json.dumps(state, indent=1, sort_keys=True))
+    except Exception as e:
+        logging.warning(f"Impossibile salvare lo stato della compilazione {LATEX_BUILD_STATE_FILE}: {e}")
+
+def aux_files(main: str) -> list:
+    """main.aux più i .aux inclusi da \\@input (es. quelli scritti da \\include), nell'ordine in cui compaiono."""
+    found = []
+    pending = [Path(main + ".aux")]
+    while pending:
+        aux_path = pending.pop(0)
+        if aux_path in found or not aux_path.is_file():
+            continue
+        found.append(aux_path)
+        content = aux_path.read_text(encoding='utf-8', errors='replace')
+        pending.extend(Path(name) for name in AUX_INPUT_PATTERN.findall(content))
+    return found
+
+def auxiliary_snapshot(main: str) -> dict:
+    """Hash dei file ausiliari: se non cambiano durante un passaggio, il documento è stabile."""
+    snapshot = {str(path): file_hash(path) for path in aux_files(main)}
+    for extension in AUXILIARY_EXTENSIONS:
+        path = Path(main + extension)
+        snapshot[str(path)] = file_hash(path)
+    return snapshot
+
+def bibtex_signature(main: str):
+    """
+    Firma di ciò che determina il .bbl: righe \\citation, \\bibdata, \\bibstyle dei .aux
+    e contenuto dei file .bib elencati in \\bibdata. None se il documento non usa BibTeX.
+    """
+    lines = []
+    for aux_path in aux_files(main):
+        lines.extend(AUX_BIBTEX_LINE_PATTERN.findall(aux_path.read_text(encoding='utf-8', errors='replace')))
+    bibdata = [name.strip() for line in lines for match in AUX_BIBDATA_PATTERN.findall(line) for name in match.split(",")]
+    if not bibdata:
+        return None
+    bib_hashes = {name: file_hash(Path(name if name.endswith(".bib") else name + ".bib")) for name in sorted(set(bibdata))}
+    payload = json.dumps([sorted(set(lines)), bib_hashes], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def source_files(main: str) -> list:
+    """Sorgenti del PDF (come SOURCES nel Makefile): main.tex, stili, sezioni, listati esterni e .bib."""
+    sources = [Path(main + ".tex")]
+    sources += sorted(Path(".").glob("*.sty"))
+    sources += sorted(Path("sections").rglob("*.tex"))
+    sources += sorted(path for path in LISTINGS_DIR.glob("*") if not path.name.endswith(".tex"))
+    sources += sorted(Path(".").glob("*.bib"))
+    return sources
+
+def sources_hash(main: str) -> str:
+    payload = json.dumps({str(path): file_hash(path) for path in source_files(main)}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def run_tool(command: list, log_path: Path = None, env: dict = None) -> float:
+    """Esegue un comando e ne restituisce la durata; in caso di errore mostra la fine del log ed esce."""
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    except FileNotFoundError:
+        logging.error(f"Comando non trovato: {command[0]} (è installata una distribuzione TeX?)")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        output = result.stdout.decode('utf-8', errors='replace')
+        if log_path is not None and log_path.is_file():
+            output = log_path.read_text(encoding='utf-8', errors='replace')
+        print("\n".join(output.splitlines()[-30:]))
+        logging.error(f"Comando fallito ({result.returncode}): {' '.join(command)}")
+        sys.exit(result.returncode)
+    return elapsed
+
+def included_sections() -> list:
+    """Argomenti dei \\include di all.tex (vuoto se all.tex usa \\input)."""
+    try:
+        return INCLUDE_PATTERN.findall(ALL_TEX_FILE_GENERATED.read_text(encoding='utf-8'))
+    except OSError:
+        return []
+
+def rerun_requested(main: str) -> bool:
+    log_path = Path(main + ".log")
+    try:
+        return bool(RERUN_PATTERN.search(log_path.read_text(encoding='utf-8', errors='replace')))
+    except OSError:
+        return False
+
+
+# --- Formato precompilato ---
+def package_lines(text: str, seen: set) -> list:
+    """
+    Righe \\usepackage / \\RequirePackage del testo, nell'ordine di caricamento. I pacchetti locali
+    (file .sty nella directory corrente, come ME_AQ_temp.sty) non vengono inclusi nel formato
+    perché contengono anche impostazioni dei font, ma i pacchetti che richiedono sì.
+    """
+    lines = []
+    for match in PACKAGE_PATTERN.finditer(TEX_COMMENT_PATTERN.sub("", text)):
+        for name in (name.strip() for name in match.group(1).split(",")):
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            local_style = Path(name + ".sty")
+            if local_style.is_file():
+                lines.extend(package_lines(local_style.read_text(encoding='utf-8', errors='replace'), seen))
+            elif "," in match.group(1):
+                lines.append(f"\\usepackage{{{name}}}")
+            else:
+                lines.append(match.group(0).replace("\\RequirePackage", "\\usepackage", 1))
+    return lines
+
+def format_source(main: str):
+    """
+    Sorgente del formato: la classe e i pacchetti del preambolo di main.tex (e dei .sty locali).
+    XeTeX non può salvare in un formato i font di sistema già caricati, quindi \\setmainfont,
+    \\setmonofont e il resto del preambolo vengono eseguiti normalmente a ogni passaggio: il
+    formato evita di rileggere e inizializzare i pacchetti, che è la parte più lenta.
+    Nel formato \\documentclass diventa un comando vuoto e i \\usepackage di main.tex trovano
+    i pacchetti già caricati, così main.tex si compila senza modifiche. None se manca la classe.
+    """
+    text = Path(main + ".tex").read_text(encoding='utf-8', errors='replace')
+    end = PREAMBLE_END_PATTERN.search(text)
+    preamble = TEX_COMMENT_PATTERN.sub("", text[:end.start()] if end else text)
+    documentclass = DOCUMENTCLASS_PATTERN.search(preamble)
+    if documentclass is None:
+        return None
+    lines = [documentclass.group(0), *package_lines(preamble[documentclass.end():], set())]
+    lines += [
+        "\\makeatletter",
+        "\\def\\documentclass{\\@ifnextchar[\\mdtl@skipclass{\\mdtl@skipclass[]}}",
+        "\\def\\mdtl@skipclass[#1]#2{\\@ifnextchar[\\mdtl@skipversion{}}",
+        "\\def\\mdtl@skipversion[#1]{}",
+        "\\makeatother",
+        "\\dump",
+    ]
+    return "\n".join(lines) + "\n"
+
+def engine_signature() -> str:
+    """Percorso e data di modifica dell'eseguibile: un formato vale solo per la versione che l'ha creato."""
+    path = shutil.which(LATEX)
+    try:
+        return f"{path}:{os.stat(path).st_mtime_ns}" if path else ""
+    except OSError:
+        return str(path)
+
+def format_environment() -> dict:
+    """Ambiente in cui kpathsea trova anche i formati di FORMAT_DIR (i : finali mantengono i percorsi predefiniti)."""
+    env = dict(os.environ)
+    env["TEXFORMATS"] = f"{FORMAT_DIR.resolve()}{os.pathsep}{env.get('TEXFORMATS', '')}{os.pathsep}"
+    return env
+
+def prepare_format(main: str, force: bool = False):
+    """
+    Restituisce il nome del formato precompilato per main.tex, creandolo se il sorgente del formato
+    (derivato da preambolo e .sty) o l'eseguibile sono cambiati. None se il formato non si può creare:
+    in quel caso la compilazione procede normalmente.
+    """
+    source = format_source(main)
+    if source is None:
+        logging.warning(f"Nessun \\documentclass in {main}.tex: compilo senza formato precompilato.")
+        return None
+    format_name = f"{main}-preamble"
+    format_key = hashlib.sha256(f"{FORMAT_VERSION}\n{engine_signature()}\n{source}".encode('utf-8')).hexdigest()
+    state = load_latex_build_state()
+    if not force and state.get("format_key") == format_key and (FORMAT_DIR / (format_name + ".fmt")).is_file():
+        return format_name
+
+    FORMAT_DIR.mkdir(parents=True, exist_ok=True)
+    source_path = FORMAT_DIR / (format_name + ".tex")
+    write_file_if_changed(source_path, source)
+    command = [LATEX, "-ini", f"-jobname={format_name}", f"-output-directory={FORMAT_DIR}",
+               *LATEX_OPTIONS, f"&{LATEX}", str(source_path)]
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except FileNotFoundError:
+        logging.error(f"Comando non trovato: {LATEX} (è installata una distribuzione TeX?)")
+        sys.exit(1)
+    if result.returncode != 0 or not (FORMAT_DIR / (format_name + ".fmt")).is_file():
+        logging.warning(f"Impossibile creare il formato precompilato (vedi {FORMAT_DIR / (format_name + '.log')}): "
+                        "compilo senza formato.")
+        return None
+    logging.info(f"Formato precompilato {format_name}.fmt creato in {time.perf_counter() - started:.2f} s")
+    state["format_key"] = format_key
+    save_latex_build_state(state)
+    return format_name
+
+def latex_command(main: str, format_name: str = None, includeonly: list = None) -> list:
+    """Comando XeLaTeX per main.tex, eventualmente dal formato precompilato e con \\includeonly."""
+    command = [LATEX]
+    if format_name:
+        command.append(f"-fmt={format_name}")
+    command += LATEX_OPTIONS
+    if includeonly:
+        # -jobname mantiene main.aux, main.pdf, ... come nella compilazione completa
+        command += [f"-jobname={main}", f"\\includeonly{{{','.join(includeonly)}}}\\input{{{main}.tex}}"]
+    else:
+        command.append(main + ".tex")
+    return command
+
+
+# --- Compilazione ---
+def build_document(main: str = "main", force: bool = False, max_passes: int = MAX_LATEX_PASSES,
+                   format_name: str = None, includeonly: list = None, python_bbl: bool = False) -> list:
+    """
+    Compila main.tex con il minimo numero di passaggi e restituisce [(strumento, secondi)].
+    format_name è il formato precompilato da cui partire (vedi prepare_format).
+    Con python_bbl il .bbl viene scritto in Python prima del primo passaggio e bibtex non viene eseguito.
+    Con includeonly è un'anteprima: il PDF non è completo e la prossima compilazione
+    normale non può considerarlo aggiornato.
+    """
+    state = load_latex_build_state()
+    if force:
+        state.pop("bibtex_signature", None)
+    partial = bool(includeonly)
+    current_sources = sources_hash(main)
+    if (not force and not partial and not state.get("partial") and state.get("sources") == current_sources
+            and Path(main + ".pdf").is_file()):
+        logging.info(f"Nessun sorgente modificato dall'ultima compilazione: {main}.pdf è aggiornato.")
+        return []
+
+    command = latex_command(main, format_name, includeonly)
+    env = format_environment() if format_name else None
+    steps = []
+    use_bibtex = True
+    if python_bbl:
+        started = time.perf_counter()
+        if write_bbl_file(Path(main + ".tex")) is not None:
+            steps.append((PYTHON_BBL, time.perf_counter() - started))
+            use_bibtex = False
+            # Il .bbl non è più quello di bibtex: senza --bbl bibtex va rieseguito
+            state.pop("bibtex_signature", None)
+            logging.info(f"Bibliografia generata in Python in {steps[-1][1]:.2f} s: salto {BIBTEX}")
+    for n_pass in range(1, max_passes + 1):
+        before = auxiliary_snapshot(main)
+        elapsed = run_tool(command, Path(main + ".log"), env)
+        steps.append((LATEX, elapsed))
+        logging.info(f"Passaggio {n_pass}: {LATEX} in {elapsed:.2f} s")
+
+        signature = bibtex_signature(main) if use_bibtex else None
+        if signature is not None and (signature != state.get("bibtex_signature") or not Path(main + ".bbl").is_file()):
+            elapsed = run_tool([BIBTEX, main], Path(main + ".blg"))
+            steps.append((BIBTEX, elapsed))
+            state["bibtex_signature"] = signature
+            logging.info(f"Citazioni cambiate: {BIBTEX} in {elapsed:.2f} s")
+        elif signature is not None and n_pass == 1:
+            logging.info(f"Citazioni invariate: salto {BIBTEX}")
+
+        if auxiliary_snapshot(main) == before and not rerun_requested(main):
+            logging.info(f"File ausiliari stabili dopo {n_pass} passaggi di {LATEX}.")
+            break
+    else:
+        logging.warning(f"File ausiliari ancora instabili dopo {max_passes} passaggi: riferimenti forse da verificare.")
+
+    state["sources"] = current_sources
+    state["partial"] = partial
+    state["last_build"] = [{"tool": tool, "seconds": round(seconds, 3)} for tool, seconds in steps]
+    save_latex_build_state(state)
+    # Le sezioni riscritte dal convertitore sono ora compilate
+    save_changed_sections({})
+    return steps
+
+def preview_document(main: str = "main", max_passes: int = MAX_LATEX_PASSES, format_name: str = None,
+                     python_bbl: bool = False) -> list:
+    """
+    Anteprima veloce: compila con \\includeonly solo le sezioni riscritte dal convertitore
+    dall'ultima compilazione (e quelle mai compilate, senza .aux). Le altre sezioni non vengono
+    composte ma i loro .aux restano validi, quindi numeri di pagina, indice e riferimenti
+    sono quelli dell'ultima compilazione completa.
+    Ricade sulla compilazione completa quando l'anteprima non è possibile.
+    """
+    included = included_sections()
+    if not included:
+        logging.warning(f"{ALL_TEX_FILE_GENERATED} non usa \\include (rigenerarlo con md_to_latex_converter.py --include): compilazione completa.")
+        return build_document(main, max_passes=max_passes, format_name=format_name, python_bbl=python_bbl)
+    changed = load_changed_sections()
+    if changed["all_tex_changed"] or not Path(main + ".aux").is_file():
+        logging.info("Elenco delle sezioni cambiato o nessuna compilazione precedente: compilazione completa.")
+        return build_document(main, max_passes=max_passes, format_name=format_name, python_bbl=python_bbl)
+
+    selected = [name for name in included if name in changed["sections"] or not Path(name + ".aux").is_file()]
+    if not selected:
+        state = load_latex_build_state()
+        if state.get("sources") == sources_hash(main) and Path(main + ".pdf").is_file():
+            logging.info(f"Nessuna sezione modificata dall'ultima compilazione: {main}.pdf è aggiornato.")
+            return []
+        logging.info("Nessuna sezione modificata ma sono cambiati altri sorgenti: compilazione completa.")
+        return build_document(main, max_passes=max_passes, format_name=format_name, python_bbl=python_bbl)
+    if len(selected) == len(included):
+        return build_document(main, max_passes=max_passes, format_name=format_name, python_bbl=python_bbl)
+
+    logging.info(f"Anteprima di {len(selected)} sezioni su {len(included)}: {', '.join(selected)}")
+    return build_document(main, max_passes=max_passes, format_name=format_name, includeonly=selected,
+                          python_bbl=python_bbl)
+
+def print_build_report(steps: list):
+    if not steps:
+        return
+    latex_passes = sum(1 for tool, _ in steps if tool == LATEX)
+    bibtex_runs = sum(1 for tool, _ in steps if tool == BIBTEX)
+    python_bbl = ", .bbl generato in Python" if any(tool == PYTHON_BBL for tool, _ in steps) else ""
+    print(f"\n--- Compilazione: {latex_passes} passaggi di {LATEX}, {bibtex_runs} di {BIBTEX}{python_bbl}, "
+          f"{sum(seconds for _, seconds in steps):.2f} s totali ---")
+    for n, (tool, seconds) in enumerate(steps, 1):
+        print(f"{n:>3}. {tool:<10} {seconds:>8.2f} s")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Compila il PDF eseguendo solo i passaggi LaTeX/BibTeX necessari.")
+    parser.add_argument("--main", default="main", help="nome del file LaTeX principale senza estensione (default: main)")
+    parser.add_argument("--force", action="store_true", help="ricompila anche se i sorgenti non sono cambiati e riesegue BibTeX")
+    parser.add_argument("--max-passes", type=int, default=MAX_LATEX_PASSES, metavar="N",
+                        help=f"numero massimo di passaggi di {LATEX} (default: {MAX_LATEX_PASSES})")
+    parser.add_argument("--preview", action="store_true",
+                        help="compila solo le sezioni cambiate con \\includeonly (richiede md_to_latex_converter.py --include)")
+    parser.add_argument("--format", action="store_true",
+                        help="parte da un formato precompilato con classe e pacchetti del preambolo, rigenerato solo quando cambiano")
+    parser.add_argument("--bbl", action="store_true",
+                        help=f"genera il .bbl in Python nello stile di \\bibliographystyle invece di eseguire {BIBTEX}")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    format_name = prepare_format(args.main, args.force) if args.format else None
+    if args.preview and not args.force:
+        steps = preview_document(args.main, args.max_passes, format_name, args.bbl)
+    else:
+        steps = build_document(args.main, args.force, args.max_passes, format_name, python_bbl=args.bbl)
+    print_build_report(steps)
+
+
+if __name__ == "__main__":
+    main()
+# --- END OF FILE latex_build.py ---
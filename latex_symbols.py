@@ -0,0 +1,103 @@
+# --- START OF FILE latex_symbols.py ---
+"""
+Tabelle di traduzione da caratteri Unicode a LaTeX, condivise dalle conversioni del testo
+normale e del codice inline di md_to_latex_converter.py.
+
+Ogni simbolo è associato al suo comando in modalità matematica. Le tabelle vengono costruite
+una sola volta all'importazione: l'escape di un segmento è così un'unica passata lineare sul
+testo, qualunque sia il numero di simboli.
+- Codice inline: tabella per str.translate, con gli escape ASCII di \texttt{} e i simboli insieme.
+- Testo normale: una regex con la classe di tutti i simboli e un dizionario per le sostituzioni.
+  Il testo italiano contiene sempre lettere accentate e su una stringa non ASCII str.translate
+  cerca ogni carattere nel dizionario, risultando circa dieci volte più lento della regex,
+  che si ferma solo sui (pochi) simboli presenti.
+"""
+import re
+
+# --- Simboli (carattere -> comando LaTeX in modalità matematica) ---
+GREEK_LETTERS = {
+    'α': r'\alpha', 'β': r'\beta', 'γ': r'\gamma', 'δ': r'\delta', 'ε': r'\varepsilon',
+    'ζ': r'\zeta', 'η': r'\eta', 'θ': r'\theta', 'ι': r'\iota', 'κ': r'\kappa',
+    'λ': r'\lambda', 'μ': r'\mu', 'ν': r'\nu', 'ξ': r'\xi', 'π': r'\pi',
+    'ρ': r'\rho', 'σ': r'\sigma', 'ς': r'\varsigma', 'τ': r'\tau', 'υ': r'\upsilon',
+    'φ': r'\varphi', 'χ': r'\chi', 'ψ': r'\psi', 'ω': r'\omega',
+    'Γ': r'\Gamma', 'Δ': r'\Delta', 'Θ': r'\Theta', 'Λ': r'\Lambda', 'Ξ': r'\Xi',
+    'Π': r'\Pi', 'Σ': r'\Sigma', 'Υ': r'\Upsilon', 'Φ': r'\Phi', 'Ψ': r'\Psi', 'Ω': r'\Omega',
+    'µ': r'\mu',             # Segno micro (U+00B5), diverso dalla lettera greca
+}
+
+ARROWS = {
+    '→': r'\rightarrow', '←': r'\leftarrow', '↔': r'\leftrightarrow',
+    '↑': r'\uparrow', '↓': r'\downarrow', '↕': r'\updownarrow',
+    '⇒': r'\Rightarrow', '⇐': r'\Leftarrow', '⇔': r'\Leftrightarrow',
+    '↗': r'\nearrow', '↘': r'\searrow', '↖': r'\nwarrow', '↙': r'\swarrow',
+    '↦': r'\mapsto', '⟶': r'\longrightarrow', '⟵': r'\longleftarrow', '⟹': r'\Longrightarrow',
+}
+
+MATH_OPERATORS = {
+    '≈': r'\approx', '×': r'\times', '÷': r'\div', '±': r'\pm', '∓': r'\mp',
+    '∞': r'\infty', '≤': r'\leq', '≥': r'\geq', '≠': r'\neq', '≡': r'\equiv',
+    '≅': r'\cong', '∝': r'\propto', '≪': r'\ll', '≫': r'\gg', '∘': r'\circ',
+    '√': r'\surd', '∑': r'\sum', '∏': r'\prod', '∫': r'\int', '∂': r'\partial',
+    '∇': r'\nabla', '∈': r'\in', '∉': r'\notin', '⊂': r'\subset', '⊆': r'\subseteq',
+    '∪': r'\cup', '∩': r'\cap', '∅': r'\emptyset', '∀': r'\forall', '∃': r'\exists',
+    '¬': r'\neg', '∧': r'\wedge', '∨': r'\vee', '⋅': r'\cdot', '′': r'\prime',
+}
+
+SUPERSCRIPTS = {
+    '⁰': '^0', '¹': '^1', '²': '^2', '³': '^3', '⁴': '^4',
+    '⁵': '^5', '⁶': '^6', '⁷': '^7', '⁸': '^8', '⁹': '^9',
+}
+
+MUSIC_SYMBOLS = {
+    '♭': r'\flat', '♯': r'\sharp', '♮': r'\natural',
+}
+
+MATH_SYMBOLS = {**GREEK_LETTERS, **ARROWS, **MATH_OPERATORS, **SUPERSCRIPTS, **MUSIC_SYMBOLS}
+
+# Nel testo normale le lettere greche restano come sono (sono anche parole e citazioni in greco),
+# tranne π; gli esponenti hanno già il loro glifo nel font del documento
+PROSE_SYMBOLS = {**MATH_OPERATORS, **ARROWS, **MUSIC_SYMBOLS, 'π': GREEK_LETTERS['π']}
+
+# Caratteri ASCII speciali dentro \texttt{}
+TEXTTT_SPECIAL_CHARACTERS = {
+    '\\': r'\textbackslash{}',
+    '{': r'\{',
+    '}': r'\}',
+    '_': r'\_',
+    '^': r'\textasciicircum{}',
+    '-': r'{-}',                 # Evita le legature -- e --- nel font monospaziato
+    '&': r'\&',
+    '%': r'\%',
+    '#': r'\#',
+    '$': r'\$',
+    '~': r'\textasciitilde{}',
+}
+
+# --- Tabelle di traduzione ---
+def math_symbol_replacements(symbols: dict, before: str = "", after: str = "") -> dict:
+    """Sostituzione di ogni simbolo: $comando$, racchiuso tra before e after."""
+    return {char: f"{before}${command}${after}" for char, command in symbols.items()}
+
+def symbol_pattern(symbols: dict):
+    """Regex che trova (e cattura) uno qualsiasi dei simboli."""
+    return re.compile("([" + re.escape("".join(symbols)) + "])")
+
+PROSE_REPLACEMENTS = math_symbol_replacements(PROSE_SYMBOLS)
+PROSE_SYMBOL_PATTERN = symbol_pattern(PROSE_SYMBOLS)
+
+def replace_prose_symbols(text: str) -> tuple:
+    """Sostituisce i simboli di PROSE_SYMBOLS nel testo; restituisce (testo, numero di sostituzioni)."""
+    # split con il gruppo catturato mette i simboli negli indici dispari: nessuna chiamata Python per simbolo
+    parts = PROSE_SYMBOL_PATTERN.split(text)
+    parts[1::2] = map(PROSE_REPLACEMENTS.__getitem__, parts[1::2])
+    return "".join(parts), len(parts) // 2
+
+# Nel codice inline un simbolo chiude \texttt{}, va in modalità matematica e riapre \texttt{};
+# gli escape ASCII sono nella stessa tabella, quindi nessuna sostituzione viene ripetuta sull'output di un'altra
+INLINE_CODE_TRANSLATION = {
+    **str.maketrans(TEXTTT_SPECIAL_CHARACTERS),
+    **str.maketrans(math_symbol_replacements(MATH_SYMBOLS, before="}", after="\\texttt{")),
+}
+INLINE_CODE_SYMBOL_PATTERN = symbol_pattern(MATH_SYMBOLS)
+# --- END OF FILE latex_symbols.py ---
@@ -1,8 +1,29 @@
 # --- START OF FILE md_to_latex_converter.py ---
 import re
 import os
+import sys
+import time
+import json
+import csv
+import io
+import socket
+import hashlib
+import bisect
+import copy
+import zlib
+import argparse
+import contextlib
+import inspect
+import subprocess
+import unicodedata
 from pathlib import Path
+from collections import namedtuple
 import logging
+import logging.handlers
+
+import latex_bbl
+import latex_symbols
+from latex_symbols import replace_prose_symbols, INLINE_CODE_TRANSLATION, INLINE_CODE_SYMBOL_PATTERN
 # --- Configurazione ---
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -40,17 +61,49 @@ BIB_FILE_PATH = Path("bibliography_generated.bib") # Percorso per il file .bib g
 BIB_FILE = Path("bibliography.bib") # Nome per il file .bib generato
 ALL_TEX_FILE_GENERATED = OUTPUT_DIR_TEX / "all.tex" # File che includerà tutte le sezioni generate
 
+# Listati esterni (--external-listings): i blocchi di codice lunghi vengono scritti qui, un file per
+# contenuto, e inclusi con \\lstinputlisting
+LISTINGS_DIR = OUTPUT_DIR_TEX / "listings"
+EXTERNAL_LISTINGS_MIN_LINES = 15 # Righe minime di un blocco da esternalizzare se --external-listings non indica un valore
+
+# Cache di build: permette di saltare le sezioni il cui Markdown non è cambiato
+BUILD_CACHE_DIR = Path(".md_to_latex_cache")
+BUILD_STATE_FILE = BUILD_CACHE_DIR / "build_state.json"
+# Da incrementare quando cambia l'output del convertitore (l'hash del sorgente lo invalida comunque)
+CONVERTER_VERSION = "6"
+# Cache delle citazioni già parsate, indicizzata per testo normalizzato
+CITATION_CACHE_FILE = BUILD_CACHE_DIR / "citations.json"
+# Da incrementare quando cambiano le euristiche di parse_citation_fields (anche qui conta l'hash del sorgente)
+CITATION_PARSER_VERSION = "1"
+# LaTeX già convertito di ogni blocco dei file, per riconvertire solo i blocchi modificati di un file
+BLOCK_CACHE_FILE = BUILD_CACHE_DIR / "blocks.json"
+# Registro esterno delle persone note (--people): file CSV o database SQLite, anche con migliaia di persone.
+# Si aggiunge a KNOWN_PEOPLE, ma solo con le persone che possono comparire nei file Markdown
+PEOPLE_REGISTRY_FILE = None # Ad esempio Path("persone.csv")
+# Indice delle varianti del registro, ricostruito solo quando il contenuto del registro cambia
+PEOPLE_INDEX_FILE = BUILD_CACHE_DIR / "people_index.sqlite"
+# Report JSON scritto da --profile
+PROFILE_REPORT_FILE = BUILD_CACHE_DIR / "profile.json"
+# Sezioni riscritte dall'ultima compilazione, lette (e svuotate) da latex_build.py per l'anteprima
+CHANGED_SECTIONS_FILE = BUILD_CACHE_DIR / "changed_sections.json"
+
 PERSONA_APPLIED_SET = set()
 
 # Lista predefinita di persone note e loro varianti/dettagli.
 # Formato: "Nome Canonico": {"variants": ["Variante 1", "Altro Nome"], "birth": "AAAA", "death": "BBBB"}
-# Le varianti devono essere ordinate dalla più lunga/specifica alla più corta.
+# Le varianti possono essere in qualsiasi ordine: nel testo vince sempre la variante più lunga.
+# Le persone del registro --people (vedi PEOPLE_REGISTRY_FILE) vengono aggiunte dopo queste.
 KNOWN_PEOPLE = {
 }
+registry_people = {}        # { nome canonico: dettagli } persone aggiunte a KNOWN_PEOPLE dal registro
+people_registry_digest = "" # SHA-256 del registro in uso ("" senza registro)
 
 raw_bibliography_notes = {} # { (filename, md_key): "full citation text" }
 bibtex_entries = {}         # { bibtex_key: {"type": "...", "fields": {...}} }
 markdown_key_to_bibtex_key_map = {} # { (filename, md_key): bibtex_key }
+bibtex_key_counters = {}            # { base_key: prossimo suffisso numerico da provare }
+bibtex_work_index = {}              # { chiave dell'opera: (bibtex_key, (filename, md_key) della prima nota) }
+merged_bibliography_notes = {}      # { (filename, md_key): bibtex_key } note unificate a una voce già esistente
 
 # --- Funzioni di Utility ---
 def ensure_dir_exists(path: Path):
@@ -72,14 +125,395 @@ def read_md_file(filepath: Path) -> str:
         print(f"ERRORE: Impossibile leggere il file {filepath}: {e}")
         return ""
 
-def write_tex_file(filepath: Path, content: str):
-    """Scrive il contenuto LaTeX in un file .tex."""
+def temporary_path_for(filepath: Path) -> Path:
+    """
+    Nome univoco (pid e suffisso casuale) per un file temporaneo accanto a filepath. Più processi
+    (--watch, --server, un'esecuzione a mano, latex_build.py) possono scrivere lo stesso file insieme:
+    con un nome fisso uno troncherebbe il file temporaneo dell'altro o non lo troverebbe più per os.replace.
+    """
+    return filepath.with_name(f"{filepath.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
+
+def write_file_if_changed(filepath: Path, content: str) -> bool:
+    """
+    Scrive il file solo se i suoi byte cambiano, così l'mtime resta invariato
+    e make/XeLaTeX non ricompilano inutilmente. Restituisce True se ha scritto.
+    La scrittura è atomica (file temporaneo + os.replace).
+    """
+    data = content.encode('utf-8')
+    try:
+        if filepath.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    tmp_path = temporary_path_for(filepath)
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"Scritto file: {filepath}")
+        with open(tmp_path, 'xb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+def write_tex_file(filepath: Path, content: str) -> bool:
+    """Scrive il contenuto LaTeX in un file .tex (solo se cambiato)."""
+    try:
+        if write_file_if_changed(filepath, content):
+            print(f"Scritto file: {filepath}")
+            return True
+        print(f"File invariato: {filepath}")
     except Exception as e:
         print(f"ERRORE: Impossibile scrivere il file {filepath}: {e}")
+    return False
+
+def sha256_text(text: str) -> str:
+    """Hash SHA-256 esadecimale di una stringa (UTF-8)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def converter_fingerprint() -> str:
+    """Identifica la versione del convertitore: CONVERTER_VERSION, l'hash dei sorgenti (con le tabelle di latex_symbols) e le regole attive."""
+    try:
+        source = Path(__file__).read_bytes() + Path(latex_symbols.__file__).read_bytes()
+    except OSError:
+        source = b""
+    return sha256_text(CONVERTER_VERSION + ":" + hashlib.sha256(source).hexdigest() + ":" + ",".join(active_rule_names())
+                       + ":" + str(_EXTERNAL_LISTINGS_MIN_LINES))
+
+def load_build_state(fingerprint: str) -> dict:
+    """Carica lo stato della build precedente; lo scarta se il convertitore è cambiato."""
+    try:
+        with open(BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"fingerprint": fingerprint, "sections": {}}
+    if state.get("fingerprint") != fingerprint:
+        logging.info("Convertitore modificato: cache di build invalidata.")
+        return {"fingerprint": fingerprint, "sections": {}}
+    state.setdefault("sections", {})
+    return state
+
+def save_build_state(state: dict):
+    """Salva lo stato della build nella cache locale."""
+    try:
+        ensure_dir_exists(BUILD_CACHE_DIR)
+        write_file_if_changed(BUILD_STATE_FILE, json.dumps(state, indent=1, sort_keys=True))
+    except Exception as e:
+        logging.warning(f"Impossibile salvare la cache di build {BUILD_STATE_FILE}: {e}")
+
+def load_block_cache(fingerprint: str, people_hash: str, use_cache: bool = True) -> dict:
+    """
+    Carica la cache dei blocchi: {"sections": {file .tex: {"bodies": {...}, "finals": {...}}}} più gli
+    indici "bodies" e "finals" di tutte le sezioni (un blocco spostato da un file all'altro resta in cache).
+    La scarta se sono cambiati il convertitore o le persone note; con use_cache=False parte vuota.
+    """
+    cache = {"fingerprint": fingerprint, "people": people_hash, "sections": {}, "dirty": False}
+    try:
+        with open(BLOCK_CACHE_FILE, 'r', encoding='utf-8') as f:
+            stored = json.load(f) if use_cache else {}
+    except (OSError, ValueError):
+        stored = {}
+    if stored.get("fingerprint") == fingerprint and stored.get("people") == people_hash:
+        cache["sections"] = stored.get("sections", {})
+    elif stored:
+        logging.info("Convertitore o persone note modificati: cache dei blocchi invalidata.")
+    cache["bodies"] = {key: entry for section in cache["sections"].values() for key, entry in section["bodies"].items()}
+    cache["finals"] = {key: entry for section in cache["sections"].values() for key, entry in section["finals"].items()}
+    return cache
+
+def save_block_cache(cache: dict, tex_filenames: list):
+    """
+    Salva i blocchi delle sezioni in tex_filenames (quelli delle sezioni non più generate vengono scartati),
+    se la conversione ne ha aggiunti o tolti.
+    """
+    sections = {tex: cache["sections"][tex] for tex in tex_filenames if tex in cache["sections"]}
+    if not cache["dirty"] and sections.keys() == cache["sections"].keys():
+        return
+    try:
+        ensure_dir_exists(BUILD_CACHE_DIR)
+        write_file_if_changed(BLOCK_CACHE_FILE, json.dumps(
+            {"fingerprint": cache["fingerprint"], "people": cache["people"], "sections": sections},
+            sort_keys=True, ensure_ascii=False))
+        cache["dirty"] = False
+    except Exception as e:
+        logging.warning(f"Impossibile salvare la cache dei blocchi {BLOCK_CACHE_FILE}: {e}")
+
+def load_changed_sections() -> dict:
+    """Sezioni modificate in attesa di compilazione: {"sections": [...], "all_tex_changed": bool}."""
+    try:
+        with open(CHANGED_SECTIONS_FILE, 'r', encoding='utf-8') as f:
+            changed = json.load(f)
+    except (OSError, ValueError):
+        changed = {}
+    changed.setdefault("sections", [])
+    changed.setdefault("all_tex_changed", False)
+    return changed
+
+def save_changed_sections(changed: dict):
+    try:
+        BUILD_CACHE_DIR.mkdir(parents=True, exist_ok=True)  # senza messaggi: usata anche da latex_build.py
+        write_file_if_changed(CHANGED_SECTIONS_FILE, json.dumps(changed, indent=1, sort_keys=True))
+    except Exception as e:
+        logging.warning(f"Impossibile salvare l'elenco delle sezioni modificate {CHANGED_SECTIONS_FILE}: {e}")
+
+def include_name(tex_filename: str) -> str:
+    """Argomento di \\include / \\includeonly per una sezione: percorso senza estensione .tex."""
+    return f"{OUTPUT_DIR_TEX}/{Path(tex_filename).stem}"
+
+def record_changed_sections(written_files: list):
+    """
+    Aggiunge le sezioni appena riscritte all'elenco di quelle da ricompilare. L'elenco si accumula
+    tra una conversione e l'altra finché latex_build.py non compila e lo svuota.
+    """
+    written_sections = [path for path in written_files if path.parent == OUTPUT_DIR_TEX and path.suffix == ".tex"]
+    if not written_sections:
+        return
+    changed = load_changed_sections()
+    for path in written_sections:
+        if path == ALL_TEX_FILE_GENERATED:
+            changed["all_tex_changed"] = True
+        elif include_name(path.name) not in changed["sections"]:
+            changed["sections"].append(include_name(path.name))
+    save_changed_sections(changed)
+
+def all_tex_content(tex_filenames: list, use_include: bool = False) -> str:
+    """
+    Contenuto di all.tex. Con use_include le sezioni sono incluse con \\include, che scrive un .aux
+    per sezione: latex_build.py --preview può così ricompilare solo quelle cambiate (\\includeonly)
+    riusando gli .aux delle altre. \\include inizia però ogni sezione su una nuova pagina.
+    """
+    content = f"% --- File di inclusione generato automaticamente ---\n"
+    for fname in tex_filenames:
+        if use_include:
+            content += f"\\include{{{include_name(fname)}}}  % Auto-generated: include {fname}\n"
+        else:
+            content += f"\\input{{{OUTPUT_DIR_TEX}/{fname}}}  % Auto-generated: include {fname}\n"
+    return content
+
+def people_table_hash() -> str:
+    """
+    Hash della tabella KNOWN_PEOPLE, calcolato una volta per conversione. Del registro --people conta
+    il contenuto dell'intero file e non le persone selezionate, che cambiano con il testo di tutti i file:
+    così citare una persona nuova in un capitolo non invalida la cache degli altri.
+    """
+    table = {name: details for name, details in KNOWN_PEOPLE.items() if registry_people.get(name) is not details}
+    return sha256_text(json.dumps(table, sort_keys=True, ensure_ascii=False) + people_registry_digest)
+
+def section_cache_key(fingerprint: str, md_filename: str, section_index: int, md_content: str, people_hash: str) -> str:
+    """
+    Chiave di cache di una sezione: il Markdown, la parte di bibliografia del file
+    e le persone note. Le persone già marcate con \\persona nelle sezioni
+    precedenti sono confrontate a parte (vedi main), perché note solo dopo la pre-passata.
+    """
+    bib_slice = sorted(
+        (md_key, bib_key, raw_bibliography_notes.get((fname, md_key), ""))
+        for (fname, md_key), bib_key in markdown_key_to_bibtex_key_map.items()
+        if fname == md_filename
+    )
+    payload = json.dumps([
+        fingerprint,
+        md_filename,
+        section_index,
+        sha256_text(md_content),
+        bib_slice,
+        people_hash,
+    ], sort_keys=True, ensure_ascii=False)
+    return sha256_text(payload)
+
+# --- Profilazione delle fasi (--profile) ---
+
+# None quando la profilazione è disattivata: in quel caso run_stage chiama solo la funzione
+# e count_matches non fa nulla. Altrimenti {"file": file in conversione, "records": [...], "matches": N}
+_PROFILE = None
+
+def enable_profiling():
+    """Attiva la raccolta dei tempi per fase (usata da --profile e dai processi del pool)."""
+    global _PROFILE
+    _PROFILE = {"file": None, "records": [], "matches": 0}
+
+def disable_profiling():
+    """Disattiva la raccolta dei tempi (ad esempio tra due conversioni nello stesso processo)."""
+    global _PROFILE
+    _PROFILE = None
+
+def profiling_enabled() -> bool:
+    return _PROFILE is not None
+
+def set_profile_file(filename: str):
+    """Indica il file a cui attribuire le fasi misurate da qui in poi."""
+    if _PROFILE is not None:
+        _PROFILE["file"] = filename
+
+def count_matches(n: int):
+    """Somma n al numero di sostituzioni della fase in corso (no-op se la profilazione è disattivata)."""
+    if _PROFILE is not None:
+        _PROFILE["matches"] += n
+
+def record_profile(stage: str, seconds: float, input_size=None, output_size=None, matches=None, filename=None):
+    """Aggiunge una misura al profilo corrente."""
+    _PROFILE["records"].append({
+        "file": filename if filename is not None else _PROFILE["file"],
+        "stage": stage,
+        "seconds": seconds,
+        "input_chars": input_size,
+        "output_chars": output_size,
+        "matches": matches,
+    })
+
+def _profile_size(value):
+    """Caratteri di un testo o di una lista di testi (righe, segmenti); None per gli altri dati."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return sum(len(item) for item in value)
+    return None
+
+def run_stage(name: str, func, text: str, *args):
+    """
+    Esegue func(text, *args) misurando tempo, dimensione di ingresso e uscita e numero
+    di sostituzioni (riportate dalla fase con count_matches). Le fasi non vanno annidate.
+    """
+    if _PROFILE is None:
+        return func(text, *args)
+    _PROFILE["matches"] = 0
+    start = time.perf_counter()
+    result = func(text, *args)
+    elapsed = time.perf_counter() - start
+    record_profile(name, elapsed, _profile_size(text), _profile_size(result), _PROFILE["matches"])
+    return result
+
+def take_profile_records() -> list:
+    """Restituisce e azzera le misure raccolte (i processi del pool le rimandano al principale)."""
+    if _PROFILE is None:
+        return []
+    records = _PROFILE["records"]
+    _PROFILE["records"] = []
+    return records
+
+def write_profile_report(records: list, report_path: Path):
+    """Salva le misure in JSON e stampa un riepilogo per fase e per file, dal più lento."""
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record["stage"], {"stage": record["stage"], "calls": 0, "seconds": 0.0, "matches": 0})
+        total["calls"] += 1
+        total["seconds"] += record["seconds"]
+        total["matches"] += record["matches"] or 0
+    by_stage = sorted(totals.values(), key=lambda total: total["seconds"], reverse=True)
+    report = {
+        "total_seconds": sum(record["seconds"] for record in records),
+        "stages": by_stage,
+        "records": sorted(records, key=lambda record: record["seconds"], reverse=True),
+    }
+    try:
+        ensure_dir_exists(report_path.parent)
+        write_file_if_changed(report_path, json.dumps(report, indent=1, ensure_ascii=False))
+        logging.info(f"Report di profilazione scritto in {report_path}")
+    except Exception as e:
+        logging.warning(f"Impossibile scrivere il report di profilazione {report_path}: {e}")
+
+    print(f"\n--- Profilazione: {report['total_seconds'] * 1000:.1f} ms misurati ---")
+    print(f"{'fase':<36} {'chiamate':>8} {'ms':>10} {'sostituzioni':>13}")
+    for total in by_stage:
+        print(f"{total['stage']:<36} {total['calls']:>8} {total['seconds'] * 1000:>10.2f} {total['matches']:>13}")
+    print(f"\n{'file':<24} {'fase':<36} {'ms':>10} {'ingresso':>10} {'uscita':>10}")
+    for record in report["records"][:15]:
+        print(f"{record['file'] or '-':<24} {record['stage']:<36} {record['seconds'] * 1000:>10.2f} "
+              f"{record['input_chars'] if record['input_chars'] is not None else '-':>10} "
+              f"{record['output_chars'] if record['output_chars'] is not None else '-':>10}")
+
+# --- Indice delle note a piè di pagina ---
+
+# Una sola scansione per file: a ogni posizione si prova prima la definizione [^key]: testo
+# (fino a fine riga, newline compreso), poi il richiamo [^key] o [^key, dettagli].
+# I dettagli non possono contenere parentesi quadre, così un richiamo malformato
+# non può inglobare la nota successiva.
+FOOTNOTE_TOKEN_PATTERN = re.compile(
+    r"\[\^(?P<key>\w+)"
+    r"(?:\]:\s*(?P<def_text>.+)\n?"              # Definizione
+    r"|(?P<ref_extra>,[^\]\[]*)?\](?!:))"         # Richiamo
+)
+FOOTNOTE_REFERENCE_PATTERN = re.compile(r"\[\^(?P<ref_key>\w+)(?P<ref_extra>,[^\]\[]*)?\](?!:)")
+# Dettagli di un richiamo che indicano le pagine: , p. 123 oppure , pp. 12-15
+CITATION_PAGES_PATTERN = re.compile(r",\s*(?:p|pp)\.?\s*[\d\-]+")
+
+# Classificazione delle definizioni di nota
+FOOTNOTE_BIBLIOGRAPHIC = "bibliographic"
+FOOTNOTE_TRANSCRIPTION = "transcription"  # [^N]: Trascrizione ... (rimossa dal testo)
+FOOTNOTE_IBID = "ibid"                    # [^N]: Ibid., ...
+FOOTNOTE_CIT = "cit"                      # [^N]: Autore, Titolo, cit., ...
+
+FootnoteDefinition = namedtuple("FootnoteDefinition", "key text kind start end")
+# pages è il testo dei dettagli se indicano le pagine (", p. 12"), altrimenti None
+FootnoteReference = namedtuple("FootnoteReference", "key extra pages in_definition start end")
+FootnoteIndex = namedtuple("FootnoteIndex", "definitions references")
+
+# Indici già calcolati, per testo: la raccolta bibliografica e la conversione dello stesso
+# file (o --watch) riusano l'indice invece di riscandire il Markdown
+_FOOTNOTE_INDEX_CACHE = {}
+_FOOTNOTE_INDEX_CACHE_SIZE = 64
+
+def classify_footnote(note_text: str) -> str:
+    lowered = note_text.lower()
+    if lowered.startswith("trascrizione"):
+        return FOOTNOTE_TRANSCRIPTION
+    if lowered.startswith("ibid."):
+        return FOOTNOTE_IBID
+    if ", cit." in lowered:
+        return FOOTNOTE_CIT
+    return FOOTNOTE_BIBLIOGRAPHIC
+
+def build_footnote_index(text: str) -> FootnoteIndex:
+    """
+    Indicizza in una sola passata tutte le definizioni di nota (con la loro classificazione)
+    e tutti i richiami, con le posizioni nel testo. Anche i richiami contenuti nel testo
+    di una definizione sono registrati (in_definition=True).
+    """
+    definitions = []
+    references = []
+    pages_match = CITATION_PAGES_PATTERN.fullmatch
+    for match in FOOTNOTE_TOKEN_PATTERN.finditer(text):
+        key, note_text, extra = match.groups()
+        start, end = match.span()
+        if note_text is None:
+            pages = extra if extra and pages_match(extra) else None
+            references.append(FootnoteReference(key, extra, pages, False, start, end))
+            continue
+        definitions.append(FootnoteDefinition(key, note_text, classify_footnote(note_text), start, end))
+        if "[^" in note_text:
+            for inner in FOOTNOTE_REFERENCE_PATTERN.finditer(text, match.start("def_text"), match.end("def_text")):
+                ref_key, extra = inner.groups()
+                pages = extra if extra and pages_match(extra) else None
+                references.append(FootnoteReference(ref_key, extra, pages, True, inner.start(), inner.end()))
+    count_matches(len(definitions) + len(references))
+    return FootnoteIndex(definitions, references)
+
+def footnote_index(text: str) -> FootnoteIndex:
+    """Indice delle note del testo, calcolato una sola volta per ogni testo."""
+    index = _FOOTNOTE_INDEX_CACHE.get(text)
+    if index is None:
+        if len(_FOOTNOTE_INDEX_CACHE) >= _FOOTNOTE_INDEX_CACHE_SIZE:
+            # Scarta il testo indicizzato da più tempo (i dict mantengono l'ordine di inserimento):
+            # svuotare tutto farebbe ricalcolare anche gli indici appena fatti della stessa conversione
+            del _FOOTNOTE_INDEX_CACHE[next(iter(_FOOTNOTE_INDEX_CACHE))]
+        index = _FOOTNOTE_INDEX_CACHE[text] = build_footnote_index(text)
+    return index
+
+def splice_text(text: str, edits) -> str:
+    """
+    Applica in un'unica passata le modifiche [(inizio, fine, sostituto)], ordinate per posizione.
+    Una modifica contenuta in una precedente (es. un richiamo dentro una definizione rimossa) viene scartata.
+    """
+    if not edits:
+        return text
+    output = []
+    pos = 0
+    for start, end, replacement in sorted(edits, key=lambda edit: (edit[0], -edit[1])):
+        if start < pos:
+            continue
+        output.append(text[pos:start])
+        output.append(replacement)
+        pos = end
+    output.append(text[pos:])
+    return "".join(output)
 
 def generate_bibtex_key(authors_str, year_str, title_str):
     """Genera una chiave BibTeX ragionevolmente unica."""
@@ -99,19 +533,42 @@ def generate_bibtex_key(authors_str, year_str, title_str):
 
     base_key = f"{key_part_author}{key_part_year}{key_part_title}".capitalize()
     
-    # Assicura unicità se la base_key è già usata
+    # Assicura unicità se la base_key è già usata: il contatore per base_key riparte
+    # dall'ultimo suffisso assegnato invece di riprovare Key1, Key2... ogni volta
     final_key = base_key
-    counter = 1
-    while final_key in bibtex_entries:
+    if final_key in bibtex_entries:
+        counter = bibtex_key_counters.get(base_key, 1)
         final_key = f"{base_key}{counter}"
-        counter += 1
+        while final_key in bibtex_entries:
+            counter += 1
+            final_key = f"{base_key}{counter}"
+        bibtex_key_counters[base_key] = counter + 1
     return final_key
 
-def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
+# Le euristiche guardano solo l'inizio della nota, dove si trovano autori, titolo ed editore:
+# alcune regex qui sotto riprovano da ogni posizione, quindi su una nota lunghissima
+# il tempo crescerebbe col quadrato della lunghezza invece di restare limitato
+CITATION_PARSE_MAX_CHARS = 1000
+CITATION_TITLE_PATTERN = re.compile(r'["“](.+?)["”]')
+CITATION_TITLE_CLOSERS = '"”'
+# I titoli dei volumi sono cercati entro BOOKTITLE_MAX_CHARS caratteri da ogni "in"
+BOOKTITLE_MAX_CHARS = 200
+PROCEEDINGS_BOOKTITLE_PATTERN = re.compile(
+    r'(?:in|in:)\s*\*?([\w\s:,]{1,%d}?)(?:\*?,\s*(?:edited|Copenhagen|Berlin))' % BOOKTITLE_MAX_CHARS, re.IGNORECASE)
+COLLECTION_BOOKTITLE_PATTERN = re.compile(
+    r'(?:in|in:)\s*\*?(.{1,%d}?)(?:\*?,\s*(?:edited by|Berlin))' % BOOKTITLE_MAX_CHARS, re.IGNORECASE)
+# Il nome della rivista si prova solo dall'inizio di ogni sequenza di lettere e spazi:
+# da una posizione interna il risultato sarebbe lo stesso, ma riprovarle tutte è quadratico
+JOURNAL_PATTERN = re.compile(r'(?<![A-Za-z\s])([A-Za-z\s]+ Journal)')
+
+def parse_citation_fields(citation_text: str):
     """
     Tenta di parsare una stringa di citazione in campi BibTeX.
     Questa è una funzione euristica e molto semplificata.
+    Dipende solo dal testo, quindi il risultato può essere memorizzato (vedi get_parsed_citation).
+    Restituisce (bib_type, fields, authors_str, year_str, title_str).
     """
+    citation_text = citation_text[:CITATION_PARSE_MAX_CHARS]
     fields = {}
     bib_type = "misc" # Default type
 
@@ -131,7 +588,9 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
         fields["author"] = authors_str
 
     # Tentativo di estrarre titolo tra virgolette
-    title_match = re.search(r'["“](.+?)["”]', citation_text)
+    # Dopo l'ultima virgoletta di chiusura non può iniziare nessun titolo
+    title_end = max(citation_text.rfind(closer) for closer in CITATION_TITLE_CLOSERS) + 1
+    title_match = CITATION_TITLE_PATTERN.search(citation_text, 0, title_end)
     title_str = ""
     if title_match:
         title_str = title_match.group(1)
@@ -152,7 +611,7 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
     # Inferenza del tipo di BibTeX (molto euristica)
     if "Proceedings of" in citation_text or "Conference" in citation_text:
         bib_type = "inproceedings"
-        booktitle_match = re.search(r'(?:in|in:)\s*\*?([\w\s:,]+?)(?:\*?,\s*(?:edited|Copenhagen|Berlin))', citation_text, re.IGNORECASE)
+        booktitle_match = PROCEEDINGS_BOOKTITLE_PATTERN.search(citation_text)
         if booktitle_match: fields["booktitle"] = booktitle_match.group(1).strip().replace("*","")
         if "Copenhagen" in citation_text: fields["address"] = "Copenhagen"
         if "International Computer Music Association" in citation_text: fields["publisher"] = "International Computer Music Association"
@@ -160,7 +619,7 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
     elif "edited by" in citation_text or "in:" in citation_text and "Springer" in citation_text : # Assumendo che 'in:' seguito da libro sia InCollection
         bib_type = "incollection"
         # Estrai booktitle e editor
-        booktitle_match = re.search(r'(?:in|in:)\s*\*?(.+?)(?:\*?,\s*(?:edited by|Berlin))', citation_text, re.IGNORECASE)
+        booktitle_match = COLLECTION_BOOKTITLE_PATTERN.search(citation_text)
         if booktitle_match: fields["booktitle"] = booktitle_match.group(1).strip().replace("*","")
         
         editor_match = re.search(r'edited by\s+([^,]+)', citation_text, re.IGNORECASE)
@@ -171,7 +630,7 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
 
     elif "Journal" in citation_text: # Es. Computer Music Journal
         bib_type = "article"
-        journal_match = re.search(r'([A-Za-z\s]+ Journal)', citation_text)
+        journal_match = JOURNAL_PATTERN.search(citation_text)
         if journal_match: fields["journal"] = journal_match.group(1).strip()
         
         volume_match = re.search(r',\s*(\d+)\(\d+\)', citation_text) # es. , 18(4)
@@ -184,6 +643,93 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
             if num_search and num_search.group(1) != fields.get("year"):
                  fields["number"] = num_search.group(1)
 
+    return bib_type, fields, authors_str, year_str, title_str
+
+WORK_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def fold_work_text(text: str) -> str:
+    """Minuscole senza accenti, per confrontare autori e titoli scritti in modo diverso."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def citation_work_key(authors_str: str, year_str: str, title_str: str):
+    """
+    Chiave dell'opera citata: cognome del primo autore (come in generate_bibtex_key), anno e parole
+    del titolo, senza maiuscole, accenti e punteggiatura. None se manca l'autore o il titolo:
+    senza di essi due note diverse potrebbero sembrare la stessa opera.
+    """
+    if not authors_str or not title_str or not authors_str.split(',')[0].split():
+        return None
+    surname = "".join(WORK_TOKEN_PATTERN.findall(fold_work_text(authors_str.split(',')[0].split()[-1])))
+    title_tokens = tuple(WORK_TOKEN_PATTERN.findall(fold_work_text(title_str)))
+    if not surname or not title_tokens:
+        return None
+    return (surname, year_str or "", title_tokens)
+
+def normalize_citation_text(citation_text: str) -> str:
+    """Forma normalizzata (NFC, spazi compattati) usata come chiave della cache delle citazioni."""
+    return " ".join(unicodedata.normalize("NFC", citation_text).split())
+
+def citation_parser_version() -> str:
+    """Versione delle euristiche: CITATION_PARSER_VERSION più l'hash del sorgente di parse_citation_fields."""
+    try:
+        source = inspect.getsource(parse_citation_fields)
+    except (OSError, TypeError):
+        source = ""
+    return CITATION_PARSER_VERSION + ":" + sha256_text(source)[:16]
+
+def load_citation_cache(cache_path: Path = CITATION_CACHE_FILE) -> dict:
+    """Carica la cache delle citazioni già parsate; la scarta se le euristiche sono cambiate."""
+    version = citation_parser_version()
+    cache = {"parser_version": version, "entries": {}, "dirty": False}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return cache
+    if stored.get("parser_version") == version:
+        cache["entries"] = stored.get("entries", {})
+    else:
+        logging.info("Euristiche di parsing cambiate: cache delle citazioni invalidata.")
+    return cache
+
+def save_citation_cache(cache: dict):
+    """Salva la cache delle citazioni se sono state parsate nuove note."""
+    if not cache.get("dirty"):
+        return
+    try:
+        ensure_dir_exists(BUILD_CACHE_DIR)
+        content = json.dumps({"parser_version": cache["parser_version"], "entries": cache["entries"]},
+                             ensure_ascii=False, sort_keys=True)
+        write_file_if_changed(CITATION_CACHE_FILE, content)
+        cache["dirty"] = False
+    except Exception as e:
+        logging.warning(f"Impossibile salvare la cache delle citazioni {CITATION_CACHE_FILE}: {e}")
+
+# Citazioni già parsate in altri progetti (--batch), consultate quando la cache del progetto non le contiene
+_SHARED_CITATION_ENTRIES = {}
+
+def get_parsed_citation(citation_text: str, cache: dict = None):
+    """parse_citation_fields sul testo normalizzato, passando dalla cache se fornita."""
+    normalized = normalize_citation_text(citation_text)
+    if cache is None:
+        return parse_citation_fields(normalized)
+    cached = cache["entries"].get(normalized)
+    if cached is None:
+        cached = _SHARED_CITATION_ENTRIES.get(normalized) or list(parse_citation_fields(normalized))
+        cache["entries"][normalized] = cached
+        cache["dirty"] = True
+    bib_type, fields, authors_str, year_str, title_str = cached
+    return bib_type, dict(fields), authors_str, year_str, title_str
+
+def parse_citation_text(citation_text: str, md_filename: str, md_key: str, citation_cache: dict = None):
+    """
+    Trasforma una nota in una voce BibTeX: risolve Ibid./cit. verso la nota precedente
+    oppure genera una nuova chiave a partire dai campi parsati (eventualmente dalla cache).
+    """
+    bib_type, fields, authors_str, year_str, title_str = get_parsed_citation(citation_text, citation_cache)
+    pages_match = "pages" in fields
+
     # Gestione di Ibid. e cit.
     is_ibid = citation_text.lower().startswith("ibid.")
     is_cit = ", cit." in citation_text.lower()
@@ -210,28 +756,43 @@ def parse_citation_text(citation_text: str, md_filename: str, md_key: str):
         except Exception as e:
             logging.warning(f"Errore risoluzione Ibid./cit. per ({md_filename}, {md_key}): {e}")
     
+    # La stessa opera citata in un'altra nota (anche di un altro capitolo) con punteggiatura,
+    # maiuscole o accenti diversi usa la voce già creata: una ricerca nell'indice per nota
+    work_key = citation_work_key(authors_str, year_str, title_str)
+    if work_key is not None and work_key in bibtex_work_index:
+        bibtex_key_ref, (first_filename, first_key) = bibtex_work_index[work_key]
+        merged_bibliography_notes[(md_filename, md_key)] = bibtex_key_ref
+        logging.info(f"Unificata ({md_filename}, {md_key}) a {bibtex_key_ref}: stessa opera della nota ({first_filename}, {first_key})")
+        return bibtex_key_ref, None, None
+
     # Se non è Ibid/cit o non risolto, genera nuova chiave
     bibtex_key = generate_bibtex_key(authors_str, year_str, title_str)
+    if work_key is not None:
+        bibtex_work_index[work_key] = (bibtex_key, (md_filename, md_key))
     return bibtex_key, bib_type, fields
 
 # --- START OF REVISED FUNCTION collect_and_parse_bibliography ---
-def collect_and_parse_bibliography(md_files_dict: dict):
+def collect_and_parse_bibliography(md_files_dict: dict, use_cache: bool = True, citation_cache: dict = None):
     """
     Passo 1: Colleziona tutte le note bibliografiche, filtrando via le "Trascrizioni".
-    Passo 2: Parsale e crea le voci BibTeX.
+    Passo 2: Parsale e crea le voci BibTeX (le citazioni già viste sono lette dalla cache).
+    citation_cache permette di riusare una cache già in memoria (--server) invece di rileggerla da disco.
     """
     global raw_bibliography_notes, bibtex_entries, markdown_key_to_bibtex_key_map
     raw_bibliography_notes.clear()
     bibtex_entries.clear()
     markdown_key_to_bibtex_key_map.clear()
+    bibtex_key_counters.clear()
+    bibtex_work_index.clear()
+    merged_bibliography_notes.clear()
 
     # Passo 1: Colleziona tutte le note [^key]: text da tutti i file,
     # escludendo quelle identificate come "Trascrizione".
     temp_raw_notes_for_bib = {} # Usiamo un dizionario temporaneo per le note valide
     for md_filename, md_content in md_files_dict.items():
-        # Trova tutte le definizioni di note [^key]: testo
-        matches = re.findall(r"\[\^(\w+)\]:\s*(.+)", md_content)
-        for key, text_content_of_note in matches:
+        # Definizioni di note [^key]: testo dall'indice del file (condiviso con la conversione)
+        for definition in footnote_index(md_content).definitions:
+            key, text_content_of_note = definition.key, definition.text
             # Filtra esplicitamente le note "Trascrizione"
             if "trascrizione" in text_content_of_note.lower():
                 logging.info(f"BIB_FILTER: Esclusa nota Trascrizione '[^{key}]' dal file '{md_filename}' per il BibTeX.")
@@ -252,8 +813,10 @@ def collect_and_parse_bibliography(md_files_dict: dict):
     # Usiamo raw_bibliography_notes che ora è già filtrato
     sorted_valid_notes = sorted(raw_bibliography_notes.items(), key=lambda item: (item[0][0], int(item[0][1]) if item[0][1].isdigit() else item[0][1]))
 
+    if citation_cache is None:
+        citation_cache = load_citation_cache() if use_cache else {"parser_version": citation_parser_version(), "entries": {}, "dirty": True}
     for (md_filename, md_key), citation_text in sorted_valid_notes:
-        bib_key_or_ref, bib_type, fields = parse_citation_text(citation_text, md_filename, md_key)
+        bib_key_or_ref, bib_type, fields = parse_citation_text(citation_text, md_filename, md_key, citation_cache)
         
         current_map_key = (md_filename, md_key) # Chiave della nota Markdown originale
 
@@ -276,40 +839,135 @@ def collect_and_parse_bibliography(md_files_dict: dict):
             # (dovrebbe essere raro se la logica di parse_citation_text è completa)
             logging.warning(f"Impossibile processare la nota ({md_filename}, {md_key}): {citation_text[:50]}... Nessuna azione BibTeX intrapresa.")
             
+    save_citation_cache(citation_cache)
+
     logging.info(f"Raccolte {len(raw_bibliography_notes)} note bibliografiche valide per il BibTeX (dopo filtro Trascrizioni).")
+    if merged_bibliography_notes:
+        logging.info(f"Unificate {len(merged_bibliography_notes)} note a voci BibTeX già esistenti "
+                     f"(voci condivise: {len(set(merged_bibliography_notes.values()))}).")
     logging.info(f"Generate {len(bibtex_entries)} voci BibTeX uniche.")
 # --- END OF REVISED FUNCTION collect_and_parse_bibliography ---
 
-def write_bibtex_file():
-    """Scrive il file .bib con le voci raccolte."""
-    if not bibtex_entries:
-        logging.info("Nessuna voce BibTeX da scrivere.")
-        return
+def write_chunks_if_changed(filepath: Path, chunks) -> bool:
+    """
+    Scrive in streaming i pezzi di testo in un file temporaneo e lo sostituisce
+    atomicamente al file di destinazione solo se il contenuto è cambiato.
+    Restituisce True se il file è stato aggiornato.
+    """
+    tmp_path = temporary_path_for(filepath)
+    new_hash = hashlib.sha256()
+    try:
+        with open(tmp_path, 'x', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                new_hash.update(chunk.encode('utf-8'))
 
-    content = "@Comment{Questo file BIB è stato generato automaticamente dallo script Python.}\n\n"
-    for key, entry_data in bibtex_entries.items():
-        content += f"@{entry_data['type']}{{{key},\n"
+        old_hash = hashlib.sha256()
+        try:
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    old_hash.update(block)
+        except OSError:
+            old_hash = None
+
+        if old_hash is not None and old_hash.digest() == new_hash.digest():
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+def iter_bibtex_entries():
+    """Genera il contenuto del file .bib una voce alla volta, in ordine di chiave."""
+    yield "@Comment{Questo file BIB è stato generato automaticamente dallo script Python.}\n\n"
+    for key in sorted(bibtex_entries):
+        entry_data = bibtex_entries[key]
+        lines = [f"@{entry_data['type']}{{{key},\n"]
         for field, value in entry_data["fields"].items():
             # Pulisci il valore da eventuali caratteri LaTeX problematici o aggiungi graffe
             # Esempio: titoli con due punti o caratteri speciali
             # value_cleaned = value.replace("{", "\\{").replace("}", "\\}")
-            content += f"  {field:<10} = {{{value}}},\n"
-        content += f"  note        = {{Orig: {entry_data['original_text'][:50]}...}}\n" # Nota per debug
-        content += "}\n\n"
-    
+            lines.append(f"  {field:<10} = {{{value}}},\n")
+        lines.append(f"  note        = {{Orig: {entry_data['original_text'][:50]}...}}\n") # Nota per debug
+        lines.append("}\n\n")
+        yield "".join(lines)
+
+def write_bibtex_file():
+    """
+    Scrive il file .bib con le voci raccolte (solo se il contenuto cambia). Restituisce True se ha scritto,
+    False se il file era già aggiornato o non ci sono voci, None se la scrittura non è riuscita.
+    """
+    if not bibtex_entries:
+        logging.info("Nessuna voce BibTeX da scrivere.")
+        return False
+
     try:
-        with open(BIB_FILE_PATH, 'w', encoding='utf-8') as f:
-            f.write(content)
-        logging.info(f"Scritto file BibTeX: {BIB_FILE_PATH}")
+        if write_chunks_if_changed(BIB_FILE_PATH, iter_bibtex_entries()):
+            logging.info(f"Scritto file BibTeX: {BIB_FILE_PATH}")
+            return True
+        logging.info(f"File BibTeX invariato: {BIB_FILE_PATH}")
     except Exception as e:
         logging.error(f"Impossibile scrivere il file BibTeX {BIB_FILE_PATH}: {e}")
+        return None
+    return False
 
-def replace_markdown_citations_in_text(text: str, md_filename_current_processing: str) -> str:
-    """Sostituisce [^key] e [^key, p. X] con cite{bib_key} o cite[p.X]{bib_key}."""
-    
-    def replacer_logic(match_obj):
-        md_key = match_obj.group("key")
-        pages_arg_text = match_obj.group("pages_text") # Questo è il testo completo ", p. XXX" o None
+# --- Bibliografia formattata in Python (--bbl) ---
+def bbl_entries_from_memory() -> dict:
+    """Voci di bibtex_entries nella forma di latex_bbl.parse_bib, con gli stessi campi scritti nel .bib."""
+    entries = {}
+    for key, entry_data in bibtex_entries.items():
+        fields = dict(entry_data["fields"])
+        fields["note"] = f"Orig: {entry_data['original_text'][:50]}..."
+        entries[key] = {"type": entry_data["type"].lower(),
+                        "fields": {field: " ".join(value.split()) for field, value in fields.items()}}
+    return entries
+
+def write_bbl_file(main_tex: Path = MAIN_TEX_FILE):
+    """
+    Scrive il .bbl di main_tex senza bibtex (vedi latex_bbl), nello stile del suo \\bibliographystyle,
+    con le voci dei file elencati in \\bibliography e le citazioni dei sorgenti già generati.
+    Se tra i file c'è il .bib generato, le sue voci si prendono da bibtex_entries senza rileggerlo.
+    Restituisce True se il .bbl è cambiato, False se è invariato e None se non si può generare
+    (nessuna bibliografia in main_tex o stile non supportato): in quel caso serve bibtex.
+    """
+    settings = latex_bbl.bibliography_settings(main_tex)
+    if settings is None:
+        logging.info(f"{main_tex} non contiene \\bibliographystyle e \\bibliography: nessun .bbl da generare.")
+        return None
+    style, bib_files = settings
+    if style not in latex_bbl.BBL_STYLES:
+        logging.warning(f"Stile bibliografico '{style}' non supportato in Python "
+                        f"(supportati: {', '.join(latex_bbl.BBL_STYLES)}): il .bbl va generato con bibtex.")
+        return None
+    from_memory = bool(bibtex_entries) and BIB_FILE_PATH in bib_files
+    entries = {}
+    for path in bib_files:
+        database = bbl_entries_from_memory() if from_memory and path == BIB_FILE_PATH else latex_bbl.read_bib_files([path])
+        for key, entry in database.items():
+            entries.setdefault(key, entry)
+    content, missing = latex_bbl.format_bbl(style, latex_bbl.cited_keys(main_tex), entries)
+    for key in missing:
+        logging.warning(f"Nessuna voce per la citazione '{key}' in {', '.join(map(str, bib_files))}")
+    bbl_path = main_tex.with_suffix(".bbl")
+    changed = write_file_if_changed(bbl_path, content)
+    logging.info(f"{'Scritto' if changed else 'Invariato'} {bbl_path} (stile {style}, {content.count(chr(92) + 'bibitem')} voci)")
+    return changed
+
+IBID_PAGES_PATTERN = re.compile(r'[,\s](p|pp)\.?\s*([\d\-]+)')
+
+def citation_footnote_edits(index: FootnoteIndex, md_filename_current_processing: str) -> list:
+    """
+    Sostituzioni di [^key] e [^key, p. X] con cite{bib_key} o cite[p.X]{bib_key}.
+    I richiami con altri dettagli e quelli senza chiave BibTeX restano invariati.
+    """
+    edits = []
+    for reference in index.references:
+        if reference.extra and not reference.pages:
+            continue
+        md_key = reference.key
+        pages_arg_text = reference.pages # Questo è il testo completo ", p. XXX" o None
         
         map_tuple = (md_filename_current_processing, md_key)
         
@@ -324,228 +982,306 @@ def replace_markdown_citations_in_text(text: str, md_filename_current_processing
                 # Se non ci sono pagine nel richiamo, controlla se la nota originale (Ibid/cit) le aveva
                 original_note_text = raw_bibliography_notes.get(map_tuple, "")
                 if "Ibid." in original_note_text or ", cit." in original_note_text:
-                    ibid_pages_match = re.search(r'[,\s](p|pp)\.?\s*([\d\-]+)', original_note_text)
+                    ibid_pages_match = IBID_PAGES_PATTERN.search(original_note_text)
                     if ibid_pages_match:
                         page_info_for_cite = f"{ibid_pages_match.group(1)}. {ibid_pages_match.group(2)}" # es. "p. 123"
 
             if page_info_for_cite:
-                return f"\\cite[{page_info_for_cite}]{{{bibtex_key}}}"
+                edits.append((reference.start, reference.end, f"\\cite[{page_info_for_cite}]{{{bibtex_key}}}"))
             else:
-                return f"\\cite{{{bibtex_key}}}"
+                edits.append((reference.start, reference.end, f"\\cite{{{bibtex_key}}}"))
         else:
-            logging.warning(f"Nessuna chiave BibTeX trovata per la nota Markdown ({md_filename_current_processing}, {md_key}). Lasciato invariato: {match_obj.group(0)}")
-            return match_obj.group(0) # Lascia invariato se non trovato
-
-    # Regex unica che cattura:
-    # - [^key]
-    # - [^key, p. NNN]
-    # - [^key, pp. NNN-MMM]
-    # Il gruppo (?P<pages_text>...) è opzionale.
-    # (?!:) è un negative lookahead per assicurarsi che non stiamo matchando una definizione di nota [^key]:
-    citation_pattern = re.compile(
-        r"\[\^(?P<key>\w+)"                             # Cattura la chiave, es. [^123
-        r"(?P<pages_text>,\s*(?:p|pp)\.?\s*[\d\-]+)?"   # Opzionalmente cattura la parte delle pagine, es. , p. 123
-        r"\](?!:)"                                      # Chiusura parentesi, non seguita da :
-    )
-    
-    processed_text = citation_pattern.sub(replacer_logic, text)
-    
+            reference_text = f"[^{md_key}{reference.extra or ''}]"
+            logging.warning(f"Nessuna chiave BibTeX trovata per la nota Markdown ({md_filename_current_processing}, {md_key}). Lasciato invariato: {reference_text}")
+
+    count_matches(len(edits))
     logging.info(f"    - Sostituite citazioni Markdown con \\cite per {md_filename_current_processing}")
-    return processed_text
+    return edits
+
+def replace_markdown_citations_in_text(text: str, md_filename_current_processing: str) -> str:
+    """Sostituisce [^key] e [^key, p. X] con cite{bib_key} o cite[p.X]{bib_key}."""
+    rule = conversion_rule(citation_footnote_edits, SCOPE_FOOTNOTES, context_args=("filename",))
+    return apply_footnote_rules(text, (rule,), {"filename": md_filename_current_processing})
+
+def transcription_footnote_edits(index: FootnoteIndex, transcription_keys=None) -> list:
+    """
+    Rimozione delle note del tipo [^N]: Trascrizione ... e dei loro richiami.
+    transcription_keys: chiavi delle trascrizioni dell'intero file, quando il testo è solo una sua parte.
+    """
+    edits = []
+    transcription_note_keys = set(transcription_keys or ())
+    for definition in index.definitions:
+        if definition.kind == FOOTNOTE_TRANSCRIPTION:
+            transcription_note_keys.add(definition.key)
+            edits.append((definition.start, definition.end, ""))
+    # Rimuove [^key] o [^key, dettagli]
+    for reference in index.references:
+        if reference.key in transcription_note_keys:
+            edits.append((reference.start, reference.end, ""))
+
+    count_matches(len(edits))
+    if edits:
+        print("    - Rimosse citazioni 'Trascrizione...' e loro definizioni dal testo LaTeX")
+    return edits
 
 def remove_transcription_citations(text: str) -> str:
     """Rimuove le citazioni del tipo [^N]: Trascrizione ... e i loro richiami."""
-    # Prima, trova tutti i 'key' delle note "Trascrizione"
-    transcription_note_keys = re.findall(r"\[\^(\w+)\]:\s*Trascrizione.*", text, flags=re.IGNORECASE) # Aggiunto IGNORECASE
-    
-    # Rimuovi le definizioni delle note "Trascrizione"
-    text = re.sub(r"\[\^(\w+)\]:\s*Trascrizione.*\n?", "", text, flags=re.IGNORECASE) # Aggiunto IGNORECASE
-    
-    # Rimuovi i richiami a queste note nel testo
-    for key in transcription_note_keys:
-        # Rimuove [^key] o [^key, dettagli]
-        text = re.sub(rf"\[\^{re.escape(key)}(?:,[^\]]*)?\]", "", text)
-        
-    print("    - Rimosse citazioni 'Trascrizione...' e loro definizioni dal testo LaTeX")
-    return text
+    return apply_footnote_rules(text, (conversion_rule(transcription_footnote_edits, SCOPE_FOOTNOTES),))
+
+# Mapping dei linguaggi per listings LaTeX
+LISTINGS_LANGUAGE_MAPPING = {
+    'csound': 'C',           # Csound → C
+    'yaml': 'Python',        # YAML → Python (per la sintassi)
+    'yml': 'Python',         # YML → Python  
+    'json': 'Python',        # JSON → Python
+    'bash': 'bash',          # Bash è supportato
+    'shell': 'bash',         # Shell → bash
+    'javascript': 'Java',    # JavaScript → Java (simile)
+    'js': 'Java',            # JS → Java
+    'markdown': 'TeX',       # Markdown → TeX
+    'md': 'TeX',             # MD → TeX
+}
+CODE_BLOCK_LISTING_PATTERN = re.compile(r"```(\w*)\n(.*?)\n```", re.DOTALL)
+LISTING_INPUT_PATTERN = re.compile(r"\\lstinputlisting(?:\[[^\]]*\])?\{([^}]+)\}")
 
-def convert_code_blocks(text: str) -> str:
-    """Converte blocchi di codice Markdown in ambienti listings di LaTeX."""
-    pattern = re.compile(r"```(\w*)\n(.*?)\n```", re.DOTALL)
+# Righe minime dei blocchi da scrivere in LISTINGS_DIR; None: tutti i blocchi restano nel .tex
+_EXTERNAL_LISTINGS_MIN_LINES = None
 
-    def replacer_logic(match):
-        language = match.group(1).strip()
-        code = match.group(2)
-        
-        # Mapping dei linguaggi per listings LaTeX
-        language_mapping = {
-            'csound': 'C',           # Csound → C
-            'yaml': 'Python',        # YAML → Python (per la sintassi)
-            'yml': 'Python',         # YML → Python  
-            'json': 'Python',        # JSON → Python
-            'bash': 'bash',          # Bash è supportato
-            'shell': 'bash',         # Shell → bash
-            'javascript': 'Java',    # JavaScript → Java (simile)
-            'js': 'Java',            # JS → Java
-            'markdown': 'TeX',       # Markdown → TeX
-            'md': 'TeX',             # MD → TeX
-        }
-        
-        # Opzione per specificare il linguaggio in LaTeX
-        if language:
-            # Converti il linguaggio usando il mapping, oppure usa il linguaggio originale
-            mapped_language = language_mapping.get(language.lower(), language.capitalize())
-            language_option = f"[language={mapped_language}]"
-        else:
-            language_option = ""
-            
-        # Ritorna l'ambiente LaTeX
-        return f"\\begin{{lstlisting}}{language_option}\n{code}\n\\end{{lstlisting}}"
+def configure_external_listings(min_lines=None):
+    """Attiva (min_lines >= 0) o disattiva (None) l'esternalizzazione dei blocchi di codice."""
+    global _EXTERNAL_LISTINGS_MIN_LINES
+    _EXTERNAL_LISTINGS_MIN_LINES = min_lines
 
-    processed_text = pattern.sub(replacer_logic, text)
-    if processed_text != text:
+def write_listing_file(code: str, language: str) -> Path:
+    """
+    Scrive il blocco in LISTINGS_DIR con un nome ricavato dall'hash del contenuto: un file
+    esistente ha già il contenuto giusto e non viene mai riscritto (né cambia il suo mtime).
+    """
+    code = unescape_marker_characters(code)  # Il blocco arriva da apply_segment_rules
+    listing_path = LISTINGS_DIR / f"{sha256_text(code)[:16]}.{language.lower() or 'txt'}"
+    if not listing_path.is_file():
+        LISTINGS_DIR.mkdir(parents=True, exist_ok=True)
+        write_file_if_changed(listing_path, code + "\n")
+    return listing_path
+
+def _code_block_to_listing(match) -> str:
+    language = match.group(1).strip()
+    code = match.group(2)
+    
+    # Opzione per specificare il linguaggio in LaTeX
+    if language:
+        # Converti il linguaggio usando il mapping, oppure usa il linguaggio originale
+        mapped_language = LISTINGS_LANGUAGE_MAPPING.get(language.lower(), language.capitalize())
+        language_option = f"[language={mapped_language}]"
+    else:
+        language_option = ""
+
+    # Blocco lungo con --external-listings: file a parte, letto da listings solo quando serve
+    if _EXTERNAL_LISTINGS_MIN_LINES is not None and code.count("\n") + 1 >= _EXTERNAL_LISTINGS_MIN_LINES:
+        return f"\\lstinputlisting{language_option}{{{write_listing_file(code, language).as_posix()}}}"
+
+    # Ritorna l'ambiente LaTeX
+    return f"\\begin{{lstlisting}}{language_option}\n{code}\n\\end{{lstlisting}}"
+
+def listing_files_in(latex_content: str) -> list:
+    """File di LISTINGS_DIR richiamati con \\lstinputlisting in una sezione."""
+    return [Path(name) for name in LISTING_INPUT_PATTERN.findall(latex_content)]
+
+def prune_listing_files(tex_paths: list):
+    """Cancella i listati di LISTINGS_DIR non più richiamati da nessuna sezione e riassume le dimensioni."""
+    if not LISTINGS_DIR.is_dir():
+        return
+    referenced = set()
+    inline_bytes = 0
+    for tex_path in tex_paths:
+        try:
+            content = tex_path.read_text(encoding='utf-8')
+        except OSError:
+            continue
+        inline_bytes += len(content.encode('utf-8'))
+        referenced.update(listing_files_in(content))
+    removed = 0
+    for listing_path in LISTINGS_DIR.iterdir():
+        # I .tmp sono listati che un'altra conversione sta ancora scrivendo
+        if listing_path.is_file() and listing_path.suffix != ".tmp" and listing_path not in referenced:
+            listing_path.unlink()
+            removed += 1
+    if removed:
+        logging.info(f"Rimossi {removed} listati non più usati da {LISTINGS_DIR}")
+    if referenced:
+        listing_bytes = sum(path.stat().st_size for path in referenced if path.is_file())
+        logging.info(f"Listati esterni: {len(referenced)} file in {LISTINGS_DIR} ({listing_bytes / 1024:.1f} KB), "
+                     f"sezioni .tex: {inline_bytes / 1024:.1f} KB")
+
+def code_blocks_in_segments(blocks: list) -> list:
+    """Converte i segmenti ```...``` in ambienti listings di LaTeX."""
+    converted = []
+    n_blocks = 0
+    for block in blocks:
+        block, n = CODE_BLOCK_LISTING_PATTERN.subn(_code_block_to_listing, block)
+        converted.append(block)
+        n_blocks += n
+    count_matches(n_blocks)
+    if n_blocks:
         logging.info("    - Convertiti blocchi di codice in ambiente 'listings' con mapping linguaggi")
-    
-    return processed_text
+    return converted
 
-def convert_bulleted_lists(text: str) -> str:
-    """Converte elenchi puntati Markdown in ambiente itemize LaTeX."""
+def convert_code_blocks(text: str) -> str:
+    """Converte blocchi di codice Markdown in ambienti listings di LaTeX."""
+    return apply_segment_rules(text, (conversion_rule(code_blocks_in_segments, SCOPE_CODE_BLOCK),))
+
+BOLD_PATTERN = re.compile(r"\*\*(.*?)\*\*")
+# Elemento di elenco: indentazione, poi "N." (numerato) oppure "-" (puntato), poi il testo
+LIST_ITEM_PATTERN = re.compile(r"^(\s*)(?:(\d+)\.|-)\s+(.*)")
+LIST_ENVIRONMENTS = ("enumerate", "itemize")
+LIST_INDENT = "    "
+# Livelli di annidamento di enumerate e itemize ammessi da LaTeX: gli elementi più
+# indentati restano nell'elenco più interno (e l'indentazione dell'output non cresce oltre)
+LIST_MAX_DEPTH = 4
+
+def lists_in_lines(lines: list, environments: tuple = LIST_ENVIRONMENTS) -> list:
+    """
+    Converte elenchi numerati e puntati Markdown in ambienti enumerate e itemize LaTeX con
+    un'unica passata in avanti e una sola decisione per riga:
+    - elemento ("N. " o "- "): in base all'indentazione rispetto agli elenchi aperti (una pila)
+      continua l'elenco corrente, ne apre uno annidato o chiude quelli più interni;
+      un tipo diverso alla stessa indentazione chiude l'elenco e ne apre uno nuovo;
+    - riga vuota dentro un elenco: messa da parte finché la riga successiva non dice se
+      l'elenco continua (e allora viene scartata) o finisce (e allora viene emessa dopo la chiusura);
+    - riga indentata dentro un elenco: continuazione dell'ultimo elemento;
+    - qualsiasi altra riga chiude tutti gli elenchi aperti.
+    Il contenuto degli ambienti lstlisting non viene mai interpretato come elenco.
+    `environments` limita la conversione a uno solo dei due tipi.
+    """
     processed_text = []
-    in_list = False
-    for line in text.splitlines():
-        # Cerca linee che iniziano con "- " (lista puntata)
-        match = re.match(r"^\s*-\s+(.*)", line)
+    open_lists = []      # [(ambiente, indentazione)] dal più esterno al più interno
+    pending_blank = []   # Righe vuote dentro un elenco, in attesa della riga successiva
+    in_listing = False
+    n_items = 0
+
+    def close_lists(min_indent=-1):
+        # Chiude gli elenchi più interni con indentazione maggiore di min_indent
+        while open_lists and open_lists[-1][1] > min_indent:
+            environment, _ = open_lists.pop()
+            processed_text.append(f"{LIST_INDENT * len(open_lists)}\\end{{{environment}}}")
+
+    for line in lines:
+        stripped = line.lstrip()
+        if in_listing:
+            processed_text.append(line)
+            in_listing = not stripped.startswith("\\end{lstlisting}")
+            continue
+
+        match = None
+        if stripped[:1] == "-" or stripped[:1].isdigit():
+            match = LIST_ITEM_PATTERN.match(line)
+            if match and LIST_ENVIRONMENTS[match.group(2) is None] not in environments:
+                match = None
+
         if match:
-            item_content = match.group(1)
+            # Elemento: le righe vuote tra due elementi non interrompono l'elenco
+            environment = LIST_ENVIRONMENTS[match.group(2) is None]
+            indent = len(match.group(1).expandtabs(4))
+            pending_blank.clear()
+            close_lists(indent)
+            if open_lists and open_lists[-1][0] != environment and open_lists[-1][1] == indent:
+                close_lists(indent - 1)
+            if not open_lists or (open_lists[-1][1] < indent and len(open_lists) < LIST_MAX_DEPTH):
+                processed_text.append(f"{LIST_INDENT * len(open_lists)}\\begin{{{environment}}}")
+                open_lists.append((environment, indent))
             # Gestisce il grassetto negli item (es. - **Titolo**: testo)
-            item_content = re.sub(r"\*\*(.*?)\*\*", r"\\textbf{\1}", item_content)
-            if not in_list:
-                processed_text.append("\\begin{itemize}")
-                in_list = True
-            processed_text.append(f"    \\item {item_content}")
+            item_content = BOLD_PATTERN.sub(r"\\textbf{\1}", match.group(3))
+            processed_text.append(f"{LIST_INDENT * len(open_lists)}\\item {item_content}")
+            n_items += 1
+        elif not open_lists:
+            processed_text.append(line)
+            in_listing = stripped.startswith("\\begin{lstlisting}")
+        elif not stripped:
+            pending_blank.append(line)
+        elif len(stripped) < len(line) and not stripped.startswith("\\begin{lstlisting}"):
+            # Riga indentata: continua l'ultimo elemento, anche dopo righe vuote
+            pending_blank.clear()
+            processed_text[-1] += " " + BOLD_PATTERN.sub(r"\\textbf{\1}", stripped)
         else:
-            if in_list:
-                processed_text.append("\\end{itemize}")
-                in_list = False
+            close_lists()
+            processed_text.extend(pending_blank)
+            pending_blank.clear()
             processed_text.append(line)
-    
-    if in_list: # Chiudi l'elenco se il file finisce con esso
-        processed_text.append("\\end{itemize}")
-        
-    logging.info("    - Convertiti elenchi puntati")
-    return "\n".join(processed_text)
+            in_listing = stripped.startswith("\\begin{lstlisting}")
+
+    # Chiudi gli elenchi se il file finisce con essi
+    close_lists()
+    processed_text.extend(pending_blank)
 
+    count_matches(n_items)
+    logging.info("    - Convertiti elenchi numerati e puntati")
+    return processed_text
 
+def numbered_lists_in_lines(lines: list) -> list:
+    """Converte solo gli elenchi numerati Markdown in ambiente enumerate LaTeX."""
+    return lists_in_lines(lines, ("enumerate",))
 
-def convert_headings(text: str) -> str:
-    # Versione modificata per accettare titoli standard (senza grassetto obbligatorio)
-    # Cerca: ### Titolo
-    text = re.sub(r"^\s*###\s+(.*?)(\s+\{.*\})?\s*$", r"\\subsubsection{\1}", text, flags=re.MULTILINE)
-    # Cerca: ## Titolo
-    text = re.sub(r"^\s*##\s+(.*?)(\s+\{.*\})?\s*$", r"\\subsection{\1}", text, flags=re.MULTILINE)
-    # Cerca: # Titolo
-    text = re.sub(r"^\s*#\s+(.*?)(\s+\{.*\})?\s*$", r"\\section{\1}", text, flags=re.MULTILINE)
+def bulleted_lists_in_lines(lines: list) -> list:
+    """Converte solo gli elenchi puntati Markdown in ambiente itemize LaTeX."""
+    return lists_in_lines(lines, ("itemize",))
+
+def convert_lists(text: str) -> str:
+    """Converte elenchi numerati e puntati Markdown (anche annidati) in ambienti LaTeX."""
+    return apply_line_rules(text, (conversion_rule(lists_in_lines, SCOPE_LINE),))
+
+def convert_bulleted_lists(text: str) -> str:
+    """Converte elenchi puntati Markdown in ambiente itemize LaTeX."""
+    return apply_line_rules(text, (conversion_rule(bulleted_lists_in_lines, SCOPE_LINE),))
+
+def convert_numbered_lists(text: str) -> str:
+    """Converte elenchi numerati Markdown in ambiente enumerate LaTeX."""
+    return apply_line_rules(text, (conversion_rule(numbered_lists_in_lines, SCOPE_LINE),))
+
+
+# Titoli standard (senza grassetto obbligatorio): # Titolo, ## Titolo, ### Titolo {#id}
+HEADING_LINE_PATTERN = re.compile(r"\s*(#{1,3})\s+(.*)")
+# Inizio degli attributi {#id} o {.unnumbered} in fondo al titolo
+HEADING_ATTRIBUTES_PATTERN = re.compile(r"\s\{")
+HEADING_COMMANDS = {1: "section", 2: "subsection", 3: "subsubsection"}
+
+def heading_title(title: str) -> str:
+    """
+    Testo del titolo senza spazi finali né attributi {...} in fondo alla riga.
+    Con stringhe invece di un gruppo facoltativo nella regex del titolo: (.*?)(\s+\{.*\})?\s*$
+    riprovava la coda della riga da ogni posizione, con tempo quadratico su righe lunghe.
+    """
+    title = title.rstrip()
+    if title.endswith("}"):
+        attributes = HEADING_ATTRIBUTES_PATTERN.search(title)
+        if attributes:
+            title = title[:attributes.start()].rstrip()
+    return title
+
+def headings_in_lines(lines: list) -> list:
+    """Converte i titoli Markdown in \\section, \\subsection e \\subsubsection (una riga alla volta)."""
+    processed_lines = []
+    n_headings = 0
+    for line in lines:
+        match = HEADING_LINE_PATTERN.match(line) if "#" in line else None
+        if match:
+            line = f"\\{HEADING_COMMANDS[len(match.group(1))]}{{{heading_title(match.group(2))}}}"
+            n_headings += 1
+        processed_lines.append(line)
+    count_matches(n_headings)
     logging.info("    - Convertiti i titoli (usando regole standard)")
-    return text
+    return processed_lines
+
+def convert_headings(text: str) -> str:
+    return apply_line_rules(text, (conversion_rule(headings_in_lines, SCOPE_LINE),))
+
+EMPHASIS_QUOTES_PATTERN = re.compile(r'"(.*?)"')
 
 def convert_emphasis_quotes(text: str) -> str:
-    text = re.sub(r'"(.*?)"', r"''\1''", text)
+    text = EMPHASIS_QUOTES_PATTERN.sub(r"''\1''", text)
     logging.info("    - Convertite virgolette doppie in virgolette LaTeX")
     return text
 
-def convert_numbered_lists(text: str) -> str:
-    """Converte elenchi numerati Markdown in ambiente enumerate LaTeX."""
-    lines = text.splitlines()
-    processed_text = []
-    in_list = False
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i]
-        match = re.match(r"^\s*(\d+)\.\s+(.*)", line)
-        
-        if match:
-            item_content = match.group(2)
-            
-            # Se non siamo già in una lista, iniziala
-            if not in_list:
-                processed_text.append("\\begin{enumerate}")
-                in_list = True
-            
-            # Gestione del grassetto negli item
-            item_content = re.sub(r"\*\*(.*?)\*\*", r"\\textbf{\1}", item_content)
-            processed_text.append(f"    \\item {item_content}")
-            
-            # Controlla se ci sono linee successive che appartengono a questo item
-            # (linee che iniziano con spazi e non sono nuovi elementi della lista)
-            j = i + 1
-            while j < len(lines):
-                next_line = lines[j]
-                
-                # Se la prossima linea è un nuovo elemento numerato, fermati
-                if re.match(r"^\s*(\d+)\.\s+", next_line):
-                    break
-                
-                # Se la prossima linea è vuota, controllala ma continua
-                if not next_line.strip():
-                    j += 1
-                    continue
-                
-                # Se la prossima linea inizia con spazi (continuazione dell'item corrente)
-                if re.match(r"^\s+\S", next_line):
-                    # Aggiungi la linea continuativa all'item corrente
-                    continuation = re.sub(r"^\s+", "", next_line)  # Rimuovi indentazione
-                    continuation = re.sub(r"\*\*(.*?)\*\*", r"\\textbf{\1}", continuation)
-                    processed_text[-1] += f" {continuation}"
-                    j += 1
-                else:
-                    # Linea che non appartiene all'item, fermati
-                    break
-            
-            i = j - 1  # Imposta i alla linea prima di quella che non abbiamo processato
-            
-        else:
-            # Non è un elemento di lista numerata
-            
-            # Se la linea è vuota e siamo in una lista, potrebbe essere spazio tra elementi
-            if not line.strip() and in_list:
-                # Guarda avanti per vedere se c'è un altro elemento numerato
-                j = i + 1
-                found_next_item = False
-                while j < len(lines):
-                    next_line = lines[j]
-                    if not next_line.strip():  # Altra linea vuota, continua a cercare
-                        j += 1
-                        continue
-                    elif re.match(r"^\s*(\d+)\.\s+", next_line):  # Trovato prossimo elemento
-                        found_next_item = True
-                        break
-                    else:  # Trovata linea non vuota che non è un elemento
-                        break
-                
-                if found_next_item:
-                    # C'è un altro elemento, mantieni la lista aperta e salta le righe vuote
-                    i = j - 1  # Sarà incrementato alla fine del loop
-                else:
-                    # Non c'è un altro elemento, chiudi la lista
-                    processed_text.append("\\end{enumerate}")
-                    in_list = False
-                    processed_text.append(line)
-            else:
-                # Linea normale o non siamo in una lista
-                if in_list:
-                    processed_text.append("\\end{enumerate}")
-                    in_list = False
-                processed_text.append(line)
-        
-        i += 1
-    
-    # Chiudi la lista se il file finisce con essa
-    if in_list:
-        processed_text.append("\\end{enumerate}")
-        
-    logging.info("    - Convertiti elenchi numerati")
-    return "\n".join(processed_text)
+BLANK_LINES_PATTERN = re.compile(r"(\n\s*){2,}")
 
 def manage_paragraphs(text: str) -> str:
     """Assicura la corretta spaziatura tra paragrafi per LaTeX."""
@@ -554,73 +1290,103 @@ def manage_paragraphs(text: str) -> str:
     # quindi una riga vuota tra i paragrafi nel sorgente .tex è sufficiente.
     # Questa funzione si assicura che multiple righe vuote nel Markdown
     # diventino una singola riga vuota nel LaTeX (per pulizia).
-    # E che i newline singoli diventino spazi (comportamento standard MD -> LaTeX).
-    
-    lines = text.splitlines()
-    processed_lines = []
-    for i, line in enumerate(lines):
-        if not line.strip(): # Riga vuota
-            if processed_lines and processed_lines[-1].strip(): # Aggiungi solo se la precedente non era vuota
-                processed_lines.append("")
-        else:
-            # Se la riga precedente non era un comando di sezione/lista e questa non inizia un comando
-            # e la riga precedente terminava con testo (non era vuota),
-            # allora il newline singolo in MD dovrebbe essere uno spazio (a meno che non sia fine paragrafo)
-            # Questa logica è complessa e spesso gestita meglio da parser Markdown completi.
-            # Per ora, manteniamo i newline, il template gestisce \parskip.
-            processed_lines.append(line)
-            
-    # Un approccio più semplice: collassa multiple righe vuote a una singola riga vuota.
-    text = re.sub(r"(\n\s*){2,}", "\n\n", text)
+    # I newline singoli restano tali: il template gestisce \parskip.
+    text, n_collapsed = BLANK_LINES_PATTERN.subn("\n\n", text)
+    count_matches(n_collapsed)
     logging.info("    - Gestiti i paragrafi (collassate righe vuote multiple)")
     return text
 
 
-def apply_persona_command(text: str) -> str:
-    """Applica il comando \persona alle persone note, solo la prima volta."""
-    global PERSONA_APPLIED_SET # Riferimento allo stato globale
-    
-    processed_text = text
-    
-    # Itera attraverso le persone note
-    for canonical_name, details in KNOWN_PEOPLE.items():
+# Matcher compilati delle persone note, uno per tabella (--batch converte progetti con tabelle diverse)
+_PERSONA_MATCHER_CACHE = {}
+_PERSONA_MATCHER_CACHE_SIZE = 16
+# Ultima tabella usata (copia) e il suo matcher: confrontare la tabella con la copia costa molto
+# meno di repr(), che conta quando le regole sono eseguite su molti blocchi piccoli
+_PERSONA_MATCHER_LAST = None
+
+def _trie_to_regex(node: dict) -> str:
+    """Converte un trie di caratteri in una regex con i prefissi condivisi (match più lungo per primo)."""
+    is_end = "" in node
+    branches = [re.escape(char) + _trie_to_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if is_end:
+        # Il quantificatore greedy prova prima la variante più lunga, poi ripiega sul prefisso
+        return "(?:" + body + ")?" if len(branches) == 1 else body + "?"
+    return body
+
+def compile_persona_matcher(known_people: dict):
+    """
+    Compila tutte le varianti di known_people in un'unica regex basata su un trie,
+    così ogni testo viene scandito una sola volta qualunque sia il numero di persone.
+    Restituisce (regex, {variante: (nome canonico, nascita, morte)}) oppure None se la tabella è vuota.
+    Se due persone condividono una variante vale la prima in ordine di tabella.
+    """
+    variant_to_person = {}
+    for canonical_name, details in known_people.items():
         birth = details.get("birth", "0000")
         death = details.get("death", "9999")
-        
-        # Itera attraverso le varianti del nome, dalla più lunga alla più corta
-        for variant in sorted(details["variants"], key=len, reverse=True):
-            # Cerca la variante esatta nel testo. Usiamo \b per word boundaries.
-            # Dobbiamo fare attenzione a non sostituire parzialmente (es. "Bernardini" dentro "Prof. Nicola Bernardini")
-            # Lo facciamo processando le varianti più lunghe prima.
-            
-            # Costruisci la regex per trovare la variante, assicurandoti che non sia già parte di un comando LaTeX
-            # Questo è per evitare di processare \persona{Giacinto Scelsi} di nuovo.
-            # La regex negativa lookbehind (?<!\\persona{) è un po' limitata in Python standard re.
-            # Semplifichiamo: se troviamo il nome e il canonico non è in PERSONA_APPLIED_SET, lo sostituiamo.
-            # Poi aggiungiamo a PERSONA_APPLIED_SET. Se è già dentro, non facciamo nulla per \persona.
-
-            # Pattern per trovare la variante
-            # Usare re.escape per i caratteri speciali nel nome (es. "Prof.")
-            pattern = r"\b" + re.escape(variant) + r"\b"
-            
-            # Funzione di sostituzione per re.sub
-            def replace_with_persona(match):
-                global PERSONA_APPLIED_SET
-                matched_text = match.group(0) # Il testo completo che ha matchato
-                
-                if canonical_name not in PERSONA_APPLIED_SET:
-                    PERSONA_APPLIED_SET.add(canonical_name)
-                    print(f"    - Applicato \\persona per {canonical_name} (variante: {variant})")
-                    return f"\\persona{{{canonical_name}}}{{{birth}}}{{{death}}}"
-                else:
-                    # Se già "personato", restituisci il testo originale (o il nome canonico, se la variante è diversa)
-                    # Per semplicità, restituiamo il testo matchato originale.
-                    # Questo significa che "Prof. Nicola Bernardini" rimane tale se \persona è già stato applicato
-                    # a "Bernardini". Potremmo volerlo normalizzare al nome canonico.
-                    # Ma il tuo template \persona non influenza la visualizzazione oltre la prima volta.
-                    return matched_text 
-
-            processed_text = re.sub(pattern, replace_with_persona, processed_text)
+        for variant in details["variants"]:
+            if variant:
+                variant_to_person.setdefault(variant, (canonical_name, birth, death))
+    if not variant_to_person:
+        return None
+
+    trie = {}
+    for variant in variant_to_person:
+        node = trie
+        for char in variant:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    pattern = re.compile(r"\b" + _trie_to_regex(trie) + r"\b")
+    return pattern, variant_to_person
+
+def get_persona_matcher(known_people: dict = None):
+    """Restituisce il matcher di known_people (default: KNOWN_PEOPLE), compilandolo una sola volta per tabella."""
+    global _PERSONA_MATCHER_LAST
+    if known_people is None:
+        known_people = KNOWN_PEOPLE
+    items = list(known_people.items())
+    if _PERSONA_MATCHER_LAST is not None and _PERSONA_MATCHER_LAST[0] == items:
+        return _PERSONA_MATCHER_LAST[1]
+    signature = repr(items)
+    if signature not in _PERSONA_MATCHER_CACHE:
+        if len(_PERSONA_MATCHER_CACHE) >= _PERSONA_MATCHER_CACHE_SIZE:
+            del _PERSONA_MATCHER_CACHE[next(iter(_PERSONA_MATCHER_CACHE))]
+        _PERSONA_MATCHER_CACHE[signature] = compile_persona_matcher(known_people)
+    _PERSONA_MATCHER_LAST = (copy.deepcopy(items), _PERSONA_MATCHER_CACHE[signature])
+    return _PERSONA_MATCHER_LAST[1]
+
+def apply_persona_command(text: str, applied_set: set = None) -> str:
+    """
+    Applica il comando \persona alle persone note, solo la prima volta.
+    applied_set contiene le persone già marcate (default: lo stato globale PERSONA_APPLIED_SET)
+    e viene aggiornato con quelle marcate in questo testo.
+    Il testo è scandito una sola volta: a ogni posizione vince la variante più lunga,
+    e il comando viene messo sulla prima citazione della persona nel testo.
+    """
+    if applied_set is None:
+        applied_set = PERSONA_APPLIED_SET # Riferimento allo stato globale
+
+    matcher = get_persona_matcher()
+    if matcher is None:
+        logging.info("    - Tentativo di applicazione comando \\persona")
+        return text
+    pattern, variant_to_person = matcher
+
+    def replace_with_persona(match):
+        matched_text = match.group(0) # Il testo completo che ha matchato
+        canonical_name, birth, death = variant_to_person[matched_text]
+        if canonical_name in applied_set:
+            # Se già "personato", restituisci il testo originale
+            return matched_text
+        applied_set.add(canonical_name)
+        count_matches(1)
+        print(f"    - Applicato \\persona per {canonical_name} (variante: {matched_text})")
+        return f"\\persona{{{canonical_name}}}{{{birth}}}{{{death}}}"
+
+    processed_text = pattern.sub(replace_with_persona, text)
 
     # todo: Aggiungere una seconda passata per identificare persone non in KNOWN_PEOPLE
     # usando pattern come "Nome Cognome (AAAA-BBBB)" o "Nome Cognome [A-Z][a-z]+ [A-Z][a-z]+".
@@ -629,258 +1395,545 @@ def apply_persona_command(text: str) -> str:
     logging.info("    - Tentativo di applicazione comando \\persona")
     return processed_text
 
-def convert_inline_code(text: str) -> str:
-    """Converte il codice inline Markdown (`codice`) in \texttt{codice} LaTeX."""
-    pattern = re.compile(r"(?<!`)`([^`\n]+?)`(?!`)") 
+def find_persona_mentions(text: str) -> set:
+    """Restituisce i nomi canonici delle persone note citate nel testo (con almeno una variante)."""
+    matcher = get_persona_matcher()
+    if matcher is None:
+        return set()
+    pattern, variant_to_person = matcher
+    mentioned = {variant_to_person[match.group(0)][0] for match in pattern.finditer(text)}
+    count_matches(len(mentioned))
+    return mentioned
+
+def resolve_persona_first_mentions(mentions_per_section: list) -> list:
+    """
+    Pre-passata per la conversione parallela: dato l'insieme delle persone citate in
+    ciascuna sezione (in ordine), restituisce per ogni sezione quelle già marcate con
+    \\persona in una sezione precedente, come farebbe l'esecuzione seriale.
+    """
+    applied_so_far = set()
+    already_applied = []
+    for mentioned in mentions_per_section:
+        already_applied.append(set(mentioned) & applied_so_far)
+        applied_so_far |= set(mentioned)
+    return already_applied
+
+# --- Registro esterno delle persone (--people) ---
+# Il registro è un file CSV con intestazione name,variants,birth,death oppure un database SQLite con
+# una tabella people con le stesse colonne; le varianti sono separate da PEOPLE_VARIANTS_SEPARATOR.
+# Viene letto una volta sola e indicizzato per parola in PEOPLE_INDEX_FILE (SQLite): a ogni conversione
+# si leggono dall'indice solo le persone con una parola del testo, e in KNOWN_PEOPLE entrano solo
+# quelle le cui varianti possono comparire. La regex del matcher resta così piccola, e l'avvio veloce,
+# anche con un registro di decine di migliaia di persone.
+
+PEOPLE_VARIANTS_SEPARATOR = "|"
+# Da incrementare quando cambia il formato di PEOPLE_INDEX_FILE
+PEOPLE_INDEX_VERSION = "1"
+# Caratteri di parola che il convertitore sostituisce con comandi LaTeX (π nel testo, lettere greche ed
+# esponenti nel codice inline): nel LaTeX separano le parole vicine, quindi le separano anche qui
+_REPLACED_WORD_CHARACTERS = "".join(sorted(
+    char for char in {*latex_symbols.PROSE_SYMBOLS, *map(chr, INLINE_CODE_TRANSLATION)} if re.match(r"\w", char)))
+# Parole del testo e delle varianti per il prefiltro; "_" le separa perché nel LaTeX diventa \_
+WORD_TOKEN_PATTERN = re.compile(r"[^\W_" + re.escape(_REPLACED_WORD_CHARACTERS) + r"]+")
+
+# Registri già indicizzati in questo processo (--watch, --server):
+# { (registro, indice): ((mtime_ns, dimensione) del registro, registro) }
+_PEOPLE_REGISTRY_MEMO = {}
+# Parole dei testi dell'ultima selezione: { testo: parole }
+_CORPUS_WORDS_CACHE = {}
+
+def read_people_registry(path: Path, data: bytes) -> list:
+    """
+    Persone del registro, nell'ordine del file: [[nome canonico, {"variants": [...], "birth": ..., "death": ...}]].
+    Senza varianti vale il nome canonico; nascita e morte possono mancare. Un nome ripetuto vale la prima volta.
+    """
+    if data.startswith(b"SQLite format 3\x00"):
+        import sqlite3
+        with contextlib.closing(sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = [dict(row) for row in connection.execute("SELECT * FROM people ORDER BY rowid")]
+    else:
+        rows = list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'), newline='')))
 
-    def replacer_logic(match):
-        code = match.group(1)
-        
-        # Prima gestisci caratteri Unicode speciali che non esistono in \texttt{}
-        unicode_replacements = {
-            '≈': r'$\approx$',      # Approx symbol -> math mode
-            'π': r'$\pi$',          # Pi symbol -> math mode  
-            '×': r'$\times$',       # Times symbol -> math mode
-            '÷': r'$\div$',         # Division symbol -> math mode
-            '±': r'$\pm$',          # Plus-minus -> math mode
-            '∞': r'$\infty$',       # Infinity -> math mode
-            '≤': r'$\leq$',         # Less or equal -> math mode
-            '≥': r'$\geq$',         # Greater or equal -> math mode
-            '≠': r'$\neq$',         # Not equal -> math mode
-            '²': r'$^2$',           # Superscript 2 -> math mode
-            '³': r'$^3$',           # Superscript 3 -> math mode
-        }
-        
-        # Sostituzioni Unicode prima di applicare \texttt{}
-        for unicode_char, latex_replacement in unicode_replacements.items():
-            if unicode_char in code:
-                # Se c'è un carattere Unicode, chiudi \texttt{}, inserisci math, riapri \texttt{}
-                # Usa concatenazione invece di f-string per evitare problemi con le graffe
-                replacement = "}}}" + latex_replacement + "\\texttt{{"
-                code = code.replace(unicode_char, replacement)
-        
-        # Poi gestisci i caratteri ASCII speciali
-        code = code.replace('\\', r'\textbackslash{}')
-        code = code.replace('{', r'\{')
-        code = code.replace('}', r'\}')
-        code = code.replace('_', r'\_')
-        code = code.replace('^', r'\textasciicircum{}')
-        code = code.replace('-', r'{-}')
-        code = code.replace('&', r'\&')
-        code = code.replace('%', r'\%')
-        code = code.replace('#', r'\#')
-        code = code.replace('$', r'\$')
-        code = code.replace('~', r'\textasciitilde{}')
-        code = code.replace('(', r'(')
-        code = code.replace(')', r')')
-        
-        # Gestisci il caso di \texttt{}} all'inizio se ci sono state sostituzioni Unicode
-        result = f"\\texttt{{{code}}}"
-        result = result.replace(r'\texttt{}', '')  # Rimuovi \texttt{} vuoti
-        
-        return result
+    people = []
+    seen = set()
+    for row in rows:
+        name = str(row.get("name") or "").strip()
+        if not name:
+            continue
+        if name in seen:
+            logging.warning(f"Persona ripetuta nel registro {path}: {name} (vale la prima riga)")
+            continue
+        seen.add(name)
+        variants = [variant.strip() for variant in str(row.get("variants") or "").split(PEOPLE_VARIANTS_SEPARATOR)]
+        details = {"variants": [variant for variant in variants if variant] or [name]}
+        for field in ("birth", "death"):
+            if str(row.get(field) or "").strip():
+                details[field] = str(row[field]).strip()
+        people.append([name, details])
+    return people
+
+def build_people_index(people: list) -> dict:
+    """
+    Indice delle varianti: { parola: [posizioni delle persone nel registro] }. Ogni variante è indicizzata
+    sotto la sua parola più lunga, di solito il cognome; quelle senza parole sotto "" (sempre candidate).
+    """
+    index = {}
+    for position, (_, details) in enumerate(people):
+        for variant in details["variants"]:
+            words = WORD_TOKEN_PATTERN.findall(variant)
+            positions = index.setdefault(max(words, key=len) if words else "", [])
+            if not positions or positions[-1] != position:
+                positions.append(position)
+    return index
+
+def write_people_index(index_path: Path, people: list, digest: str):
+    """Scrive l'indice del registro (persone e parole delle varianti) in un database SQLite, in modo atomico."""
+    import sqlite3
+    tmp_path = temporary_path_for(index_path)
+    try:
+        with contextlib.closing(sqlite3.connect(tmp_path)) as connection:
+            connection.executescript("""
+                CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE people (position INTEGER PRIMARY KEY, name TEXT, details TEXT);
+                CREATE TABLE words (word TEXT, position INTEGER, PRIMARY KEY (word, position)) WITHOUT ROWID;
+            """)
+            connection.executemany("INSERT INTO info VALUES (?, ?)",
+                                   [("version", PEOPLE_INDEX_VERSION), ("digest", digest), ("people", str(len(people)))])
+            connection.executemany("INSERT INTO people VALUES (?, ?, ?)",
+                                   ((position, name, json.dumps(details, ensure_ascii=False))
+                                    for position, (name, details) in enumerate(people)))
+            connection.executemany("INSERT INTO words VALUES (?, ?)",
+                                   ((word, position) for word, positions in build_people_index(people).items()
+                                    for position in positions))
+            connection.commit()
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def people_index_info(index_path: Path) -> dict:
+    """Tabella info dell'indice del registro ({} se l'indice manca o non è leggibile)."""
+    import sqlite3
+    if not index_path.is_file():
+        return {}
+    try:
+        with contextlib.closing(sqlite3.connect(f"{index_path.as_uri()}?mode=ro", uri=True)) as connection:
+            return dict(connection.execute("SELECT key, value FROM info"))
+    except sqlite3.Error:
+        return {}
 
-    processed_text = pattern.sub(replacer_logic, text)
-    if processed_text != text:
+def load_people_registry(path: Path, use_cache: bool = True) -> dict:
+    """
+    Registro delle persone già indicizzato: {"index": percorso di PEOPLE_INDEX_FILE, "digest": SHA-256 del
+    registro, "people": numero di persone}. L'indice viene ricostruito solo quando cambia il contenuto del
+    registro; nello stesso processo il registro viene riletto solo se ne cambiano mtime o dimensione.
+    """
+    path = path.resolve()
+    index_path = PEOPLE_INDEX_FILE.resolve()
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    memo = _PEOPLE_REGISTRY_MEMO.get((path, index_path))
+    if use_cache and memo and memo[0] == signature and index_path.is_file():
+        return memo[1]
+
+    data = path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    info = people_index_info(index_path) if use_cache else {}
+    if info.get("version") == PEOPLE_INDEX_VERSION and info.get("digest") == digest:
+        size = int(info["people"])
+    else:
+        people = read_people_registry(path, data)
+        ensure_dir_exists(BUILD_CACHE_DIR)
+        write_people_index(index_path, people, digest)
+        size = len(people)
+        logging.info(f"Indicizzato il registro delle persone {path}: {size} persone.")
+    registry = {"index": index_path, "digest": digest, "people": size}
+    _PEOPLE_REGISTRY_MEMO[(path, index_path)] = (signature, registry)
+    return registry
+
+def corpus_words(texts) -> set:
+    """
+    Parole (WORD_TOKEN_PATTERN) dei testi. Il testo viene prima diviso sugli spazi, che nessuna parola
+    attraversa: la regex scandisce così solo le parole distinte, molto meno del testo intero.
+    """
+    global _CORPUS_WORDS_CACHE
+    cache = {}
+    words = set()
+    for text in texts:
+        text_words = _CORPUS_WORDS_CACHE.get(text)
+        if text_words is None:
+            text_words = set(WORD_TOKEN_PATTERN.findall(" ".join(set(text.split()))))
+        cache[text] = text_words
+        words |= text_words
+    _CORPUS_WORDS_CACHE = cache
+    return words
+
+def select_registry_people(registry: dict, words: set) -> list:
+    """
+    Persone del registro che possono comparire in un testo con queste parole, nell'ordine del registro:
+    [[nome canonico, dettagli]]. Il matcher trova una variante solo tra confini di parola, quindi tutte
+    le sue parole sono parole del testo: il prefiltro non scarta mai una persona citata (i soli nomi di
+    comandi LaTeX generati dal convertitore, come \\item, non sono parole del Markdown).
+    """
+    import sqlite3
+    with contextlib.closing(sqlite3.connect(f"{registry['index'].as_uri()}?mode=ro", uri=True)) as connection:
+        connection.execute("CREATE TEMP TABLE corpus (word TEXT PRIMARY KEY) WITHOUT ROWID")
+        connection.executemany("INSERT INTO corpus VALUES (?)", ((word,) for word in words | {""}))
+        rows = connection.execute("""
+            SELECT DISTINCT people.position, people.name, people.details
+            FROM corpus JOIN words ON words.word = corpus.word JOIN people ON people.position = words.position
+            ORDER BY people.position
+        """).fetchall()
+    selected = []
+    for _, name, details in rows:
+        details = json.loads(details)
+        if any(words.issuperset(WORD_TOKEN_PATTERN.findall(variant)) for variant in details["variants"]):
+            selected.append([name, details])
+    return selected
+
+def use_registry_people(digest: str, people: list):
+    """
+    Sostituisce in KNOWN_PEOPLE le persone prese in precedenza dal registro con people, nell'ordine dato.
+    Una persona già presente in KNOWN_PEOPLE mantiene la sua voce, anche se vi è stata messa dopo
+    l'ultima selezione (ad esempio da --batch).
+    """
+    global people_registry_digest
+    for name, details in registry_people.items():
+        if KNOWN_PEOPLE.get(name) is details:
+            del KNOWN_PEOPLE[name]
+    registry_people.clear()
+    people_registry_digest = digest
+    for name, details in people:
+        if name not in KNOWN_PEOPLE:
+            KNOWN_PEOPLE[name] = details
+            registry_people[name] = details
+
+def load_registry_people(registry_path, texts, use_cache: bool = True):
+    """
+    Aggiunge a KNOWN_PEOPLE le persone del registro registry_path che possono comparire nei testi
+    e restituisce il registro (None se registry_path è None o il registro non è leggibile).
+    """
+    registry = None
+    if registry_path:
+        try:
+            registry = load_people_registry(Path(registry_path), use_cache)
+        except Exception as e:
+            logging.error(f"Impossibile leggere il registro delle persone {registry_path}: {e}")
+    if registry is None:
+        use_registry_people("", [])
+        return None
+    started = time.perf_counter()
+    people = select_registry_people(registry, corpus_words(texts))
+    use_registry_people(registry["digest"], people)
+    logging.info(f"Registro delle persone: {len(people)} di {registry['people']} persone possono comparire nel testo "
+                 f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    return registry
+
+INLINE_CODE_TEXTTT_PATTERN = re.compile(r"(?<!`)`([^`\n]+?)`(?!`)")
+
+def _inline_code_to_texttt(match) -> str:
+    # Escape dei caratteri speciali e simboli Unicode in un'unica passata (tabelle di latex_symbols)
+    code = match.group(1)
+    if profiling_enabled():
+        count_matches(len(INLINE_CODE_SYMBOL_PATTERN.findall(code)))
+    code = code.translate(INLINE_CODE_TRANSLATION)
+
+    # Un simbolo all'inizio o alla fine lascia un \texttt{} vuoto
+    result = f"\\texttt{{{code}}}"
+    result = result.replace(r'\texttt{}', '')  # Rimuovi \texttt{} vuoti
+    
+    return result
+
+def inline_code_in_segments(snippets: list) -> list:
+    """Converte i segmenti di codice inline `codice` in \\texttt{codice}."""
+    converted = []
+    n_inline = 0
+    for snippet in snippets:
+        snippet, n = INLINE_CODE_TEXTTT_PATTERN.subn(_inline_code_to_texttt, snippet)
+        converted.append(snippet)
+        n_inline += n
+    count_matches(n_inline)
+    if n_inline:
         logging.info("    - Convertito codice inline con gestione Unicode")
-        
-    return processed_text
-
-# --- NUOVA FUNZIONE PER L'ESCAPE DEGLI UNDERSCORE ---
+    return converted
 
-def escape_ellipsis(text: str) -> str:
-    """Converte ... in \ldots nel testo normale, ma protegge i blocchi di codice."""
+def convert_inline_code(text: str) -> str:
+    """Converte il codice inline Markdown (`codice`) in \texttt{codice} LaTeX."""
+    return apply_segment_rules(text, (conversion_rule(inline_code_in_segments, SCOPE_INLINE_CODE),))
+
+# --- Segmentazione del documento in blocchi protetti e testo normale ---
+
+# Tipi di segmento prodotti da tokenize_markdown_segments
+SEG_PROSE = "prose"              # Testo normale, su cui lavorano gli escape
+SEG_CODE_BLOCK = "code_block"    # Blocco di codice ```...```
+SEG_INLINE_CODE = "inline_code"  # Codice inline `...`
+
+# Caratteri ad uso privato usati come segnaposto al posto dei vecchi
+# __CODE_BLOCK_n__ / __INLINE_CODE_n__: un solo carattere per segmento,
+# ripristinato con un unico split invece di un str.replace per segnaposto.
+SEGMENT_MARKER = "\uE000"
+MATH_MARKER = "\uE001"
+LATEX_CMD_MARKER = "\uE002"
+# Gli stessi caratteri possono però comparire nel Markdown (testo copiato da un PDF, glifi privati di un font):
+# apply_segment_rules li sostituisce all'ingresso con MARKER_ESCAPE seguito da un altro carattere privato
+# e li ripristina all'uscita. MARKER_ESCAPE stesso viene sostituito allo stesso modo.
+MARKER_ESCAPE = "\uE003"
+_MARKER_ESCAPES = {ord(char): MARKER_ESCAPE + chr(ord(char) + 0x10)
+                   for char in (SEGMENT_MARKER, MATH_MARKER, LATEX_CMD_MARKER, MARKER_ESCAPE)}
+_MARKER_UNESCAPE_PATTERN = re.compile(MARKER_ESCAPE + "([\uE010-\uE013])")
+RESERVED_CHARACTERS_PATTERN = re.compile("[\uE000-\uE003]")
+# Per la sola segmentazione: un carattere qualsiasi della stessa lunghezza al posto di quelli riservati
+_MARKER_PLACEHOLDERS = {ord(char): "\uFFFD" for char in (SEGMENT_MARKER, MATH_MARKER, LATEX_CMD_MARKER, MARKER_ESCAPE)}
+
+CODE_BLOCK_PATTERN = re.compile(r"```.*?```", re.DOTALL)
+# Il controllo sul carattere prima del ` segue il ` stesso, così la ricerca parte dal carattere fisso
+INLINE_CODE_PATTERN = re.compile(r"`(?<![`\uE000]`)([^`\n\uE000]+?)`(?![`\uE000])")
+INLINE_MATH_PATTERN = re.compile(r"\$.*?\$")
+LATEX_COMMAND_PATTERN = re.compile(r'\\[a-zA-Z]+\{[^}]*\}')
+LATEX_COMMAND_CLOSER = "}"
+
+def tokenize_markdown_segments(text: str) -> list:
+    """
+    Divide il testo in segmenti tipizzati [(tipo, testo), ...] con una sola scansione:
+    blocchi di codice ```...```, codice inline `...` e testo normale (SEG_PROSE).
+    Concatenando i testi dei segmenti si riottiene esattamente il testo originale.
+    """
+    if RESERVED_CHARACTERS_PATTERN.search(text):
+        # I caratteri dei marcatori sono già nel testo: la segmentazione si fa su una copia della stessa
+        # lunghezza in cui sono caratteri qualsiasi, poi i segmenti riprendono il testo originale
+        segments = []
+        position = 0
+        for kind, segment_text in tokenize_markdown_segments(text.translate(_MARKER_PLACEHOLDERS)):
+            segments.append((kind, text[position:position + len(segment_text)]))
+            position += len(segment_text)
+        return segments
+
+    # I blocchi di codice vengono sostituiti dal marcatore, così il codice inline
+    # non può essere cercato al loro interno (come accadeva con i segnaposto)
     code_blocks = []
-    inline_code_blocks = []
-    
     def save_code_block(match):
         code_blocks.append(match.group(0))
-        return f"__CODE_BLOCK_{len(code_blocks)-1}__"
-    
-    def save_inline_code(match):
-        inline_code_blocks.append(match.group(0))
-        return f"__INLINE_CODE_{len(inline_code_blocks)-1}__"
-    
-    # Proteggi blocchi di codice multilinea
-    text = re.sub(r"```.*?```", save_code_block, text, flags=re.DOTALL)
-    
-    # Proteggi codice inline
-    text = re.sub(r"(?<!_)`([^`\n]+?)`(?!_)", save_inline_code, text)
-    
-    # Proteggi comandi LaTeX già formattati
-    latex_commands = []
-    def save_latex_command(match):
-        latex_commands.append(match.group(0))
-        return f"__LATEX_CMD_{len(latex_commands)-1}__"
-    
-    text = re.sub(r'\\[a-zA-Z]+\{[^}]*\}', save_latex_command, text)
-    
-    # Converti i puntini di sospensione
-    # Gestisce sia ... (tre punti) che … (carattere Unicode ellipsis)
-    text = re.sub(r'\.{3,}', r'\\ldots', text)  # Tre o più punti consecutivi
-    text = text.replace('…', '\\ldots')          # Carattere Unicode ellipsis
-    
-    # Ripristina i comandi LaTeX
-    for i, cmd in enumerate(latex_commands):
-        text = text.replace(f"__LATEX_CMD_{i}__", cmd)
-    
-    # Ripristina blocchi di codice
-    for i, code_block in enumerate(code_blocks):
-        text = text.replace(f"__CODE_BLOCK_{i}__", code_block)
-    
-    for i, inline_code in enumerate(inline_code_blocks):
-        text = text.replace(f"__INLINE_CODE_{i}__", inline_code)
-    
+        return SEGMENT_MARKER
+    view = CODE_BLOCK_PATTERN.sub(save_code_block, text)
+
+    segments = []
+    code_block_iter = iter(code_blocks)
+    def append_prose_with_code_blocks(chunk):
+        pieces = chunk.split(SEGMENT_MARKER)
+        for n, piece in enumerate(pieces):
+            if n:
+                segments.append((SEG_CODE_BLOCK, next(code_block_iter)))
+            if piece:
+                segments.append((SEG_PROSE, piece))
+
+    pos = 0
+    for match in INLINE_CODE_PATTERN.finditer(view):
+        append_prose_with_code_blocks(view[pos:match.start()])
+        segments.append((SEG_INLINE_CODE, match.group(0)))
+        pos = match.end()
+    append_prose_with_code_blocks(view[pos:])
+    count_matches(len(segments))
+    return segments
+
+def unescape_marker_characters(text: str) -> str:
+    """Ripristina i caratteri dei marcatori sostituiti da apply_segment_rules (vedi MARKER_ESCAPE)."""
+    if MARKER_ESCAPE not in text:
+        return text
+    return _MARKER_UNESCAPE_PATTERN.sub(lambda match: chr(ord(match.group(1)) - 0x10), text)
+
+def _restore_markers(view: str, marker: str, protected: list) -> str:
+    """Reinserisce i blocchi protetti al posto dei marcatori con un solo split e una sola join."""
+    if not protected:
+        return view
+    pieces = view.split(marker)
+    if len(pieces) != len(protected) + 1:
+        raise ValueError(f"Marcatore U+{ord(marker):04X} alterato durante la conversione")
+    output = [pieces[0]]
+    for block, piece in zip(protected, pieces[1:]):
+        output.append(block)
+        output.append(piece)
+    return "".join(output)
+
+def _apply_outside(text: str, pattern, marker: str, func, closer: str = None) -> str:
+    """
+    Applica func al testo escludendo i match di pattern, sostituiti temporaneamente da marker.
+    closer è il carattere con cui finisce ogni match (se ce n'è uno): la ricerca si ferma
+    all'ultima sua occorrenza, perché oltre non può iniziare nessun match. Così un'apertura
+    senza chiusura (\\cmd{ ripetuto, senza }) non viene ritentata fino alla fine del testo
+    a ogni occorrenza, con tempo quadratico.
+    """
+    protected = []
+    def save(match):
+        protected.append(match.group(0))
+        return marker
+    cut = text.rfind(closer) + 1 if closer else len(text)
+    view = pattern.sub(save, text[:cut]) + text[cut:]
+    return _restore_markers(func(view), marker, protected)
+
+# --- Regole di conversione: ambiti e passate fuse ---
+
+# Una regola della pipeline: `func` riceve il testo (o i segmenti/le righe, secondo l'ambito)
+# più i valori del contesto elencati in context_args, e restituisce lo stesso tipo di dato.
+ConversionRule = namedtuple("ConversionRule", "name scope phase func context_args")
+
+# Ambiti delle regole. Regole consecutive con ambiti compatibili vengono eseguite in
+# un'unica passata: una sola segmentazione per prosa e codice, un solo split per le righe.
+SCOPE_DOCUMENT = "document"         # Testo completo della sezione
+SCOPE_PROSE = SEG_PROSE             # Solo testo normale (vista con SEGMENT_MARKER al posto del codice)
+SCOPE_CODE_BLOCK = SEG_CODE_BLOCK   # Solo i blocchi ```...``` (lista dei segmenti)
+SCOPE_INLINE_CODE = SEG_INLINE_CODE # Solo il codice inline `...` (lista dei segmenti)
+SCOPE_LINE = "line"                 # Lista delle righe del testo
+SCOPE_FOOTNOTES = "footnotes"       # Indice delle note (FootnoteIndex): la regola restituisce le modifiche da applicare
+SEGMENT_SCOPES = (SCOPE_PROSE, SCOPE_CODE_BLOCK, SCOPE_INLINE_CODE)
+
+def conversion_rule(func, scope: str, phase: str = None, context_args: tuple = (), name: str = None) -> ConversionRule:
+    return ConversionRule(name or func.__name__, scope, phase, func, tuple(context_args))
+
+def _run_rule(rule: ConversionRule, value, context: dict):
+    """Esegue una regola (misurata da --profile) passando i valori di contesto richiesti."""
+    args = [context[arg] for arg in rule.context_args]
+    return run_stage(rule.name, rule.func, value, *args)
+
+def apply_segment_rules(text: str, rules, context: dict = None) -> str:
+    """
+    Tokenizza il testo una sola volta ed esegue in sequenza le regole con ambito prosa
+    sulla vista del testo normale (i segmenti di codice compaiono come un singolo
+    SEGMENT_MARKER, così le virgolette possono ancora racchiudere del codice inline)
+    e quelle con ambito codice sulla lista dei segmenti del loro tipo.
+    Tutti i segmenti vengono reinseriti alla fine con un'unica join. I caratteri dei marcatori
+    già presenti nel testo vengono sostituiti prima e ripristinati alla fine.
+    """
+    escaped = RESERVED_CHARACTERS_PATTERN.search(text) is not None
+    if escaped:
+        text = text.translate(_MARKER_ESCAPES)
+    segments = run_stage("tokenize_markdown_segments", tokenize_markdown_segments, text)
+    protected = [segment_text for kind, segment_text in segments if kind != SEG_PROSE]
+    protected_kinds = [kind for kind, _ in segments if kind != SEG_PROSE]
+    view = "".join(segment_text if kind == SEG_PROSE else SEGMENT_MARKER for kind, segment_text in segments)
+
+    for rule in rules:
+        if rule.scope == SCOPE_PROSE:
+            view = _run_rule(rule, view, context)
+            continue
+        positions = [n for n, kind in enumerate(protected_kinds) if kind == rule.scope]
+        if not positions:
+            continue
+        converted = _run_rule(rule, [protected[n] for n in positions], context)
+        for n, segment_text in zip(positions, converted):
+            protected[n] = segment_text
+
+    text = _restore_markers(view, SEGMENT_MARKER, protected)
+    return unescape_marker_characters(text) if escaped else text
+
+def apply_prose_stages(text: str, stages) -> str:
+    """Esegue le funzioni di `stages` sul solo testo normale, con una sola segmentazione."""
+    return apply_segment_rules(text, [conversion_rule(stage, SCOPE_PROSE) for stage in stages])
+
+def apply_footnote_rules(text: str, rules, context: dict = None) -> str:
+    """
+    Indicizza le note del testo una sola volta, raccoglie le modifiche di tutte le regole
+    e le applica con un'unica passata (splice_text).
+    """
+    index = run_stage("footnote_index", footnote_index, text)
+    edits = []
+    for rule in rules:
+        edits.extend(_run_rule(rule, index, context or {}))
+    return splice_text(text, edits)
+
+def apply_line_rules(text: str, rules, context: dict = None) -> str:
+    """Divide il testo in righe una sola volta, esegue le regole in sequenza e riunisce le righe."""
+    lines = text.splitlines()
+    for rule in rules:
+        lines = _run_rule(rule, lines, context)
+    return "\n".join(lines)
+
+# --- Conversioni del testo normale (lavorano sulla vista prodotta da apply_prose_stages) ---
+
+DOUBLE_QUOTES_ITALICS_PATTERN = re.compile(r'"([^"]*)"')
+SINGLE_QUOTES_ITALICS_PATTERN = re.compile(r"(?:''|'')(.*?)(?:''|'')")
+ELLIPSIS_DOTS_PATTERN = re.compile(r'\.{3,}')
+POWER_PATTERN = re.compile(r'\b(\d+)\^(\d+)\b')
+
+def custom_italics_in_prose(prose: str) -> str:
+    """Converte "testo" e ''testo'' in \\textit{testo}."""
+    # Prima gestisce le virgolette doppie diritte
+    prose, n_quotes = DOUBLE_QUOTES_ITALICS_PATTERN.subn(r"\\textit{\1}", prose)
+
+    # Poi gestisce le virgolette singole doppie (dritte e curve)
+    prose, n_single_quotes = SINGLE_QUOTES_ITALICS_PATTERN.subn(r"\\textit{\1}", prose)
+    count_matches(n_quotes + n_single_quotes)
+
+    logging.info("    - Convertito corsivo da virgolette (blocchi di codice protetti)")
+    return prose
+
+def tilde_in_prose(prose: str) -> str:
+    """Converte ~ in \\textasciitilde{}."""
+    if profiling_enabled():
+        count_matches(prose.count('~'))
+    prose = prose.replace('~', '\\textasciitilde{}')
+    logging.info("    - Convertite tilde (~) in \\textasciitilde{}")
+    return prose
+
+def percent_signs_in_prose(prose: str) -> str:
+    """Converte % in \\%."""
+    if profiling_enabled():
+        count_matches(prose.count('%'))
+    prose = prose.replace('%', '\\%')
+    logging.info("    - Escapati simboli % in \\%")
+    return prose
+
+def ellipsis_in_prose(prose: str) -> str:
+    """Converte ... e … in \\ldots, lasciando intatti i comandi LaTeX già formattati."""
+    def convert(unprotected):
+        # Gestisce sia ... (tre o più punti) che … (carattere Unicode ellipsis)
+        unprotected, n_dots = ELLIPSIS_DOTS_PATTERN.subn(r'\\ldots', unprotected)
+        count_matches(n_dots)
+        if profiling_enabled():
+            count_matches(unprotected.count('…'))
+        return unprotected.replace('…', '\\ldots')
+
+    prose = _apply_outside(prose, LATEX_COMMAND_PATTERN, LATEX_CMD_MARKER, convert, LATEX_COMMAND_CLOSER)
     logging.info("    - Convertiti puntini di sospensione in \\ldots")
-    return text
+    return prose
+
+def math_characters_in_prose(prose: str) -> str:
+    """Gestisce i caratteri matematici, proteggendo la matematica e i comandi LaTeX esistenti."""
+    def convert(unprotected):
+        # 2^20 -> $2^{20}$
+        unprotected, n_powers = POWER_PATTERN.subn(r'$\1^{\2}$', unprotected)
+        # Simboli matematici, frecce e alterazioni musicali: una sola passata (tabelle di latex_symbols)
+        unprotected, n_symbols = replace_prose_symbols(unprotected)
+        count_matches(n_powers + n_symbols)
+        return unprotected
+
+    def outside_math(unprotected):
+        return _apply_outside(unprotected, LATEX_COMMAND_PATTERN, LATEX_CMD_MARKER, convert, LATEX_COMMAND_CLOSER)
+
+    prose = _apply_outside(prose, INLINE_MATH_PATTERN, MATH_MARKER, outside_math)
+    logging.info("    - Gestiti caratteri matematici nel testo normale")
+    return prose
+
+def escape_ellipsis(text: str) -> str:
+    """Converte ... in \\ldots nel testo normale, ma protegge i blocchi di codice."""
+    return apply_prose_stages(text, (ellipsis_in_prose,))
 
 def escape_math_characters_in_text(text: str) -> str:
     """Gestisce caratteri matematici nel testo normale, proteggendo i blocchi di codice."""
-    code_blocks = []
-    inline_code_blocks = []
-    math_blocks = []
-    
-    def save_code_block(match):
-        code_blocks.append(match.group(0))
-        return f"__CODE_BLOCK_{len(code_blocks)-1}__"
-    
-    def save_inline_code(match):
-        inline_code_blocks.append(match.group(0))
-        return f"__INLINE_CODE_{len(inline_code_blocks)-1}__"
-    
-    def save_math_block(match):
-        math_blocks.append(match.group(0))
-        return f"__MATH_BLOCK_{len(math_blocks)-1}__"
-    
-    # Proteggi blocchi esistenti
-    text = re.sub(r"```.*?```", save_code_block, text, flags=re.DOTALL)
-    text = re.sub(r"(?<!_)`([^`\n]+?)`(?!_)", save_inline_code, text)
-    text = re.sub(r"\$.*?\$", save_math_block, text)  # Proteggi matematica esistente
-    text = re.sub(r'\\[a-zA-Z]+\{[^}]*\}', save_math_block, text)  # Proteggi comandi LaTeX
-    
-    # Converti espressioni matematiche comuni nel testo
-    # 2^20 -> $2^{20}$
-    text = re.sub(r'\b(\d+)\^(\d+)\b', r'$\1^{\2}$', text)
-    
-    # Gestisci altri caratteri matematici
-    text = text.replace('≈', r'$\approx$')
-    text = text.replace('π', r'$\pi$')
-    text = text.replace('×', r'$\times$')
-    text = text.replace('÷', r'$\div$')
-    
-    # Ripristina blocchi protetti
-    for i, math_block in enumerate(math_blocks):
-        text = text.replace(f"__MATH_BLOCK_{i}__", math_block)
-    for i, code_block in enumerate(code_blocks):
-        text = text.replace(f"__CODE_BLOCK_{i}__", code_block)
-    for i, inline_code in enumerate(inline_code_blocks):
-        text = text.replace(f"__INLINE_CODE_{i}__", inline_code)
-    
-    logging.info("    - Gestiti caratteri matematici nel testo normale")
-    return text
+    return apply_prose_stages(text, (math_characters_in_prose,))
 
 def convert_custom_italics(text: str) -> str:
-    """Converte ''testo'', ''testo'' e "testo" in corsivo LaTeX \textit{...}, 
+    """Converte ''testo'' e "testo" in corsivo LaTeX \\textit{...},
     ma protegge i blocchi di codice da modifiche."""
-    
-    # Step 1: Proteggi i blocchi di codice con placeholder
-    code_blocks = []
-    inline_code_blocks = []
-    
-    # Salva e sostituisci blocchi di codice multilinea ```
-    def save_code_block(match):
-        code_blocks.append(match.group(0))
-        return f"__CODE_BLOCK_{len(code_blocks)-1}__"
-    
-    # Salva e sostituisci codice inline `
-    def save_inline_code(match):
-        inline_code_blocks.append(match.group(0))
-        return f"__INLINE_CODE_{len(inline_code_blocks)-1}__"
-    
-    # Proteggi blocchi di codice multilinea
-    text = re.sub(r"```.*?```", save_code_block, text, flags=re.DOTALL)
-    
-    # Proteggi codice inline (evita di matchare dentro i placeholder già creati)
-    text = re.sub(r"(?<!_)`([^`\n]+?)`(?!_)", save_inline_code, text)
-    
-    # Step 2: Converti le virgolette nel testo rimanente
-    # Prima gestisce le virgolette doppie diritte
-    text = re.sub(r'"([^"]*)"', r"\\textit{\1}", text)
-    
-    # Poi gestisce le virgolette singole doppie (dritte e curve)
-    pattern = re.compile(r"(?:''|'')(.*?)(?:''|'')")
-    text = pattern.sub(r"\\textit{\1}", text)
-    
-    # Step 3: Ripristina i blocchi di codice
-    # Ripristina blocchi di codice multilinea
-    for i, code_block in enumerate(code_blocks):
-        text = text.replace(f"__CODE_BLOCK_{i}__", code_block)
-    
-    # Ripristina codice inline
-    for i, inline_code in enumerate(inline_code_blocks):
-        text = text.replace(f"__INLINE_CODE_{i}__", inline_code)
-    
-    logging.info("    - Convertito corsivo da virgolette (blocchi di codice protetti)")
-    return text
+    return apply_prose_stages(text, (custom_italics_in_prose,))
 
 def escape_percent_signs(text: str) -> str:
     """Converte % in \\% LaTeX, ma protegge i blocchi di codice."""
-    code_blocks = []
-    inline_code_blocks = []
-    
-    def save_code_block(match):
-        code_blocks.append(match.group(0))
-        return f"__CODE_BLOCK_{len(code_blocks)-1}__"
-    
-    def save_inline_code(match):
-        inline_code_blocks.append(match.group(0))
-        return f"__INLINE_CODE_{len(inline_code_blocks)-1}__"
-    
-    # Proteggi blocchi di codice
-    text = re.sub(r"```.*?```", save_code_block, text, flags=re.DOTALL)
-    text = re.sub(r"(?<!_)`([^`\n]+?)`(?!_)", save_inline_code, text)
-    
-    # Converti % solo nel testo normale
-    text = text.replace('%', '\\%')
-    
-    # Ripristina blocchi di codice
-    for i, code_block in enumerate(code_blocks):
-        text = text.replace(f"__CODE_BLOCK_{i}__", code_block)
-    for i, inline_code in enumerate(inline_code_blocks):
-        text = text.replace(f"__INLINE_CODE_{i}__", inline_code)
-    
-    logging.info("    - Escapati simboli % in \\%")
-    return text
+    return apply_prose_stages(text, (percent_signs_in_prose,))
 
 def convert_tilde(text: str) -> str:
-    """Converte ~ in \textasciitilde{} LaTeX."""
-    # Proteggi i blocchi di codice come in convert_custom_italics
-    code_blocks = []
-    inline_code_blocks = []
-    
-    def save_code_block(match):
-        code_blocks.append(match.group(0))
-        return f"__CODE_BLOCK_{len(code_blocks)-1}__"
-    
-    def save_inline_code(match):
-        inline_code_blocks.append(match.group(0))
-        return f"__INLINE_CODE_{len(inline_code_blocks)-1}__"
-    
-    # Proteggi blocchi di codice
-    text = re.sub(r"```.*?```", save_code_block, text, flags=re.DOTALL)
-    text = re.sub(r"(?<!_)`([^`\n]+?)`(?!_)", save_inline_code, text)
-    
-    # Converti tilde solo nel testo normale
-    text = text.replace('~', '\\textasciitilde{}')
-    
-    # Ripristina blocchi di codice
-    for i, code_block in enumerate(code_blocks):
-        text = text.replace(f"__CODE_BLOCK_{i}__", code_block)
-    for i, inline_code in enumerate(inline_code_blocks):
-        text = text.replace(f"__INLINE_CODE_{i}__", inline_code)
-    
-    logging.info("    - Convertite tilde (~) in \\textasciitilde{}")
-    return text
+    """Converte ~ in \\textasciitilde{} LaTeX, ma protegge i blocchi di codice."""
+    return apply_prose_stages(text, (tilde_in_prose,))
 
 def convert_bold_text(text: str) -> str:
     """Converte **testo** in \textbf{testo} e gestisce underscore."""
@@ -891,116 +1944,1257 @@ def convert_bold_text(text: str) -> str:
         return f"\\textbf{{{bold_text}}}"
     
     # Converti **testo** in grassetto
-    text = re.sub(r'\*\*(.*?)\*\*', replacer_logic, text)
+    text, n_bold = BOLD_PATTERN.subn(replacer_logic, text)
+    count_matches(n_bold)
     
     logging.info("    - Convertito testo grassetto") # Aggiorna il messaggio di log
     return text
 
-def process_markdown_content(md_content: str, md_filename_for_this_content: str, section_index: int, is_first_section: bool) -> str:
-    logging.info(f"Processando contenuto per la sezione {section_index} ({md_filename_for_this_content})...")
-    
-    latex_content = md_content
-    
-    # Fase 1: Rimozione citazioni trascrizione (prima di tutto)
-    latex_content = remove_transcription_citations(latex_content)
+def footnote_definition_edits(index: FootnoteIndex) -> list:
+    """Rimozione delle definizioni di nota [^key]: ... rimaste dopo le sostituzioni bibliografiche."""
+    edits = [(definition.start, definition.end, "") for definition in index.definitions]
+    count_matches(len(edits))
+    return edits
 
-    latex_content = convert_bold_text(latex_content)          # **testo** → \textbf{testo} (con _ escaped)
-    
-    # Fase 2: Conversioni di caratteri speciali nel testo normale
-    latex_content = convert_custom_italics(latex_content)     # Virgolette → corsivo
-    latex_content = convert_tilde(latex_content)              # ~ → \textasciitilde{}
-    latex_content = escape_percent_signs(latex_content)       # % → \% (nel testo normale)
-    latex_content = escape_ellipsis(latex_content)                 # ... → \ldots
-    latex_content = escape_math_characters_in_text(latex_content)  # 2^20 → $2^{20}$, π → $\pi$
+def remove_footnote_definitions(text: str) -> str:
+    """Rimuove le definizioni di nota [^key]: ... rimaste dopo le sostituzioni bibliografiche."""
+    return apply_footnote_rules(text, (conversion_rule(footnote_definition_edits, SCOPE_FOOTNOTES),))
 
-    # Fase 3: Conversione blocchi di codice
-    latex_content = convert_code_blocks(latex_content)
-    latex_content = convert_inline_code(latex_content)        # Con escape migliorato
+# --- Tabella delle regole di conversione ---
 
-    # Fase 4: Conversioni strutturali
-    latex_content = convert_headings(latex_content)
-    latex_content = convert_numbered_lists(latex_content)
-    latex_content = convert_bulleted_lists(latex_content)
+PHASE_BODY = "body"    # Prima parte: dipende solo dal Markdown del file (parallelizzabile)
+PHASE_FINAL = "final"  # Seconda parte: \persona e citazioni, che dipendono dalle altre sezioni
 
+# Ordine predefinito della pipeline. Le regole si possono disattivare (--disable-stage)
+# o riordinare (--stage-order) senza toccare il codice; l'ordine vale all'interno di ogni fase.
+CONVERSION_RULES = (
+    # Fase 1: Rimozione citazioni trascrizione (prima di tutto)
+    conversion_rule(transcription_footnote_edits, SCOPE_FOOTNOTES, PHASE_BODY, context_args=("transcription_keys",), name="transcriptions"),
+    conversion_rule(convert_bold_text, SCOPE_DOCUMENT, PHASE_BODY, name="bold"),              # **testo** → \textbf{testo}
+    # Fase 2: Conversioni di caratteri speciali nel testo normale
+    conversion_rule(custom_italics_in_prose, SCOPE_PROSE, PHASE_BODY, name="italics"),        # Virgolette → corsivo
+    conversion_rule(tilde_in_prose, SCOPE_PROSE, PHASE_BODY, name="tilde"),                   # ~ → \textasciitilde{}
+    conversion_rule(percent_signs_in_prose, SCOPE_PROSE, PHASE_BODY, name="percent"),         # % → \%
+    conversion_rule(ellipsis_in_prose, SCOPE_PROSE, PHASE_BODY, name="ellipsis"),             # ... → \ldots
+    conversion_rule(math_characters_in_prose, SCOPE_PROSE, PHASE_BODY, name="math"),          # 2^20 → $2^{20}$, π → $\pi$
+    # Fase 3: Conversione blocchi di codice
+    conversion_rule(code_blocks_in_segments, SCOPE_CODE_BLOCK, PHASE_BODY, name="code_blocks"),
+    conversion_rule(inline_code_in_segments, SCOPE_INLINE_CODE, PHASE_BODY, name="inline_code"),
+    # Fase 4: Conversioni strutturali
+    conversion_rule(headings_in_lines, SCOPE_LINE, PHASE_BODY, name="headings"),
+    conversion_rule(lists_in_lines, SCOPE_LINE, PHASE_BODY, name="lists"),
     # Fase 5: Altri comandi
-    latex_content = apply_persona_command(latex_content)
-    
+    conversion_rule(apply_persona_command, SCOPE_DOCUMENT, PHASE_FINAL, ("persona_applied_set",), name="persona"),
     # Fase 6: Sostituzioni bibliografiche
-    latex_content = replace_markdown_citations_in_text(latex_content, md_filename_for_this_content)
-
+    # (citazioni e pulizia delle definizioni condividono l'indice delle note e un'unica passata)
+    conversion_rule(citation_footnote_edits, SCOPE_FOOTNOTES, PHASE_FINAL, ("filename",), name="citations"),
     # Pulizia finale
-    latex_content = re.sub(r"\[\^(\w+)\]:\s*.+\n?", "", latex_content)
-    latex_content = manage_paragraphs(latex_content)
-    
-    latex_content = f"% --- Contenuto LaTeX autogenerato da {md_filename_for_this_content} (sezione {section_index}) ---\n\n" + latex_content
+    conversion_rule(footnote_definition_edits, SCOPE_FOOTNOTES, PHASE_FINAL, name="footnote_definitions"),
+    conversion_rule(manage_paragraphs, SCOPE_DOCUMENT, PHASE_FINAL, name="paragraphs"),
+)
+RULE_NAMES = tuple(rule.name for rule in CONVERSION_RULES)
+
+# Regole attive nell'ordine di esecuzione e, per fase, il piano delle passate fuse
+_ACTIVE_RULE_NAMES = RULE_NAMES
+_RULE_PLAN_CACHE = {}
+
+def configure_rules(disabled=(), order=()) -> tuple:
+    """
+    Imposta le regole attive: prima quelle elencate in `order`, poi le altre nell'ordine
+    predefinito, escluse quelle in `disabled`. Solleva ValueError per nomi sconosciuti.
+    """
+    global _ACTIVE_RULE_NAMES
+    unknown = [name for name in (*disabled, *order) if name not in RULE_NAMES]
+    if unknown:
+        raise ValueError(f"Regole sconosciute: {', '.join(unknown)} (disponibili: {', '.join(RULE_NAMES)})")
+    ordered = list(dict.fromkeys(order)) + [name for name in RULE_NAMES if name not in order]
+    _ACTIVE_RULE_NAMES = tuple(name for name in ordered if name not in disabled)
+    _RULE_PLAN_CACHE.clear()
+    return _ACTIVE_RULE_NAMES
+
+def active_rule_names() -> tuple:
+    return _ACTIVE_RULE_NAMES
+
+def rule_plan(phase: str) -> list:
+    """
+    Regole attive della fase raggruppate in passate [(tipo di passata, [regole])]:
+    regole consecutive sui segmenti (prosa e codice) o sulle righe finiscono nella stessa passata.
+    Il piano è calcolato una volta per processo (e ricalcolato solo se cambia la configurazione).
+    """
+    plan = _RULE_PLAN_CACHE.get(phase)
+    if plan is None:
+        rules_by_name = {rule.name: rule for rule in CONVERSION_RULES}
+        plan = []
+        for name in _ACTIVE_RULE_NAMES:
+            rule = rules_by_name[name]
+            if rule.phase != phase:
+                continue
+            pass_kind = "segments" if rule.scope in SEGMENT_SCOPES else rule.scope
+            if plan and plan[-1][0] == pass_kind and pass_kind != SCOPE_DOCUMENT:
+                plan[-1][1].append(rule)
+            else:
+                plan.append((pass_kind, [rule]))
+        _RULE_PLAN_CACHE[phase] = plan
+    return plan
+
+def run_rules(text: str, phase: str, context: dict) -> str:
+    """Esegue le passate della fase sul testo della sezione."""
+    for pass_kind, rules in rule_plan(phase):
+        if pass_kind == "segments":
+            text = apply_segment_rules(text, rules, context)
+        elif pass_kind == SCOPE_LINE:
+            text = apply_line_rules(text, rules, context)
+        elif pass_kind == SCOPE_FOOTNOTES:
+            text = apply_footnote_rules(text, rules, context)
+        else:
+            text = _run_rule(rules[0], text, context)
+    return text
+
+def convert_section_body(md_content: str, md_filename_for_this_content: str, section_index: int, transcription_keys=None) -> str:
+    """
+    Prima parte della conversione di una sezione (regole di PHASE_BODY): dipende solo
+    dal Markdown del file e può quindi essere eseguita in parallelo sulle diverse sezioni
+    (e sulle parti di un file lungo, vedi split_markdown_chunks).
+    """
+    logging.info(f"Processando contenuto per la sezione {section_index} ({md_filename_for_this_content})...")
+    set_profile_file(md_filename_for_this_content)
+    context = {"filename": md_filename_for_this_content, "section_index": section_index,
+               "transcription_keys": transcription_keys}
+    return run_rules(md_content, PHASE_BODY, context)
+
+def finalize_section_content(latex_content: str, md_filename_for_this_content: str, section_index: int, persona_applied_set: set = None) -> str:
+    """
+    Seconda parte della conversione (regole di PHASE_FINAL): \\persona (che dipende dalle
+    sezioni precedenti, vedi persona_applied_set) e sostituzioni bibliografiche (che usano le mappe globali).
+    """
+    set_profile_file(md_filename_for_this_content)
+    context = {
+        "filename": md_filename_for_this_content,
+        "section_index": section_index,
+        "persona_applied_set": persona_applied_set,
+    }
+    latex_content = run_rules(latex_content, PHASE_FINAL, context)
+    
+    latex_content = section_header(md_filename_for_this_content, section_index) + latex_content
     return latex_content
-# --- Script Principale (logica di naming e generazione all.tex aggiornata) ---
-def main():
-    logging.info("Avvio conversione Markdown -> LaTeX...")
-    ensure_dir_exists(OUTPUT_DIR_TEX)
-    global PERSONA_APPLIED_SET
-    PERSONA_APPLIED_SET.clear() # Resetta lo stato all'inizio di ogni esecuzione completa
 
-    # Carica tutti i contenuti Markdown in un dizionario per la raccolta bibliografica
+def section_header(md_filename: str, section_index: int) -> str:
+    return f"% --- Contenuto LaTeX autogenerato da {md_filename} (sezione {section_index}) ---\n\n"
+
+def process_markdown_content(md_content: str, md_filename_for_this_content: str, section_index: int, is_first_section: bool) -> str:
+    latex_content = convert_section_body(md_content, md_filename_for_this_content, section_index)
+    return finalize_section_content(latex_content, md_filename_for_this_content, section_index)
+
+# --- Suddivisione dei file lunghi (prima parte della conversione in parallelo su un solo file) ---
+# Con --jobs > 1 un file di almeno 2 * CHUNK_MIN_CHARS caratteri viene diviso in parti convertite
+# come sezioni separate e poi riunite: il risultato è identico a quello della conversione in serie.
+CHUNK_MIN_CHARS = 100_000
+# Riga vuota seguita da un titolo # o ##: la parte successiva inizia alla fine del match
+CHUNK_HEADING_PATTERN = re.compile(r"\n\n(?=##?[ \t])")
+LATEX_COMMAND_OPENER_PATTERN = re.compile(r"\\[a-zA-Z]+\{")
+# Caratteri che, in una nota di trascrizione (tolta dal testo prima di tutto il resto),
+# possono cambiare l'abbinamento di virgolette, graffe o recinti ``` del testo che segue
+TRANSCRIPTION_PAIRING_CHARS = frozenset('"{}\\`')
+
+def markdown_chunk_boundaries(text: str, candidate_pattern=CHUNK_HEADING_PATTERN) -> list:
+    """
+    Posizioni in cui il testo può essere diviso senza cambiare il risultato delle regole di PHASE_BODY:
+    inizi di titoli # o ## preceduti da una riga vuota (lì gli elenchi aperti si chiudono comunque
+    e le note, che occupano una riga, sono già finite), esclusi quelli che cadono dentro un
+    blocco di codice, tra due virgolette abbinate dal corsivo o tra un comando \\cmd{ e la sua }.
+    candidate_pattern sceglie altri inizi di riga dopo una riga vuota (vedi BLOCK_START_PATTERN).
+    """
+    candidates = [match.end() for match in candidate_pattern.finditer(text)]
+    if not candidates:
+        return []
+
+    # Intervalli (inizio, fine) che non possono essere spezzati, sulla stessa vista delle regole
+    # sulla prosa: stessa lunghezza del testo, con i segmenti di codice coperti dal marcatore
+    blocked = []
+    view = []
+    position = 0
+    for kind, segment_text in tokenize_markdown_segments(text):
+        if kind == SEG_PROSE:
+            view.append(segment_text)
+        else:
+            view.append(SEGMENT_MARKER * len(segment_text))
+            blocked.append((position, position + len(segment_text)))
+        position += len(segment_text)
+    view = "".join(view)
+    blocked.extend(match.span() for match in DOUBLE_QUOTES_ITALICS_PATTERN.finditer(view))
+    # Un comando LaTeX è protetto fino alla prima } fuori da una formula $...$
+    math_spans = [match.span() for match in INLINE_MATH_PATTERN.finditer(view)]
+    closers = []
+    math_iter = iter(math_spans)
+    math_span = next(math_iter, None)
+    for match in re.finditer(r"\}", view):
+        while math_span and math_span[1] <= match.start():
+            math_span = next(math_iter, None)
+        if not (math_span and math_span[0] <= match.start()):
+            closers.append(match.start())
+    for match in LATEX_COMMAND_OPENER_PATTERN.finditer(view):
+        n = bisect.bisect_left(closers, match.end())
+        blocked.append((match.start(), closers[n] + 1 if n < len(closers) else len(text)))
+    # Dopo una trascrizione con virgolette, graffe o ``` l'abbinamento non è più prevedibile dal testo originale
+    for definition in footnote_index(text).definitions:
+        if definition.kind == FOOTNOTE_TRANSCRIPTION and not TRANSCRIPTION_PAIRING_CHARS.isdisjoint(definition.text):
+            blocked.append((definition.start, len(text)))
+            break
+
+    # Un candidato è sicuro se nessun intervallo iniziato prima di lui finisce dopo di lui
+    boundaries = []
+    blocked.sort()
+    n = 0
+    blocked_until = 0
+    for candidate in candidates:
+        while n < len(blocked) and blocked[n][0] < candidate:
+            blocked_until = max(blocked_until, blocked[n][1])
+            n += 1
+        if blocked_until <= candidate:
+            boundaries.append(candidate)
+    return boundaries
+
+def split_markdown_chunks(text: str, chunk_chars: int = CHUNK_MIN_CHARS) -> list:
+    """
+    Divide il testo in len(text) // chunk_chars parti di lunghezza simile, al primo confine di
+    markdown_chunk_boundaries dopo ogni punto ideale di taglio. Concatenando le parti si riottiene
+    il testo; un testo più corto di 2 * chunk_chars resta una parte sola.
+    """
+    n_chunks = len(text) // max(1, chunk_chars)
+    if n_chunks < 2:
+        return [text]
+    boundaries = markdown_chunk_boundaries(text)
+    cuts = []
+    for k in range(1, n_chunks):
+        n = bisect.bisect_left(boundaries, k * len(text) // n_chunks)
+        if n < len(boundaries) and (not cuts or boundaries[n] > cuts[-1]):
+            cuts.append(boundaries[n])
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def transcription_keys_in(text: str) -> list:
+    """Chiavi delle note di trascrizione del testo, da passare a ogni parte (i richiami possono stare in un'altra parte)."""
+    return sorted({definition.key for definition in footnote_index(text).definitions
+                   if definition.kind == FOOTNOTE_TRANSCRIPTION})
+
+def chunk_separator() -> str:
+    """
+    Separatore delle parti convertite da convert_section_body. Ogni parte termina con una riga vuota
+    e la passata sulle righe ne toglie il newline finale, che va rimesso tra una parte e l'altra.
+    """
+    return "\n" if any(pass_kind == SCOPE_LINE for pass_kind, _ in rule_plan(PHASE_BODY)) else ""
+
+def join_converted_chunks(chunks: list) -> str:
+    """Riunisce le parti convertite da convert_section_body."""
+    return chunk_separator().join(chunks)
+
+# --- Blocchi di un file (riconversione incrementale all'interno di un file modificato) ---
+# Un file modificato viene diviso in blocchi stabili ai confini sicuri di markdown_chunk_boundaries
+# e il LaTeX di ogni blocco è conservato in BLOCK_CACHE_FILE: solo i blocchi cambiati ripassano
+# per le regole. Gli inizi di riga dopo una riga vuota che chiudono gli elenchi: un titolo o una lettera.
+BLOCK_START_PATTERN = re.compile(r"\n\n(?=#|[^\W\d_])")
+# Un blocco finisce sempre a un titolo e in media ogni BLOCK_PARAGRAPHS paragrafi: il taglio dipende
+# solo dalla prima riga del paragrafo, quindi una modifica sposta al più i confini dei blocchi vicini
+BLOCK_PARAGRAPHS = 8
+
+def markdown_blocks(text: str) -> list:
+    """Blocchi del testo (concatenandoli si riottiene il testo), convertibili uno per uno con convert_markdown_blocks."""
+    cuts = []
+    for boundary in markdown_chunk_boundaries(text, BLOCK_START_PATTERN):
+        line_end = text.find("\n", boundary)
+        first_line = text[boundary:line_end if line_end >= 0 else len(text)]
+        if first_line[0] == "#" or zlib.crc32(first_line.encode('utf-8')) % BLOCK_PARAGRAPHS == 0:
+            cuts.append(boundary)
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def block_body_keys(text: str, blocks: list) -> list:
+    """
+    Chiavi della prima parte della conversione dei blocchi del testo: il Markdown del blocco
+    e le note di trascrizione dell'intero file che richiama (i richiami vengono tolti).
+    """
+    index = footnote_index(text)
+    transcription_keys = {definition.key for definition in index.definitions if definition.kind == FOOTNOTE_TRANSCRIPTION}
+    referenced = [set() for _ in blocks]
+    if transcription_keys:
+        starts = []
+        position = 0
+        for block in blocks:
+            starts.append(position)
+            position += len(block)
+        for reference in index.references:
+            if reference.key in transcription_keys:
+                referenced[bisect.bisect_right(starts, reference.start) - 1].add(reference.key)
+    return [sha256_text(block + "\0" + " ".join(sorted(keys))) for block, keys in zip(blocks, referenced)]
+
+def block_final_key(body_key: str, md_filename: str, already_applied: list, references: list) -> str:
+    """
+    Chiave della seconda parte della conversione di un blocco: il blocco, le persone del blocco
+    già marcate con \\persona prima di lui e la bibliografia delle note che richiama (per le
+    note "Ibid." e "cit." la chiave della nota a cui rimandano, che dipende da quelle precedenti).
+    """
+    bib_slice = [(md_key, markdown_key_to_bibtex_key_map.get((md_filename, md_key)),
+                  raw_bibliography_notes.get((md_filename, md_key), "")) for md_key in references]
+    return sha256_text("\0".join([body_key, " ".join(already_applied), repr(bib_slice)]))
+
+def cached_block_body(block_cache: dict, body_key: str):
+    """[LaTeX, persone citate, note richiamate] del blocco se in cache e se i suoi listati esterni esistono ancora, altrimenti None."""
+    entry = block_cache["bodies"].get(body_key)
+    if entry is None or any(not path.is_file() for path in listing_files_in(entry[0])):
+        return None
+    return entry
+
+def convert_markdown_blocks(blocks: list, md_filename: str, section_index: int, transcription_keys=None) -> list:
+    """Prima parte della conversione (PHASE_BODY) di ogni blocco di una sezione."""
+    logging.info(f"Processando {len(blocks)} blocchi della sezione {section_index} ({md_filename})...")
+    set_profile_file(md_filename)
+    context = {"filename": md_filename, "section_index": section_index, "transcription_keys": transcription_keys}
+    return [run_rules(block, PHASE_BODY, context) for block in blocks]
+
+def finalize_markdown_blocks(bodies: list, md_filename: str, section_index: int) -> list:
+    """Seconda parte della conversione (PHASE_FINAL) di ogni blocco [(LaTeX, persone già marcate)] di una sezione."""
+    set_profile_file(md_filename)
+    finalized = []
+    for body, already_applied in bodies:
+        context = {"filename": md_filename, "section_index": section_index, "persona_applied_set": set(already_applied)}
+        finalized.append(run_rules(body, PHASE_FINAL, context))
+    return finalized
+
+def block_finalization_supported() -> bool:
+    """
+    PHASE_FINAL si può eseguire blocco per blocco se la gestione dei paragrafi, l'unica regola
+    che guarda oltre il blocco, è disattivata o è l'ultima (join_finalized_blocks la completa ai confini).
+    """
+    names = [rule.name for _, rules in rule_plan(PHASE_FINAL) for rule in rules]
+    return "paragraphs" not in names or names[-1] == "paragraphs"
+
+def join_finalized_blocks(parts: list) -> str:
+    """
+    Riunisce i blocchi usciti da PHASE_FINAL come join_converted_chunks. Se è attiva la gestione dei
+    paragrafi, le righe vuote a cavallo di due blocchi vengono collassate come nel testo intero.
+    """
+    separator = chunk_separator()
+    if "paragraphs" not in {rule.name for _, rules in rule_plan(PHASE_FINAL) for rule in rules}:
+        return separator.join(parts)
+    output = []
+    trailing = ""  # Spazi in fondo al testo già riunito, che possono continuare nel blocco successivo
+    for n, part in enumerate(parts):
+        if n:
+            trailing += separator
+        content = part.lstrip()
+        if not content:
+            trailing += part
+            continue
+        output.append(BLANK_LINES_PATTERN.sub("\n\n", trailing + part[:len(part) - len(content)]))
+        stripped = content.rstrip()
+        output.append(stripped)
+        trailing = content[len(stripped):]
+    output.append(BLANK_LINES_PATTERN.sub("\n\n", trailing))
+    return "".join(output)
+
+# --- Conversione parallela delle sezioni ---
+
+def _init_section_worker(known_people: dict, raw_notes: dict, key_map: dict, profile: bool = False, rule_names: tuple = RULE_NAMES,
+                         external_listings_min_lines=None):
+    """Inizializza un processo del pool con le tabelle globali calcolate dal processo principale."""
+    global raw_bibliography_notes, markdown_key_to_bibtex_key_map
+    KNOWN_PEOPLE.clear()
+    KNOWN_PEOPLE.update(known_people)
+    raw_bibliography_notes = raw_notes
+    markdown_key_to_bibtex_key_map = key_map
+    configure_rules(disabled=[name for name in RULE_NAMES if name not in rule_names], order=rule_names)
+    configure_external_listings(external_listings_min_lines)
+    if profile:
+        enable_profiling()
+
+def _convert_section_task(task):
+    """
+    Task del pool: prima parte della conversione, persone citate nella sezione e misure di --profile.
+    Il task di una parte di un file lungo porta anche le chiavi delle trascrizioni dell'intero file.
+    """
+    section_index, md_filename, md_content, *transcription_keys = task
+    latex_content = convert_section_body(md_content, md_filename, section_index, *transcription_keys)
+    mentioned = sorted(run_stage("find_persona_mentions", find_persona_mentions, latex_content))
+    return latex_content, mentioned, take_profile_records()
+
+def _convert_blocks_task(task):
+    """
+    Task del pool: prima parte della conversione di alcuni blocchi di una sezione,
+    con le persone citate e le note richiamate in ciascuno.
+    """
+    section_index, md_filename, blocks, transcription_keys = task
+    converted = []
+    for latex_content in convert_markdown_blocks(blocks, md_filename, section_index, transcription_keys):
+        mentioned = sorted(run_stage("find_persona_mentions", find_persona_mentions, latex_content))
+        references = sorted({reference.key for reference in footnote_index(latex_content).references}) if "[^" in latex_content else []
+        converted.append([latex_content, mentioned, references])
+    return converted, take_profile_records()
+
+def _finalize_blocks_task(task):
+    """Task del pool: seconda parte della conversione di alcuni blocchi [(LaTeX, persone già marcate)] di una sezione."""
+    section_index, md_filename, bodies = task
+    return finalize_markdown_blocks(bodies, md_filename, section_index), take_profile_records()
+
+def _finalize_section_task(task):
+    """Task del pool: seconda parte della conversione con le persone già marcate in precedenza (più le misure di --profile)."""
+    section_index, md_filename, latex_content, persona_applied = task
+    latex_content = finalize_section_content(latex_content, md_filename, section_index, set(persona_applied))
+    return latex_content, take_profile_records()
+
+def group_by_size(items: list, sizes: list, max_chars) -> list:
+    """Divide items in gruppi consecutivi, ognuno chiuso appena supera max_chars caratteri (sizes[n] è la dimensione di items[n])."""
+    groups = [[]]
+    group_chars = 0
+    for item, size in zip(items, sizes):
+        if group_chars >= max_chars:
+            groups.append([])
+            group_chars = 0
+        groups[-1].append(item)
+        group_chars += size
+    return groups if groups[0] else []
+
+def run_section_tasks(executor, func, tasks: list) -> list:
+    """Esegue i task nel pool (se presente) o in serie, mantenendo l'ordine dei risultati."""
+    if executor is None:
+        return [func(task) for task in tasks]
+    return list(executor.map(func, tasks))
+
+def tex_filename_for_section(i: int, md_filename_str: str) -> str:
+    """Nome del file .tex generato per l'i-esimo file di MD_FILES_ORDER."""
+    base_name_md = Path(md_filename_str).stem.lower()
+    
+    is_intro = (i == 0 and base_name_md == "introduzione")
+    is_concl = (i == len(MD_FILES_ORDER) - 1 and base_name_md == "conclusione")
+
+    if is_intro:
+        return "introduzione.tex"
+    elif is_concl:
+        return "conclusione.tex"
+    else:
+        section_num_if_intro_exists = i 
+        section_num_if_no_intro = i + 1
+        if MD_FILES_ORDER and Path(MD_FILES_ORDER[0]).stem.lower() == "introduzione":
+            current_section_number_for_file = section_num_if_intro_exists
+        else:
+            current_section_number_for_file = section_num_if_no_intro
+        return f"sezione{current_section_number_for_file}.tex"
+
+# --- Script Principale (logica di naming e generazione all.tex aggiornata) ---
+def parse_arguments(argv=None):
+    """Opzioni da linea di comando del convertitore."""
+    parser = argparse.ArgumentParser(description="Converte i file Markdown della tesina in sezioni LaTeX.")
+    parser.add_argument("--force", action="store_true",
+                        help="ignora la cache di build e riconverte tutte le sezioni")
+    parser.add_argument("--no-block-cache", action="store_true",
+                        help="riconverte per intero i file modificati invece dei soli blocchi cambiati")
+    parser.add_argument("--people", default=PEOPLE_REGISTRY_FILE, metavar="REGISTRO",
+                        help="registro delle persone note (CSV con colonne name,variants,birth,death o database SQLite "
+                             "con una tabella people): si aggiunge a KNOWN_PEOPLE con le sole persone che compaiono nel testo")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="converte le sezioni in parallelo con N processi (default: 1)")
+    parser.add_argument("--watch", action="store_true",
+                        help="resta in ascolto e riconverte le sezioni i cui file Markdown cambiano")
+    parser.add_argument("--watch-interval", type=float, default=0.2, metavar="SECONDI",
+                        help="intervallo di polling di --watch (default: 0.2)")
+    parser.add_argument("--build-command", metavar="CMD",
+                        help="con --watch, comando da eseguire dopo ogni conversione che modifica dei file (es. \"make\")")
+    parser.add_argument("--server", action="store_true",
+                        help="resta attivo e converte i buffer inviati dall'editor: una richiesta JSON per riga "
+                             "su stdin, una risposta JSON per riga su stdout")
+    parser.add_argument("--socket", metavar="PERCORSO",
+                        help="con --server, riceve le richieste su un socket Unix invece che su stdin/stdout")
+    parser.add_argument("--batch", nargs="+", metavar="PROGETTO",
+                        help="converte più progetti (directory con MarkDownSections) in parallelo con --jobs processi "
+                             f"e stampa un riepilogo; ordine dei file e persone da {BATCH_CONFIG_FILE} se presente")
+    parser.add_argument("--batch-report", metavar="REPORT.json",
+                        help="con --batch, salva il riepilogo (tempi, sezioni, errori per progetto) in JSON")
+    parser.add_argument("--bbl", action="store_true",
+                        help="scrive anche il .bbl di main.tex formattando la bibliografia in Python (stili plain, unsrt, "
+                             "abbrv, alpha), così la compilazione non deve eseguire bibtex")
+    parser.add_argument("--include", action="store_true",
+                        help="genera all.tex con \\include invece di \\input, per l'anteprima dei soli capitoli cambiati "
+                             "(python latex_build.py --preview); ogni sezione inizia su una nuova pagina")
+    parser.add_argument("--profile", nargs="?", const=str(PROFILE_REPORT_FILE), metavar="REPORT.json",
+                        help=f"misura tempi, dimensioni e sostituzioni di ogni fase per file e salva il report (default: {PROFILE_REPORT_FILE})")
+    parser.add_argument("--external-listings", nargs="?", type=int, const=EXTERNAL_LISTINGS_MIN_LINES, metavar="RIGHE",
+                        help=f"scrive i blocchi di codice con almeno RIGHE righe (default: {EXTERNAL_LISTINGS_MIN_LINES}) "
+                             f"in {LISTINGS_DIR} e li include con \\lstinputlisting")
+    parser.add_argument("--disable-stage", action="append", default=[], metavar="REGOLA",
+                        help=f"disattiva una regola di conversione (ripetibile); regole: {', '.join(RULE_NAMES)}")
+    parser.add_argument("--stage-order", default="", metavar="R1,R2,...",
+                        help="esegue prima le regole elencate, nell'ordine dato (le altre seguono nell'ordine predefinito; "
+                             "\\persona e le citazioni restano comunque nella seconda fase)")
+    args = parser.parse_args(argv)
+    args.stage_order = [name.strip() for name in args.stage_order.split(",") if name.strip()]
+    unknown = [name for name in args.disable_stage + args.stage_order if name not in RULE_NAMES]
+    if unknown:
+        parser.error(f"regole sconosciute: {', '.join(unknown)} (disponibili: {', '.join(RULE_NAMES)})")
+    return args
+
+def load_markdown_files() -> dict:
+    """Legge tutti i file di MD_FILES_ORDER: { nome file: contenuto } (esclusi quelli vuoti o mancanti)."""
     all_md_contents = {}
     for md_filename_str in MD_FILES_ORDER:
         md_filepath = INPUT_DIR_MD / md_filename_str
         content = read_md_file(md_filepath)
         if content:
             all_md_contents[md_filename_str] = content
-    # Passo 1 della Fase 4: Colleziona e parsa TUTTA la bibliografia da TUTTI i file
-    collect_and_parse_bibliography(all_md_contents)
-    
-    # Passo 2 della Fase 4: Scrivi il file .bib
-    write_bibtex_file()
+    return all_md_contents
 
+def run_conversion(args, all_md_contents: dict = None, previous_state: dict = None, refresh_bibliography: bool = True):
+    """
+    Esegue una conversione completa (con cache) e restituisce (nuovo stato di build, file scritti).
+    all_md_contents e previous_state permettono a --watch di riusare ciò che ha già in memoria;
+    con refresh_bibliography=False le mappe bibliografiche della conversione precedente restano valide.
+    """
+    logging.info("Avvio conversione Markdown -> LaTeX...")
+    if args.profile:
+        enable_profiling()
+    profile_records = []
+    ensure_dir_exists(OUTPUT_DIR_TEX)
+    global PERSONA_APPLIED_SET
+    PERSONA_APPLIED_SET.clear() # Resetta lo stato all'inizio di ogni esecuzione completa
 
-    generated_tex_filenames_for_all_tex = []
+    fingerprint = converter_fingerprint()
+    if previous_state is None or previous_state.get("fingerprint") != fingerprint:
+        previous_state = {"sections": {}} if args.force else load_build_state(fingerprint)
+    new_state = {"fingerprint": fingerprint, "sections": {}}
+    written_files = []
 
+    # Carica tutti i contenuti Markdown in un dizionario per la raccolta bibliografica
+    if all_md_contents is None:
+        all_md_contents = load_markdown_files()
+    load_registry_people(args.people, all_md_contents.values(), use_cache=not args.force)
+    people_hash = people_table_hash()
+
+    if refresh_bibliography:
+        # Passo 1 della Fase 4: Colleziona e parsa TUTTA la bibliografia da TUTTI i file
+        started = time.perf_counter()
+        collect_and_parse_bibliography(all_md_contents, use_cache=not args.force)
+        if profiling_enabled():
+            record_profile("collect_and_parse_bibliography", time.perf_counter() - started,
+                           sum(len(content) for content in all_md_contents.values()), None,
+                           len(raw_bibliography_notes), filename="(bibliografia)")
+        
+        # Passo 2 della Fase 4: Scrivi il file .bib
+        started = time.perf_counter()
+        if write_bibtex_file():
+            written_files.append(BIB_FILE_PATH)
+        if profiling_enabled():
+            record_profile("write_bibtex_file", time.perf_counter() - started, None, None,
+                           len(bibtex_entries), filename="(bibliografia)")
+        profile_records.extend(take_profile_records())
+
+
+    # Elenco delle sezioni da generare e verifica della cache
+    sections = []  # [(indice in MD_FILES_ORDER, file .md, file .tex, chiave di cache)]
     for i, md_filename_str in enumerate(MD_FILES_ORDER):
         if md_filename_str not in all_md_contents:
             logging.warning(f"Salto {md_filename_str} perché non è stato letto correttamente.")
             continue
-        
-        current_md_content = all_md_contents[md_filename_str]
-        base_name_md = Path(md_filename_str).stem.lower()
-        tex_filename_out = ""
-        
-        is_intro = (i == 0 and base_name_md == "introduzione")
-        is_concl = (i == len(MD_FILES_ORDER) - 1 and base_name_md == "conclusione")
-
-        if is_intro:
-            tex_filename_out = "introduzione.tex"
-        elif is_concl:
-            tex_filename_out = "conclusione.tex"
-        else:
-            section_num_if_intro_exists = i 
-            section_num_if_no_intro = i + 1
-            if MD_FILES_ORDER and Path(MD_FILES_ORDER[0]).stem.lower() == "introduzione":
-                current_section_number_for_file = section_num_if_intro_exists
-            else:
-                current_section_number_for_file = section_num_if_no_intro
-            tex_filename_out = f"sezione{current_section_number_for_file}.tex"
-
+        tex_filename_out = tex_filename_for_section(i, md_filename_str)
+        cache_key = section_cache_key(fingerprint, md_filename_str, i + 1, all_md_contents[md_filename_str], people_hash)
+        sections.append((i, md_filename_str, tex_filename_out, cache_key))
+    generated_tex_filenames_for_all_tex = [tex_filename_out for _, _, tex_filename_out, _ in sections]
+
+    def cached_entry(tex_filename_out, cache_key):
+        """Voce di cache valida per la sezione, se il .tex su disco è ancora quello generato."""
+        cached = previous_state["sections"].get(tex_filename_out)
         latex_output_path = OUTPUT_DIR_TEX / tex_filename_out
-        generated_tex_filenames_for_all_tex.append(tex_filename_out)
+        if not cached or cached.get("key") != cache_key or not latex_output_path.is_file():
+            return None
+        output = latex_output_path.read_bytes()
+        if hashlib.sha256(output).hexdigest() != cached.get("output_sha256"):
+            return None
+        # Un listato esterno cancellato va riscritto riconvertendo la sezione
+        if any(not path.is_file() for path in listing_files_in(output.decode('utf-8', errors='replace'))):
+            return None
+        return cached
+
+    cached_entries = {tex: cached_entry(tex, key) for _, _, tex, key in sections}
+    body_contents = {}  # { file .tex: LaTeX dopo la prima parte della conversione }
+    mentions = {tex: set(entry.get("mentions", [])) for tex, entry in cached_entries.items() if entry}
+    # Cache dei blocchi: un file modificato viene riconvertito solo nei blocchi cambiati
+    block_cache = None if args.no_block_cache else load_block_cache(fingerprint, people_hash, use_cache=not args.force)
+    section_blocks = {}  # { file .tex: [chiave della prima parte di ogni blocco] }
+
+    jobs = max(1, args.jobs)
+    executor = None
+    def section_executor(n_tasks):
+        """Crea il pool al primo uso, solo se --jobs > 1 e c'è più di una sezione da convertire."""
+        nonlocal executor
+        if executor is None and jobs > 1 and n_tasks > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(
+                max_workers=min(jobs, max(n_tasks, len(sections))),
+                initializer=_init_section_worker,
+                initargs=(dict(KNOWN_PEOPLE), raw_bibliography_notes, markdown_key_to_bibtex_key_map,
+                          profiling_enabled(), active_rule_names(), _EXTERNAL_LISTINGS_MIN_LINES),
+            )
+            logging.info(f"Conversione parallela con {min(jobs, max(n_tasks, len(sections)))} processi.")
+        return executor
+
+    def block_task_chars(total_chars: int):
+        """Caratteri di un task sui blocchi: con più processi il lavoro viene diviso tra i processi, altrimenti un task per sezione."""
+        return max(CHUNK_MIN_CHARS, total_chars // jobs) if jobs > 1 else float("inf")
+
+    def convert_bodies(selected):
+        if block_cache is not None:
+            convert_body_blocks(selected, block_task_chars(sum(len(all_md_contents[md]) for _, md, _, _ in selected)))
+            return
+        # Con più processi i file lunghi sono divisi in parti, in modo da distribuire il lavoro
+        # anche quando un solo capitolo occupa gran parte della tesina
+        chunk_chars = max(CHUNK_MIN_CHARS, sum(len(all_md_contents[md]) for _, md, _, _ in selected) // jobs)
+        tasks = []
+        task_owners = []  # file .tex di ogni task
+        for i, md_filename_str, tex, _ in selected:
+            md_content = all_md_contents[md_filename_str]
+            chunks = split_markdown_chunks(md_content, chunk_chars) if jobs > 1 else [md_content]
+            if len(chunks) == 1:
+                tasks.append((i + 1, md_filename_str, md_content))
+            else:
+                logging.info(f"{md_filename_str} ({len(md_content)} caratteri) diviso in {len(chunks)} parti ai titoli.")
+                transcription_keys = transcription_keys_in(md_content)
+                tasks.extend((i + 1, md_filename_str, chunk, transcription_keys) for chunk in chunks)
+            task_owners.extend([tex] * len(chunks))
+        results = run_section_tasks(section_executor(len(tasks)), _convert_section_task, tasks)
+        converted = {tex: [] for tex in task_owners}
+        for tex in converted:
+            mentions[tex] = set()
+        for tex, (latex_content, mentioned, records) in zip(task_owners, results):
+            converted[tex].append(latex_content)
+            mentions[tex].update(mentioned)
+            profile_records.extend(records)
+        for tex, chunks in converted.items():
+            body_contents[tex] = join_converted_chunks(chunks)
+
+    def convert_body_blocks(selected, task_chars):
+        """Prima parte della conversione con la cache dei blocchi: solo i blocchi assenti dalla cache vengono convertiti."""
+        tasks = []
+        task_keys = []  # Chiavi dei blocchi di ogni task
+        for i, md_filename_str, tex, _ in selected:
+            md_content = all_md_contents[md_filename_str]
+            blocks = markdown_blocks(md_content)
+            keys = block_body_keys(md_content, blocks)
+            section_blocks[tex] = keys
+            missing = {}
+            for key, block in zip(keys, blocks):
+                if key not in missing and cached_block_body(block_cache, key) is None:
+                    missing[key] = block
+            logging.info(f"{md_filename_str}: {len(missing)} blocchi da convertire su {len(blocks)}.")
+            transcription_keys = transcription_keys_in(md_content) if missing else []
+            for group in group_by_size(list(missing), [len(block) for block in missing.values()], task_chars):
+                tasks.append((i + 1, md_filename_str, [missing[key] for key in group], transcription_keys))
+                task_keys.append(group)
+        results = run_section_tasks(section_executor(len(tasks)), _convert_blocks_task, tasks)
+        for keys, (converted, records) in zip(task_keys, results):
+            block_cache["bodies"].update(zip(keys, converted))
+            block_cache["dirty"] = True
+            profile_records.extend(records)
+        for _, _, tex, _ in selected:
+            entries = [block_cache["bodies"][key] for key in section_blocks[tex]]
+            body_contents[tex] = join_converted_chunks([latex_content for latex_content, _, _ in entries])
+            mentions[tex] = {person for _, mentioned, _ in entries for person in mentioned}
+            previous = block_cache["sections"].get(tex, {})
+            block_cache["sections"][tex] = {"bodies": dict(zip(section_blocks[tex], entries)), "finals": previous.get("finals", {})}
+            if block_cache["sections"][tex]["bodies"].keys() != previous.get("bodies", {}).keys():
+                block_cache["dirty"] = True
+
+    def finalize_body_blocks(selected, task_chars) -> list:
+        """
+        Seconda parte della conversione con la cache dei blocchi. Un blocco viene rifinito se cambia
+        lui, se cambiano le persone già marcate prima di lui (in questa o nelle sezioni precedenti)
+        o se cambia la bibliografia delle sue note.
+        """
+        tasks = []
+        task_keys = []
+        final_keys = {}
+        for i, md_filename_str, tex, _ in selected:
+            applied_so_far = set(persona_applied[tex])
+            final_keys[tex] = []
+            missing = {}
+            for body_key in section_blocks[tex]:
+                latex_content, mentioned, references = block_cache["bodies"][body_key]
+                already_applied = sorted(applied_so_far.intersection(mentioned))
+                applied_so_far.update(mentioned)
+                final_key = block_final_key(body_key, md_filename_str, already_applied, references)
+                final_keys[tex].append(final_key)
+                if final_key not in block_cache["finals"] and final_key not in missing:
+                    missing[final_key] = (latex_content, already_applied)
+            for group in group_by_size(list(missing), [len(body) for body, _ in missing.values()], task_chars):
+                tasks.append((i + 1, md_filename_str, [missing[key] for key in group]))
+                task_keys.append(group)
+        results = run_section_tasks(section_executor(len(tasks)), _finalize_blocks_task, tasks)
+        for keys, (finalized, records) in zip(task_keys, results):
+            block_cache["finals"].update(zip(keys, finalized))
+            block_cache["dirty"] = True
+            profile_records.extend(records)
+        final_contents = []
+        for i, md_filename_str, tex, _ in selected:
+            parts = [block_cache["finals"][key] for key in final_keys[tex]]
+            section = block_cache["sections"][tex]
+            if section["finals"].keys() != set(final_keys[tex]):
+                section["finals"] = dict(zip(final_keys[tex], parts))
+                block_cache["dirty"] = True
+            final_contents.append(section_header(md_filename_str, i + 1) + join_finalized_blocks(parts))
+        return final_contents
 
-        # Ora processa il contenuto del singolo file per le conversioni testuali
-        # Passa md_filename_str per permettere a replace_markdown_citations_in_text di sapere il contesto del file
-        latex_content = process_markdown_content(current_md_content, md_filename_str, i + 1, is_first_section=(i==0))
-        write_tex_file(latex_output_path, latex_content)
+    try:
+        # Prima parte della conversione per le sezioni non in cache
+        convert_bodies([section for section in sections if cached_entries[section[2]] is None])
+
+        # Pre-passata \\persona: per ogni sezione, le persone già marcate in una sezione precedente
+        persona_applied = dict(zip(
+            [tex for _, _, tex, _ in sections],
+            resolve_persona_first_mentions([mentions[tex] for _, _, tex, _ in sections]),
+        ))
+
+        # Una sezione in cache va comunque riconvertita se cambiano le persone già marcate prima di lei
+        stale = [section for section in sections
+                 if cached_entries[section[2]] is not None
+                 and set(cached_entries[section[2]].get("persona_applied", [])) != persona_applied[section[2]]]
+        for section in stale:
+            cached_entries[section[2]] = None
+        convert_bodies(stale)
+
+        # Seconda parte della conversione (\\persona e citazioni)
+        to_finalize = [section for section in sections if cached_entries[section[2]] is None]
+        if block_cache is not None and block_finalization_supported():
+            final_contents = finalize_body_blocks(
+                to_finalize, block_task_chars(sum(len(body_contents[tex]) for _, _, tex, _ in to_finalize)))
+        else:
+            tasks = [(i + 1, md_filename_str, body_contents[tex], sorted(persona_applied[tex]))
+                     for i, md_filename_str, tex, _ in to_finalize]
+            final_contents = []
+            for latex_content, records in run_section_tasks(section_executor(len(tasks)), _finalize_section_task, tasks):
+                final_contents.append(latex_content)
+                profile_records.extend(records)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for (_, md_filename_str, tex_filename_out, cache_key), latex_content in zip(to_finalize, final_contents):
+        if write_tex_file(OUTPUT_DIR_TEX / tex_filename_out, latex_content):
+            written_files.append(OUTPUT_DIR_TEX / tex_filename_out)
+        new_state["sections"][tex_filename_out] = {
+            "key": cache_key,
+            "source": md_filename_str,
+            "output_sha256": sha256_text(latex_content),
+            "mentions": sorted(mentions[tex_filename_out]),
+            "persona_applied": sorted(persona_applied[tex_filename_out]),
+        }
+    for _, md_filename_str, tex_filename_out, _ in sections:
+        if cached_entries[tex_filename_out] is not None:
+            logging.info(f"Sezione invariata, salto la conversione: {md_filename_str} -> {OUTPUT_DIR_TEX / tex_filename_out}")
+            new_state["sections"][tex_filename_out] = cached_entries[tex_filename_out]
+        PERSONA_APPLIED_SET.update(mentions[tex_filename_out])
+    skipped_sections = len(sections) - len(to_finalize)
 
     if generated_tex_filenames_for_all_tex:
-        all_tex_content_final = f"% --- File di inclusione generato automaticamente ---\n"
-        for fname in generated_tex_filenames_for_all_tex:
-            all_tex_content_final += f"\\input{{{OUTPUT_DIR_TEX}/{fname}}}  % Auto-generated: include {fname}\n"
-        write_tex_file(OUTPUT_DIR_TEX / "all.tex", all_tex_content_final)
+        all_tex_content_final = all_tex_content(generated_tex_filenames_for_all_tex, args.include)
+        if write_tex_file(OUTPUT_DIR_TEX / "all.tex", all_tex_content_final):
+            written_files.append(OUTPUT_DIR_TEX / "all.tex")
         logging.info(f"Generato file di inclusione: {OUTPUT_DIR_TEX / 'all.tex'}")
     else:
         logging.info("Nessun file .tex generato, quindi 'all.tex' non è stato creato.")
 
+    if args.bbl and write_bbl_file():
+        written_files.append(MAIN_TEX_FILE.with_suffix(".bbl"))
+
+    prune_listing_files([OUTPUT_DIR_TEX / tex for tex in generated_tex_filenames_for_all_tex])
+    save_build_state(new_state)
+    if block_cache is not None:
+        save_block_cache(block_cache, generated_tex_filenames_for_all_tex)
+    record_changed_sections(written_files)
+    if profiling_enabled():
+        write_profile_report(profile_records, Path(args.profile))
+    if skipped_sections:
+        logging.info(f"Sezioni invariate saltate grazie alla cache: {skipped_sections}")
     logging.info(f"Conversione terminata. Persone processate con \\persona: {PERSONA_APPLIED_SET}")
     logging.info(f"Mappa da chiavi Markdown a BibTeX: {markdown_key_to_bibtex_key_map}")
+    return new_state, written_files
+
+# --- Modalità --watch ---
+
+def footnote_definitions(md_content: str) -> list:
+    """Definizioni di nota [^key]: testo del file, usate da --watch per capire se rifare la bibliografia."""
+    return [(definition.key, definition.text) for definition in footnote_index(md_content).definitions]
+
+def markdown_files_snapshot() -> dict:
+    """{ file .md: (mtime_ns, dimensione) } per i file di MD_FILES_ORDER, None se il file non esiste."""
+    snapshot = {}
+    for md_filename_str in MD_FILES_ORDER:
+        try:
+            stat = os.stat(INPUT_DIR_MD / md_filename_str)
+            snapshot[md_filename_str] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            snapshot[md_filename_str] = None
+    return snapshot
+
+def watch_markdown_files(args):
+    """
+    Converte una prima volta, poi controlla con os.stat i file di INPUT_DIR_MD e riconverte
+    solo quando cambiano. La bibliografia viene raccolta di nuovo solo se cambiano le
+    definizioni delle note; le sezioni non toccate restano in cache.
+    """
+    # La fotografia precede la lettura: un file salvato durante la prima conversione risulta cambiato
+    snapshot = markdown_files_snapshot()
+    all_md_contents = load_markdown_files()
+    state, _ = run_conversion(args, all_md_contents)
+    args.force = False  # --force vale solo per la prima conversione
+    footnotes = {name: footnote_definitions(content) for name, content in all_md_contents.items()}
+    logging.info(f"In ascolto delle modifiche in {INPUT_DIR_MD} (Ctrl+C per uscire)...")
+
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            new_snapshot = markdown_files_snapshot()
+            changed = [name for name in MD_FILES_ORDER if new_snapshot[name] != snapshot.get(name)]
+            snapshot = new_snapshot
+            if not changed:
+                continue
+
+            started = time.perf_counter()
+            refresh_bibliography = False
+            for name in changed:
+                content = read_md_file(INPUT_DIR_MD / name) if new_snapshot[name] else ""
+                if content:
+                    all_md_contents[name] = content
+                else:
+                    all_md_contents.pop(name, None)
+                definitions = footnote_definitions(content)
+                if definitions != footnotes.get(name, []):
+                    refresh_bibliography = True
+                footnotes[name] = definitions
+
+            logging.info(f"File modificati: {', '.join(changed)}" + (" (note cambiate, aggiorno la bibliografia)" if refresh_bibliography else ""))
+            state, written_files = run_conversion(args, all_md_contents, state, refresh_bibliography)
+            logging.info(f"Conversione completata in {(time.perf_counter() - started) * 1000:.0f} ms, file aggiornati: {len(written_files)}")
+
+            if args.build_command and written_files:
+                logging.info(f"Avvio della compilazione: {args.build_command}")
+                subprocess.run(args.build_command, shell=True)
+    except KeyboardInterrupt:
+        logging.info("Modalità --watch terminata.")
+
+# --- Modalità --server ---
+
+# Righe di log raccolte durante una richiesta e restituite come diagnostica
+SERVER_DIAGNOSTICS_LEVEL = logging.WARNING
+
+def start_server_state(force: bool = False, people_registry=None) -> dict:
+    """
+    Prepara lo stato che --server tiene in memoria tra una richiesta e l'altra: contenuti
+    Markdown, definizioni delle note, cache delle citazioni, mappe bibliografiche e persone
+    citate in ogni sezione (per \\persona). Compila anche tutte le regex alla prima conversione.
+    """
+    started = time.perf_counter()
+    all_md_contents = load_markdown_files()
+    load_registry_people(people_registry, all_md_contents.values(), use_cache=not force)
+    if force:
+        citation_cache = {"parser_version": citation_parser_version(), "entries": {}, "dirty": True}
+    else:
+        citation_cache = load_citation_cache()
+    collect_and_parse_bibliography(all_md_contents, citation_cache=citation_cache)
+    mentions = {}
+    for i, md_filename_str in enumerate(MD_FILES_ORDER):
+        if md_filename_str in all_md_contents:
+            latex_content = convert_section_body(all_md_contents[md_filename_str], md_filename_str, i + 1)
+            mentions[md_filename_str] = find_persona_mentions(latex_content)
+    logging.info(f"Server pronto in {(time.perf_counter() - started) * 1000:.0f} ms: {len(all_md_contents)} sezioni, "
+                 f"{len(bibtex_entries)} voci BibTeX.")
+    return {
+        "contents": all_md_contents,
+        "footnotes": {name: footnote_definitions(content) for name, content in all_md_contents.items()},
+        "citation_cache": citation_cache,
+        "mentions": mentions,
+        "people_registry": people_registry,
+        # Il .bib su disco può essere di una conversione precedente: va riscritto alla prima "write"
+        "bib_dirty": True,
+        # Altri file il cui .tex su disco non corrisponde più alle mappe bibliografiche o alle \persona in memoria
+        "stale_files": set(),
+    }
+
+def update_server_bibliography(state: dict, md_filename: str, md_content: str) -> bool:
+    """
+    Aggiorna il contenuto di un file nello stato del server. Le mappe bibliografiche vengono
+    ricalcolate solo se cambiano le definizioni delle note del file: le citazioni degli altri
+    file sono già nella cache in memoria, quindi viene parsato solo il testo delle note nuove.
+    Restituisce True se voci BibTeX o chiavi delle note sono cambiate.
+    """
+    state["contents"][md_filename] = md_content
+    definitions = footnote_definitions(md_content)
+    if definitions == state["footnotes"].get(md_filename, []):
+        return False
+    state["footnotes"][md_filename] = definitions
+    previous = (dict(markdown_key_to_bibtex_key_map), {key: entry["fields"] for key, entry in bibtex_entries.items()})
+    collect_and_parse_bibliography(state["contents"], citation_cache=state["citation_cache"])
+    return previous != (markdown_key_to_bibtex_key_map, {key: entry["fields"] for key, entry in bibtex_entries.items()})
+
+def bibliography_keys_by_file() -> dict:
+    """{ file .md: { chiave della nota: chiave BibTeX } } dalla mappa globale delle note."""
+    keys = {}
+    for (md_filename, md_key), bibtex_key in markdown_key_to_bibtex_key_map.items():
+        keys.setdefault(md_filename, {})[md_key] = bibtex_key
+    return keys
+
+def server_persona_applied(state: dict) -> dict:
+    """{ file .md: persone già marcate con \\persona in una sezione precedente } secondo le menzioni in memoria."""
+    names = [name for name in MD_FILES_ORDER if name in state["mentions"]]
+    return dict(zip(names, resolve_persona_first_mentions([state["mentions"][name] for name in names])))
+
+def convert_server_section(state: dict, md_filename: str) -> str:
+    """Converte un file con il contenuto in memoria e aggiorna le persone che cita."""
+    i = MD_FILES_ORDER.index(md_filename)
+    latex_content = convert_section_body(state["contents"][md_filename], md_filename, i + 1)
+    state["mentions"][md_filename] = find_persona_mentions(latex_content)
+    return finalize_section_content(latex_content, md_filename, i + 1, server_persona_applied(state)[md_filename])
+
+def convert_server_buffer(state: dict, request: dict) -> dict:
+    """
+    Richiesta "convert": converte il testo di `file` (o il file su disco se manca `text`)
+    con lo stato in memoria. Con "write": true scrive anche il .tex della sezione e,
+    se la bibliografia è cambiata dall'ultima scrittura (anche in un'anteprima), il file .bib.
+    Le note del buffer possono rinumerare le chiavi BibTeX degli altri file e le sue persone spostare
+    la prima \\persona delle sezioni successive: quei file sono restituiti in stale_files e, con "write",
+    riconvertiti e scritti anch'essi.
+    """
+    md_filename = request.get("file")
+    if md_filename not in MD_FILES_ORDER:
+        raise ValueError(f"File non presente in MD_FILES_ORDER: {md_filename}")
+    md_content = request["text"] if "text" in request else read_md_file(INPUT_DIR_MD / md_filename)
+    i = MD_FILES_ORDER.index(md_filename)
+    previous_keys = bibliography_keys_by_file()
+    previous_applied = server_persona_applied(state)
+    bibliography_updated = update_server_bibliography(state, md_filename, md_content)
+    if bibliography_updated:
+        # Anche un'anteprima senza "write" cambia le mappe: il .bib resta da scrivere finché una "write" non riesce
+        state["bib_dirty"] = True
+    if state["people_registry"]:
+        # Solo il testo del buffer viene diviso di nuovo in parole; gli altri file sono in cache
+        load_registry_people(state["people_registry"], state["contents"].values())
+
+    latex_content = convert_server_section(state, md_filename)
+    keys = bibliography_keys_by_file() if bibliography_updated else previous_keys
+    applied = server_persona_applied(state)
+    state["stale_files"].update(name for name in state["contents"] if name != md_filename and (
+        keys.get(name) != previous_keys.get(name) or applied.get(name) != previous_applied.get(name)))
+    stale_files = [name for name in MD_FILES_ORDER if name in state["stale_files"] and name != md_filename]
+
+    tex_filename = tex_filename_for_section(i, md_filename)
+    response = {"file": md_filename, "tex_file": tex_filename, "latex": latex_content,
+                "bibliography_updated": bibliography_updated, "stale_files": stale_files}
+    if request.get("write"):
+        ensure_dir_exists(OUTPUT_DIR_TEX)
+        written_files = []
+        if write_tex_file(OUTPUT_DIR_TEX / tex_filename, latex_content):
+            written_files.append(str(OUTPUT_DIR_TEX / tex_filename))
+        state["stale_files"].discard(md_filename)
+        for name in stale_files:
+            stale_tex_path = OUTPUT_DIR_TEX / tex_filename_for_section(MD_FILES_ORDER.index(name), name)
+            if write_tex_file(stale_tex_path, convert_server_section(state, name)):
+                written_files.append(str(stale_tex_path))
+            state["stale_files"].discard(name)
+        if state["bib_dirty"]:
+            bib_written = write_bibtex_file()
+            if bib_written:
+                written_files.append(str(BIB_FILE_PATH))
+            state["bib_dirty"] = bib_written is None
+        response["written"] = written_files
+    return response
+
+def handle_server_request(state: dict, request: dict, diagnostics) -> dict:
+    """
+    Esegue una richiesta JSON e restituisce la risposta con id, esito, diagnostica
+    (avvisi ed errori registrati durante la richiesta) e durata in millisecondi.
+    Comandi: "convert", "reload" (rilegge tutti i file da disco), "ping", "shutdown".
+    """
+    started = time.perf_counter()
+    command = request.get("command", "convert")
+    try:
+        if command == "convert":
+            response = convert_server_buffer(state, request)
+        elif command == "reload":
+            state.update(start_server_state(people_registry=state["people_registry"]))
+            response = {"sections": len(state["contents"]), "bibtex_entries": len(bibtex_entries)}
+        elif command in ("ping", "shutdown"):
+            response = {}
+        else:
+            raise ValueError(f"Comando sconosciuto: {command}")
+        response["ok"] = True
+    except Exception as e:
+        response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    messages = [{"level": record.levelname, "message": record.getMessage()} for record in diagnostics.buffer]
+    diagnostics.flush()
+    return {"id": request.get("id"), "command": command, **response,
+            "diagnostics": messages, "milliseconds": round((time.perf_counter() - started) * 1000, 3)}
+
+def serve_json_lines(state: dict, lines_in, out) -> bool:
+    """
+    Legge una richiesta JSON per riga da lines_in e scrive una risposta JSON per riga su out.
+    Restituisce True se è arrivato il comando "shutdown".
+    """
+    diagnostics = logging.handlers.BufferingHandler(capacity=10000)
+    diagnostics.setLevel(SERVER_DIAGNOSTICS_LEVEL)
+    logging.getLogger().addHandler(diagnostics)
+    try:
+        for line in lines_in:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("la richiesta deve essere un oggetto JSON")
+            except ValueError as e:
+                response = {"id": None, "ok": False, "error": f"Richiesta non valida: {e}"}
+                request = {}
+            else:
+                # print() del convertitore (file letti, \persona applicate) non deve finire tra le risposte
+                with contextlib.redirect_stdout(sys.stderr):
+                    response = handle_server_request(state, request, diagnostics)
+            out.write(json.dumps(response, ensure_ascii=False) + "\n")
+            out.flush()
+            if request.get("command") == "shutdown":
+                return True
+    finally:
+        logging.getLogger().removeHandler(diagnostics)
+    return False
+
+def run_server(args):
+    """
+    Modalità server per gli editor: tiene in memoria lo stato della conversione e risponde
+    a richieste JSON, una per riga, su stdin/stdout oppure su un socket Unix (--socket).
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        state = start_server_state(args.force, args.people)
+    # Durante il servizio il log dettagliato di ogni fase arriva al client come diagnostica
+    logging.getLogger().setLevel(SERVER_DIAGNOSTICS_LEVEL)
+    if not args.socket:
+        serve_json_lines(state, sys.stdin, sys.stdout)
+        return
+
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("I socket Unix non sono disponibili su questo sistema: usare --server senza --socket.")
+    socket_path = Path(args.socket)
+    if socket_path.exists():
+        socket_path.unlink()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen()
+    print(f"Server in ascolto su {socket_path}", file=sys.stderr)
+    try:
+        # Un client alla volta: le richieste modificano lo stato condiviso
+        while True:
+            connection, _ = server.accept()
+            with connection, connection.makefile("r", encoding="utf-8") as lines_in, \
+                    connection.makefile("w", encoding="utf-8") as out:
+                if serve_json_lines(state, lines_in, out):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
+        logging.getLogger().setLevel(logging.INFO)
+        logging.info("Server terminato.")
+
+# --- Modalità --batch ---
+
+# Configurazione facoltativa di un progetto per --batch:
+# {"md_files_order": [...], "known_people": {...}, "people_registry": "persone.csv"}
+BATCH_CONFIG_FILE = Path("md_to_latex.json")
+BATCH_LOG_FILE = BUILD_CACHE_DIR / "batch.log"
+# Posizione dei file senza MD_FILES_ORDER esplicito: introduzione per prima, conclusione per ultima
+BATCH_SECTION_RANK = {"introduzione": 0, "conclusione": 2}
+
+def natural_sort_key(name: str) -> list:
+    """Chiave di ordinamento che confronta i numeri per valore (capitolo2 prima di capitolo10)."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def project_settings(project_root: Path) -> dict:
+    """
+    Ordine dei file e persone note di un progetto: da BATCH_CONFIG_FILE nella radice del
+    progetto, se esiste; altrimenti tutti i .md di MarkDownSections in ordine naturale
+    (introduzione per prima, conclusione per ultima) e la tabella KNOWN_PEOPLE di questo script.
+    Il registro delle persone (people_registry, relativo al progetto) sostituisce quello di --people.
+    """
+    settings = {}
+    config_path = project_root / BATCH_CONFIG_FILE
+    if config_path.is_file():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    md_files_order = settings.get("md_files_order")
+    if not md_files_order:
+        md_files_order = sorted((path.name for path in (project_root / INPUT_DIR_MD).glob("*.md")),
+                                key=lambda name: (BATCH_SECTION_RANK.get(Path(name).stem.lower(), 1), natural_sort_key(name)))
+    return {"md_files_order": md_files_order, "known_people": settings.get("known_people", dict(KNOWN_PEOPLE)),
+            "people_registry": settings.get("people_registry")}
+
+def load_shared_citation_entries(project_roots: list) -> dict:
+    """
+    Unisce le cache delle citazioni di tutti i progetti (solo quelle con le euristiche correnti):
+    il parsing di una nota dipende solo dal testo, quindi vale per qualsiasi progetto.
+    """
+    entries = {}
+    for project_root in project_roots:
+        entries.update(load_citation_cache(project_root / CITATION_CACHE_FILE)["entries"])
+    return entries
+
+def reset_project_state():
+    """Azzera lo stato globale lasciato da un progetto prima di convertire il successivo nello stesso processo."""
+    global people_registry_digest
+    PERSONA_APPLIED_SET.clear()
+    raw_bibliography_notes.clear()
+    bibtex_entries.clear()
+    markdown_key_to_bibtex_key_map.clear()
+    bibtex_key_counters.clear()
+    bibtex_work_index.clear()
+    merged_bibliography_notes.clear()
+    _FOOTNOTE_INDEX_CACHE.clear()
+    registry_people.clear()
+    people_registry_digest = ""
+
+def batch_failure(project_root: Path, error: str) -> dict:
+    """Riepilogo di un progetto che non è stato possibile convertire."""
+    return {"project": str(project_root), "ok": False, "sections": 0, "markdown_kb": 0.0, "written": 0,
+            "seconds": 0.0, "error": error}
+
+def _init_batch_worker(shared_citation_entries: dict, rule_names: tuple, external_listings_min_lines):
+    """
+    Inizializza un processo di --batch: cache delle citazioni condivisa (in sola lettura),
+    regole attive e listati esterni. Il log di ogni progetto va nel suo BATCH_LOG_FILE.
+    """
+    global _SHARED_CITATION_ENTRIES
+    _SHARED_CITATION_ENTRIES = shared_citation_entries
+    configure_rules(disabled=[name for name in RULE_NAMES if name not in rule_names], order=rule_names)
+    configure_external_listings(external_listings_min_lines)
+    logging.getLogger().handlers.clear()
+
+def _convert_project_task(task):
+    """Task di --batch: converte un progetto nella sua directory; restituisce il riepilogo (mai un'eccezione)."""
+    global MD_FILES_ORDER
+    project_root, settings, args = task
+    result = batch_failure(project_root, None)
+    started = time.perf_counter()
+    previous_cwd = os.getcwd()
+    log_handler = None
+    try:
+        os.chdir(project_root)
+        reset_project_state()
+        MD_FILES_ORDER = list(settings["md_files_order"])
+        KNOWN_PEOPLE.clear()
+        KNOWN_PEOPLE.update(settings["known_people"])
+        if settings.get("people_registry"):
+            args = argparse.Namespace(**{**vars(args), "people": settings["people_registry"]})
+        BUILD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        log_handler = logging.FileHandler(BATCH_LOG_FILE, mode='w', encoding='utf-8')
+        log_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+        logging.getLogger().addHandler(log_handler)
+        with contextlib.redirect_stdout(log_handler.stream):
+            state, written_files = run_conversion(args)
+        result.update(ok=True, sections=len(state["sections"]), written=len(written_files),
+                      markdown_kb=sum((INPUT_DIR_MD / name).stat().st_size for name in MD_FILES_ORDER
+                                      if (INPUT_DIR_MD / name).is_file()) / 1024)
+    except Exception as e:
+        logging.exception(f"Conversione fallita per il progetto {project_root}")
+        result["error"] = f"{type(e).__name__}: {e}"
+    else:
+        del result["error"]
+    finally:
+        if log_handler is not None:
+            logging.getLogger().removeHandler(log_handler)
+            log_handler.close()
+        os.chdir(previous_cwd)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def print_batch_report(results: list, wall_seconds: float):
+    """Stampa il riepilogo di --batch: una riga per progetto, poi throughput e fallimenti."""
+    print(f"{'progetto':<40} {'esito':<8} {'sezioni':>7} {'KB':>8} {'s':>7}")
+    for result in results:
+        print(f"{result['project'][-40:]:<40} {'ok' if result['ok'] else 'ERRORE':<8} {result['sections']:>7} "
+              f"{result['markdown_kb']:>8.0f} {result['seconds']:>7.2f}")
+    failures = [result for result in results if not result["ok"]]
+    total_kb = sum(result["markdown_kb"] for result in results)
+    print(f"\n{len(results) - len(failures)}/{len(results)} progetti convertiti in {wall_seconds:.2f} s: "
+          f"{len(results) / wall_seconds:.2f} progetti/s, {total_kb / wall_seconds:.0f} KB/s di Markdown")
+    for result in failures:
+        log_path = Path(result["project"]) / BATCH_LOG_FILE
+        print(f"ERRORE {result['project']}: {result['error']}" + (f" (vedi {log_path})" if log_path.is_file() else ""))
+
+def run_batch(args):
+    """
+    Converte più progetti (ognuno con i propri MarkDownSections, sections e bibliografia)
+    in un pool di --jobs processi. Ogni task lavora nella directory del suo progetto e
+    azzera lo stato globale; i matcher delle persone e le citazioni già parsate di tutti
+    i progetti vengono preparati una volta nel processo principale e condivisi (i matcher
+    solo con i processi creati con fork, vedi batch_context).
+    Termina con codice 1 se almeno un progetto fallisce.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # I processi creati con fork ereditano i matcher compilati qui; il metodo va chiesto esplicitamente
+    # perché da Python 3.14 il default su Linux è forkserver. Con spawn (Windows, macOS) ogni processo
+    # ricompila il matcher del suo progetto al primo uso: l'output non cambia, solo il tempo di avvio.
+    batch_context = multiprocessing.get_context("fork") if sys.platform.startswith("linux") else None
+    started = time.perf_counter()
+    project_roots = list(dict.fromkeys(Path(root).resolve() for root in args.batch))
+    if len(project_roots) < len(args.batch):
+        # Due conversioni nella stessa directory scriverebbero gli stessi file e le stesse cache
+        logging.warning(f"Batch: ignorati {len(args.batch) - len(project_roots)} progetti ripetuti.")
+    tasks = []
+    results = {}
+    # Il registro di --people è relativo alla directory corrente, non a quella di ogni progetto
+    people = str(Path(args.people).resolve()) if args.people else None
+    project_args = argparse.Namespace(**{**vars(args), "jobs": 1, "profile": None, "watch": False, "server": False,
+                                         "people": people})
+    for project_root in project_roots:
+        if not (project_root / INPUT_DIR_MD).is_dir():
+            results[project_root] = batch_failure(project_root, f"Cartella {INPUT_DIR_MD} non trovata")
+            continue
+        try:
+            settings = project_settings(project_root)
+        except (OSError, ValueError) as e:
+            results[project_root] = batch_failure(project_root, f"Configurazione non valida: {e}")
+            continue
+        get_persona_matcher(settings["known_people"])  # Compilato qui, ereditato con batch_context
+        tasks.append((project_root, settings, project_args))
+    shared_citation_entries = {} if args.force else load_shared_citation_entries(project_roots)
+    logging.info(f"Batch: {len(tasks)} progetti, {len(shared_citation_entries)} citazioni già parsate condivise, "
+                 f"{max(1, args.jobs)} processi.")
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=min(max(1, args.jobs), len(tasks)), mp_context=batch_context,
+                                 initializer=_init_batch_worker,
+                                 initargs=(shared_citation_entries, active_rule_names(), _EXTERNAL_LISTINGS_MIN_LINES)) as executor:
+            futures = {task[0]: executor.submit(_convert_project_task, task) for task in tasks}
+            for project_root, future in futures.items():
+                try:
+                    results[project_root] = future.result()
+                except Exception as e:  # Processo terminato in modo anomalo (BrokenProcessPool)
+                    results[project_root] = batch_failure(project_root, f"{type(e).__name__}: {e}")
+    ordered_results = [results[project_root] for project_root in project_roots]
+    wall_seconds = time.perf_counter() - started
+
+    print_batch_report(ordered_results, wall_seconds)
+    if args.batch_report:
+        report = {"seconds": wall_seconds, "projects": ordered_results}
+        Path(args.batch_report).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+        logging.info(f"Report del batch salvato in {args.batch_report}")
+    if any(not result["ok"] for result in ordered_results):
+        sys.exit(1)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    configure_rules(args.disable_stage, args.stage_order)
+    configure_external_listings(args.external_listings)
+    if args.batch:
+        run_batch(args)
+    elif args.server:
+        run_server(args)
+    elif args.watch:
+        watch_markdown_files(args)
+    else:
+        run_conversion(args)
 
 
 if __name__ == "__main__":